@@ -5,7 +5,101 @@ from pathlib import Path
 import json
 import io
 import os
-from scripts.parse_pdf_data import parse_single_pdf
+import shutil
+import threading
+from scripts.parse_pdf_data import parse_pdf_progressively, parse_single_pdf
+
+QUICK_LOOK_PAGES = 5      # pages parsed before the first quick-look result
+QUICK_LOOK_UPDATE = 25    # pages between table/audit refreshes after that
+QUICK_LOOK_POLL = "1s"
+
+
+class QuickLookJob:
+    """
+    Runs parse_pdf_progressively in a background thread; the page polls its latest snapshot.
+    The CSV is kept in memory for the download button, so no temp files outlive the job.
+    """
+
+    def __init__(self, key, source, name, ocr_mode, tmp_path=None):
+        self.key = key
+        self.snapshot = None
+        self.error = None
+        self.csv_bytes = None
+        self.finished = False
+        self.cancelled = False
+        self.thread = threading.Thread(target=self._run, args=(source, name, ocr_mode, tmp_path), daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """Stop at the next snapshot (the job was replaced); the thread still removes its temp file."""
+        self.cancelled = True
+
+    def _run(self, source, name, ocr_mode, tmp_path):
+        output_dir = Path(tempfile.mkdtemp())
+        try:
+            for snapshot in parse_pdf_progressively(source, first_pages=QUICK_LOOK_PAGES,
+                                                    update_pages=QUICK_LOOK_UPDATE, name=name, ocr_mode=ocr_mode):
+                if self.cancelled:
+                    return
+                self.snapshot = snapshot
+            if snapshot["table"] is not None:
+                # the same CSV parse_single_pdf exports
+                csv_path = output_dir / f"{Path(name).stem}.csv"
+                snapshot["table"].to_csv(csv_path)
+                self.csv_bytes = csv_path.read_bytes()
+        except Exception as e:
+            self.error = e
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if tmp_path and tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
+            self.finished = True
+
+
+def render_quick_look(job, polling):
+    """Progress, header key-values, rows parsed so far and the running audit for a QuickLookJob."""
+    if polling and job.finished:
+        st.rerun()  # render the final result once more and stop polling
+    if job.error is not None:
+        st.error(f"❌ Error while parsing: {job.error}")
+        return
+    snapshot = job.snapshot
+    if snapshot is None:
+        st.info(f"🔍 Parsing the first {QUICK_LOOK_PAGES} pages...")
+        return
+
+    audit = snapshot["audit"]
+    if job.finished:
+        st.success("✅ Parsing complete!")
+    else:
+        st.progress(snapshot["pages_done"] / max(snapshot["pages_total"], 1),
+                    text=f"🔍 Parsed {snapshot['pages_done']} of {snapshot['pages_total']} pages — "
+                         "showing results so far")
+
+    invoice_col, date_col, total_col = st.columns(3)
+    invoice_col.metric("Invoice #", audit.get("invoice_no") or "—")
+    date_col.metric("Date", audit.get("date") or "—")
+    total_col.metric("Total", audit.get("total") or "—")
+
+    st.subheader("📊 Extracted Data")
+    if snapshot["table"] is not None:
+        st.dataframe(snapshot["table"].to_dataframe(), width='stretch')
+    elif job.finished:
+        st.error("No tables found or CSV could not be generated.")
+    else:
+        st.info("No line items on the pages parsed so far.")
+
+    st.subheader("🧾 Audit Summary")
+    st.json(audit)
+
+    if job.finished and job.csv_bytes is not None:
+        st.download_button("⬇️ Download CSV", job.csv_bytes, file_name="parsed_data.csv")
+        st.download_button(
+            "⬇️ Download Audit JSON",
+            io.BytesIO(json.dumps(audit, indent=4).encode()),
+            file_name="audit_summary.json",
+        )
+
 
 st.set_page_config(
     page_title="PDF-Parser-Pro",
@@ -96,57 +190,95 @@ if st.button("Use demo invoice (sample)"):
 uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"])
 
 if uploaded_file:
-    # Save uploaded file to a temporary path
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = Path(tmp_file.name)
-
     enable_ocr = st.checkbox("Enable OCR (for scanned / image-only PDFs)", value=False)
+    ocr_mode = "fixed"
+    if enable_ocr:
+        ocr_mode = st.selectbox(
+            "OCR mode",
+            ["fixed", "adaptive", "regions"],
+            format_func={
+                "fixed": "Fixed 300 DPI, whole page",
+                "adaptive": "Adaptive DPI (re-OCR low-confidence pages at 300 DPI)",
+                "regions": "Text regions only (skip logos, footers and margins)",
+            }.get,
+        )
 
-    # Define output folder inside temp dir
-    output_dir = Path(tempfile.mkdtemp())
-
-    st.info("🔍 Parsing PDF, please wait...")
+    quick_look = st.checkbox(
+        f"Quick look (show the first {QUICK_LOOK_PAGES} pages right away, keep parsing the rest in the background)",
+        value=False,
+    )
 
-    try:
+    if quick_look:
+        key = (getattr(uploaded_file, "file_id", uploaded_file.name), ocr_mode if enable_ocr else None)
+        job = st.session_state.get("quick_look_job")
+        if job is None or job.key != key:
+            if job is not None:
+                job.cancel()
+            tmp_path = None
+            if enable_ocr:  # OCR rasterizes from a path; the job deletes the temp file when done
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                    tmp_file.write(uploaded_file.getbuffer())
+                    tmp_path = Path(tmp_file.name)
+            # open_pdf reads the upload in place; only this job reads it, so sharing it is safe
+            job = QuickLookJob(key, tmp_path or uploaded_file, uploaded_file.name, ocr_mode, tmp_path)
+            st.session_state["quick_look_job"] = job
+        polling = not job.finished
+        st.fragment(render_quick_look, run_every=QUICK_LOOK_POLL if polling else None)(job, polling)
+    else:
+        # The upload is already in memory: parse it in place. Only OCR needs a file on disk
+        # (poppler rasterizes from a path), so spill to a temp file just for that case.
+        tmp_path = None
         if enable_ocr:
-            os.environ["PDFPARSER_CURRENT_PDF"] = str(tmp_path)
-        
-        audit = parse_single_pdf(tmp_path, output_dir)
-        csv_files = list(output_dir.glob("*.csv"))
-        csv_path = csv_files[0] if csv_files else None
-
-        if csv_path and csv_path.exists():
-            df = pd.read_csv(csv_path)
-            st.success("✅ Parsing complete!")
-
-            st.subheader("📊 Extracted Data")
-            st.dataframe(df, width='stretch')
-
-
-            # Show audit details
-            st.subheader("🧾 Audit Summary")
-            st.json(audit)
-
-            # Download buttons
-            with open(csv_path, "rb") as f:
-                st.download_button("⬇️ Download CSV", f, file_name="parsed_data.csv")
-
-            audit_json = json.dumps(audit, indent=4)
-            st.download_button(
-                "⬇️ Download Audit JSON",
-                io.BytesIO(audit_json.encode()),
-                file_name="audit_summary.json",
-            )
-        else:
-            st.error("No tables found or CSV could not be generated.")
-
-    except Exception as e:
-        st.error(f"❌ Error while parsing: {e}")
-    finally:
-        os.environ.pop("PDFPARSER_CURRENT_PDF", None)
-        if tmp_path.exists():
-            tmp_path.unlink(missing_ok=True)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                tmp_file.write(uploaded_file.getbuffer())
+                tmp_path = Path(tmp_file.name)
+
+        # Define output folder inside temp dir
+        output_dir = Path(tempfile.mkdtemp())
+
+        st.info("🔍 Parsing PDF, please wait...")
+
+        try:
+            if enable_ocr:
+                os.environ["PDFPARSER_CURRENT_PDF"] = str(tmp_path)
+
+            source = tmp_path if tmp_path else uploaded_file
+            audit = parse_single_pdf(source, output_dir, name=uploaded_file.name,
+                                     ocr_mode=ocr_mode)
+            csv_files = list(output_dir.glob("*.csv"))
+            csv_path = csv_files[0] if csv_files else None
+
+            if csv_path and csv_path.exists():
+                df = pd.read_csv(csv_path)
+                st.success("✅ Parsing complete!")
+
+                st.subheader("📊 Extracted Data")
+                st.dataframe(df, width='stretch')
+
+
+                # Show audit details
+                st.subheader("🧾 Audit Summary")
+                st.json(audit)
+
+                # Download buttons
+                with open(csv_path, "rb") as f:
+                    st.download_button("⬇️ Download CSV", f, file_name="parsed_data.csv")
+
+                audit_json = json.dumps(audit, indent=4)
+                st.download_button(
+                    "⬇️ Download Audit JSON",
+                    io.BytesIO(audit_json.encode()),
+                    file_name="audit_summary.json",
+                )
+            else:
+                st.error("No tables found or CSV could not be generated.")
+
+        except Exception as e:
+            st.error(f"❌ Error while parsing: {e}")
+        finally:
+            os.environ.pop("PDFPARSER_CURRENT_PDF", None)
+            if tmp_path and tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
 else:
     st.info("👆 Upload a PDF file to start parsing.")
 
@@ -0,0 +1,59 @@
+"""
+bench_compact_dtypes.py
+Description:
+Memory and merge time of a large merged line-item dataset under each DTYPE_POLICIES entry.
+Frames are shaped like normalize_numeric_columns output, one per synthetic invoice.
+
+Usage:
+    python -m benchmarks.bench_compact_dtypes --rows 5000000 --rows-per-invoice 1000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.parse_pdf_data import DTYPE_POLICIES, concat_line_items
+
+
+def make_invoice_frames(total_rows: int, rows_per_invoice: int, vocabulary: int, seed: int = 0) -> dict:
+    """Synthetic per-invoice frames: {file name: DataFrame}, sharing a vocabulary of descriptions."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"Item {i:05d} - standard service" for i in range(vocabulary)], dtype=object)
+    frames = {}
+    for n in range(max(1, total_rows // rows_per_invoice)):
+        qty = rng.integers(1, 20, rows_per_invoice).astype("float64")
+        price = rng.integers(100, 200000, rows_per_invoice) / 100
+        frames[f"invoice_{n:06d}.pdf"] = pd.DataFrame({
+            "description": words[rng.integers(0, vocabulary, rows_per_invoice)],
+            "quantity": qty,
+            "page_number": (np.arange(rows_per_invoice) // 40 + 1).astype("int64"),
+            "unit_price": price,
+            "line_total": qty * price,
+        })
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Total merged rows")
+    parser.add_argument("--rows-per-invoice", type=int, default=1000)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct descriptions")
+    args = parser.parse_args()
+
+    frames = make_invoice_frames(args.rows, args.rows_per_invoice, args.vocabulary)
+    print(f"{len(frames)} invoices, {args.rows:,} rows\n")
+    print(f"{'policy':<8} {'merge (s)':>9} {'memory (MB)':>12}  dtypes")
+    for name, policy in DTYPE_POLICIES.items():
+        start = time.perf_counter()
+        merged = concat_line_items(frames, policy)
+        elapsed = time.perf_counter() - start
+        memory_mb = merged.memory_usage(deep=True).sum() / (1024 * 1024)
+        dtypes = ", ".join(f"{c}:{t}" for c, t in merged.dtypes.astype(str).items())
+        print(f"{name:<8} {elapsed:>9.2f} {memory_mb:>12.1f}  {dtypes}")
+        del merged
+
+
+if __name__ == "__main__":
+    main()
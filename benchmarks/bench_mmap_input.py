@@ -0,0 +1,88 @@
+"""
+bench_mmap_input.py
+Description:
+Peak RSS of parse_single_pdf for a very large PDF, comparing the old upload flow
+(getvalue() copy + temp file + re-read) with in-place and memory-mapped inputs.
+
+Usage:
+    python -m benchmarks.bench_mmap_input --size-mb 500
+"""
+
+import argparse
+import io
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MODES = {
+    "copy": "upload buffer -> getvalue() -> temp file -> parse from file (previous app.py flow)",
+    "buffer": "upload buffer parsed in place (app.py without OCR)",
+    "mmap": "path input memory-mapped by open_pdf (CLI / app.py with OCR)",
+}
+
+
+def run_child(mode: str, pdf_path: Path) -> None:
+    from scripts.parse_pdf_data import parse_single_pdf
+
+    out_dir = Path(tempfile.mkdtemp())
+    start = time.perf_counter()
+    if mode == "copy":
+        upload = io.BytesIO(pdf_path.read_bytes())
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            tmp.write(upload.getvalue())
+        tmp_path = Path(tmp.name)
+        try:
+            with open(tmp_path, "rb") as f:
+                parse_single_pdf(f, out_dir, name=pdf_path.name)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    elif mode == "buffer":
+        upload = io.BytesIO(pdf_path.read_bytes())
+        parse_single_pdf(upload, out_dir, name=pdf_path.name)
+    else:
+        parse_single_pdf(pdf_path, out_dir)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+    print(f"RESULT {peak_mb:.1f} {elapsed:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=500, help="Approximate size of the synthetic PDF")
+    parser.add_argument("--pdf", type=str, default=None, help="Use an existing PDF instead of a synthetic one")
+    parser.add_argument("--child", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, Path(args.pdf))
+        return
+
+    from scripts.synthetic_pdf import synthetic_invoice
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    if args.pdf:
+        pdf_path = Path(args.pdf)
+    else:
+        pdf_path = tmp_dir / "large_statement.pdf"
+        synthetic_invoice(pdf_path, invoice_pages=2, padding_bytes=args.size_mb * 1024 * 1024)
+    size_mb = pdf_path.stat().st_size / (1024 * 1024)
+    print(f"Input: {pdf_path} ({size_mb:.0f} MB)\n")
+    print(f"{'mode':<8} {'peak RSS (MB)':>14} {'time (s)':>9}  description")
+    for mode, description in MODES.items():
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_mmap_input", "--child", mode, "--pdf", str(pdf_path)],
+            capture_output=True, text=True, check=True,
+        )
+        line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("RESULT"))
+        peak, elapsed = line.split()[1:]
+        print(f"{mode:<8} {float(peak):>14.1f} {float(elapsed):>9.2f}  {description}")
+
+    if not args.pdf:
+        pdf_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
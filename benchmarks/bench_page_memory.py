@@ -0,0 +1,83 @@
+"""
+bench_page_memory.py
+Description:
+Memory profile of extract_tables_from_pdf over long documents, with and without
+releasing pdfplumber's per-page caches as the page loop advances.
+
+Usage:
+    python -m benchmarks.bench_page_memory --pages 250,1000,2000
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+def run_child(pdf_path: Path, release_pages: bool) -> None:
+    from scripts.parse_pdf_data import extract_tables_from_pdf
+
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            samples.append(current_rss_mb())
+            done.wait(0.25)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    baseline = current_rss_mb()
+    sampler.start()
+    start = time.perf_counter()
+    tables = extract_tables_from_pdf(pdf_path, release_pages=release_pages)
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+    # RSS at 25/50/75/100% of the run, relative to the pre-parse baseline
+    quartiles = [samples[min(len(samples) - 1, int(len(samples) * q))] - baseline for q in (0.25, 0.5, 0.75, 1.0)]
+    print("RESULT", f"{peak:.1f}", f"{elapsed:.2f}", len(tables), " ".join(f"{q:.0f}" for q in quartiles))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=str, default="250,1000,2000", help="Comma-separated page counts")
+    parser.add_argument("--rows", type=int, default=10, help="Line items per page")
+    parser.add_argument("--child", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--keep-cache", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(Path(args.child), release_pages=not args.keep_cache)
+        return
+
+    from scripts.synthetic_pdf import synthetic_invoice
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    print(f"{'pages':>6} {'page caches':<12} {'peak RSS (MB)':>14} {'time (s)':>9} {'tables':>7}  RSS growth at 25/50/75/100% (MB)")
+    for n_pages in [int(p) for p in args.pages.split(",")]:
+        pdf_path = tmp_dir / f"statement_{n_pages}.pdf"
+        synthetic_invoice(pdf_path, invoice_pages=n_pages, rows_per_page=args.rows)
+        for keep_cache in (True, False):
+            cmd = [sys.executable, "-m", "benchmarks.bench_page_memory", "--child", str(pdf_path)]
+            if keep_cache:
+                cmd.append("--keep-cache")
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("RESULT"))
+            peak, elapsed, n_tables, *growth = line.split()[1:]
+            label = "kept" if keep_cache else "released"
+            print(f"{n_pages:>6} {label:<12} {float(peak):>14.1f} {float(elapsed):>9.2f} {n_tables:>7}  {' / '.join(growth)}")
+        pdf_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+bench_prescan.py
+Description:
+Table extraction time on long statements (a cover page, a few invoice pages, many terms pages)
+without pre-scan and at each PRESCAN_LEVELS level (scripts/parse_pdf_data.py). Pre-scan signals
+come from the raw content stream, so skipped pages are never laid out by pdfminer. Also checks
+that every level keeps all line items.
+
+Usage:
+    python -m benchmarks.bench_prescan --terms-pages 26 --invoice-pages 1 --repeat 3
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from scripts.parse_pdf_data import PRESCAN_LEVELS, extract_tables_from_pdf
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def time_level(pdf_path: Path, level, repeat: int):
+    best, rows, audit = float("inf"), 0, {}
+    for _ in range(repeat):
+        audit = {}
+        start = time.perf_counter()
+        tables = extract_tables_from_pdf(pdf_path, prescan=level, audit=audit)
+        best = min(best, time.perf_counter() - start)
+        rows = sum(len(df) for df in tables)
+    return best, rows, audit.get("prescan", {}).get("pages_skipped", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoice-pages", type=int, default=1)
+    parser.add_argument("--terms-pages", type=int, default=26)
+    parser.add_argument("--rows-per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    truth = synthetic_invoice(Path(tempfile.mkdtemp()) / "statement.pdf", invoice_pages=args.invoice_pages,
+                              rows_per_page=args.rows_per_page, cover_pages=1, terms_pages=args.terms_pages)
+    print(f"{truth['pages']}-page statement, {args.invoice_pages} invoice page(s)\n")
+    print(f"{'prescan':<13} {'seconds':>8} {'pages skipped':>14} {'rows':>5}")
+    for level in (None, *PRESCAN_LEVELS):
+        seconds, rows, skipped = time_level(truth["path"], level, args.repeat)
+        print(f"{level or 'off':<13} {seconds:>8.2f} {skipped:>14} {rows:>5}")
+
+
+if __name__ == "__main__":
+    main()
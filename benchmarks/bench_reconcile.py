@@ -0,0 +1,85 @@
+"""
+bench_reconcile.py
+Description:
+Month-end reconciliation of a large synthetic batch (scripts/reconcile.py): one vectorized pass
+over the consolidated audit and line-item tables vs. the per-document route (record_total_validation
+on each document's line sum, as parse_single_pdf does). Injects known total mismatches,
+duplicate invoice numbers and outliers and checks they are all found.
+
+Usage:
+    python -m benchmarks.bench_reconcile --documents 300000 --lines-per-doc 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.parse_pdf_data import record_total_validation
+from scripts.reconcile import audits_to_frame, reconcile, summarize
+
+
+def make_batch(documents: int, lines_per_doc: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    files = np.array([f"doc_{i:07d}.pdf" for i in range(documents)], dtype=object)
+    n_lines = documents * lines_per_doc
+    line_total = np.round(rng.uniform(5, 500, n_lines), 2)
+    line_items = pd.DataFrame({
+        "file": pd.Categorical.from_codes(np.repeat(np.arange(documents), lines_per_doc), categories=files),
+        "quantity": np.ones(n_lines),
+        "unit_price": line_total,
+        "line_total": line_total,
+    })
+    totals = np.round(line_total.reshape(documents, lines_per_doc).sum(axis=1), 2)
+    mismatched = rng.choice(documents, documents // 1000, replace=False)
+    totals[mismatched] += 10.0
+    invoice_no = np.array([f"INV-{i:07d}" for i in range(documents)], dtype=object)
+    duplicated = rng.choice(documents, documents // 2000, replace=False)
+    invoice_no[duplicated] = invoice_no[(duplicated + 1) % documents]
+    totals[-1] = 1e9  # outlier (also a mismatch)
+    audits = [{"file": f, "invoice_no": n, "total": f"{t:,.2f}"} for f, n, t in zip(files, invoice_no, totals)]
+    return audits, line_items, len(set(mismatched) | {documents - 1})
+
+
+def per_document(audits, line_items):
+    """The per-document route: one group and one record_total_validation per audit."""
+    mismatches = 0
+    for (name, rows), audit in zip(line_items.groupby("file", observed=True, sort=False), audits):
+        audit = {**audit, "warnings": []}
+        record_total_validation(audit, audit, float(rows["line_total"].sum()))
+        mismatches += audit["invoice_total_matches"] is False
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300_000)
+    parser.add_argument("--lines-per-doc", type=int, default=10)
+    parser.add_argument("--per-document-sample", type=int, default=20_000,
+                        help="Documents timed through the per-document route (extrapolated to the batch)")
+    args = parser.parse_args()
+
+    audits, line_items, injected = make_batch(args.documents, args.lines_per_doc)
+    print(f"{args.documents} documents, {len(line_items)} line items, {injected} injected mismatches\n")
+
+    start = time.perf_counter()
+    report = reconcile(audits_to_frame(audits), line_items)
+    vectorized_s = time.perf_counter() - start
+    summary = summarize(report)
+
+    sample = min(args.per_document_sample, args.documents)
+    sample_items = line_items[line_items["file"].cat.codes < sample]
+    start = time.perf_counter()
+    found = per_document(audits[:sample], sample_items)
+    per_doc_s = (time.perf_counter() - start) * args.documents / sample
+
+    print(f"{'route':<24} {'seconds':>9}")
+    print(f"{'vectorized (all checks)':<24} {vectorized_s:>9.2f}")
+    print(f"{'per-document (totals)':<24} {per_doc_s:>9.2f}  (extrapolated from {sample} documents, {found} mismatches)")
+    print(f"\nSummary: {summary}")
+    print(f"All injected mismatches found: {summary['total_mismatch'] == injected}")
+
+
+if __name__ == "__main__":
+    main()
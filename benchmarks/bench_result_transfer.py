@@ -0,0 +1,125 @@
+"""
+bench_result_transfer.py
+Description:
+Cost of moving large line-item results from worker processes to the parent: pickled
+DataFrames through the pool's pipe + pd.concat, vs. Arrow IPC files in a shared-memory spool
+that the parent memory-maps and concatenates zero-copy (scripts/arrow_results.py).
+Workers build synthetic statement-sized results so only the transfer is measured.
+
+Usage:
+    python -m benchmarks.bench_result_transfer --documents 8 --rows-per-document 500000
+"""
+
+import argparse
+import pickle
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TRANSPORTS = {
+    "pickle": "DataFrame pickled through the pool pipe, pd.concat in the parent",
+    "arrow": "Arrow IPC file in /dev/shm, memory-mapped + concat_tables in the parent",
+}
+
+
+def make_rows(rows: int, seed: int):
+    """Columns shaped like a normalized line-item table."""
+    rng = np.random.default_rng(seed)
+    qty = rng.integers(1, 20, rows).astype("float64")
+    price = rng.integers(100, 200000, rows) / 100
+    return {
+        "description": [f"Item {i:05d} - standard service" for i in rng.integers(0, 20000, rows)],
+        "quantity": qty,
+        "page_number": (np.arange(rows) // 40 + 1).astype("int64"),
+        "unit_price": price,
+        "line_total": qty * price,
+    }
+
+
+def pickle_worker(rows: int, seed: int):
+    import pandas as pd
+
+    df = pd.DataFrame(make_rows(rows, seed))
+    start = time.perf_counter()
+    payload = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    return payload, time.perf_counter() - start
+
+
+def arrow_worker(rows: int, seed: int, spool_dir: str):
+    import pyarrow as pa
+    from pathlib import Path
+
+    from scripts.arrow_results import write_arrow
+
+    columns = make_rows(rows, seed)
+    table = pa.table({c: pa.array(v) for c, v in columns.items()})
+    start = time.perf_counter()
+    handle = write_arrow(table, Path(spool_dir) / f"{seed:06d}.arrow")
+    return handle, time.perf_counter() - start
+
+
+def run_child(transport: str, documents: int, rows: int, workers: int):
+    seeds = list(range(documents))
+    start = time.perf_counter()
+    if transport == "pickle":
+        import pandas as pd
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(pickle_worker, [rows] * documents, seeds))
+        parent_start = time.perf_counter()
+        merged = pd.concat([pickle.loads(payload) for payload, _ in results], ignore_index=True)
+        n_rows = len(merged)
+    else:
+        from scripts.arrow_results import ArrowSpool, concat_arrow_results
+
+        spool = ArrowSpool()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(arrow_worker, [rows] * documents, seeds, [str(spool.path)] * documents))
+        parent_start = time.perf_counter()
+        merged = concat_arrow_results([handle for handle, _ in results])
+        n_rows = merged.num_rows
+    end = time.perf_counter()
+    worker_serialize = sum(t for _, t in results)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+    print("RESULT", n_rows, f"{worker_serialize:.3f}", f"{end - parent_start:.3f}", f"{end - start:.3f}", f"{peak:.1f}")
+    if transport == "arrow":
+        spool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--rows-per-document", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", choices=sorted(TRANSPORTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.documents, args.rows_per_document, args.workers)
+        return
+
+    total = args.documents * args.rows_per_document
+    print(f"{args.documents} documents x {args.rows_per_document:,} rows = {total:,} rows, {args.workers} workers\n")
+    print(f"{'transport':<10} {'worker serialize (s)':>21} {'parent receive+merge (s)':>25} "
+          f"{'total (s)':>10} {'parent peak RSS (MB)':>21}")
+    for transport, description in TRANSPORTS.items():
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_result_transfer", "--child", transport,
+             "--documents", str(args.documents), "--rows-per-document", str(args.rows_per_document),
+             "--workers", str(args.workers)],
+            capture_output=True, text=True, check=True,
+        )
+        line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("RESULT"))
+        _, serialize, parent, wall, peak = line.split()[1:]
+        print(f"{transport:<10} {float(serialize):>21.2f} {float(parent):>25.2f} {float(wall):>10.2f} {float(peak):>21.1f}")
+    print()
+    for transport, description in TRANSPORTS.items():
+        print(f"{transport}: {description}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+bench_scheduling.py
+Description:
+Queue wait in a mixed batch under each scheduling policy (scripts/scheduler.py): a few long
+statements submitted first, a stream of one-page invoices from another owner behind them, and
+an interactive upload arriving while the batch is running. Reports mean/p95 wait of the small invoices, the wait of
+the interactive upload and the batch makespan, plus the cost of estimating every document at submit time.
+
+Usage:
+    python -m benchmarks.bench_scheduling --statements 4 --statement-pages 50 --invoices 40 --workers 1
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.scheduler import SCHEDULING_POLICIES, Scheduler, estimate_cost
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def run_policy(policy: str, statements, invoices, upload: Path, workers: int, upload_after: float, out: Path):
+    scheduler = Scheduler(policy=policy, workers=workers)
+    for pdf_path in statements:
+        scheduler.submit(pdf_path, out / policy, owner="statements")
+    for pdf_path in invoices:
+        scheduler.submit(pdf_path, out / policy, owner="invoices")
+
+    def upload_later():
+        time.sleep(upload_after)
+        scheduler.submit(upload, out / policy, priority="interactive", owner="ui")
+
+    uploader = threading.Thread(target=upload_later)
+    start = time.time()
+    uploader.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler.run()  # picks up the upload when it arrives; the batch outlasts upload_after
+    makespan = time.time() - start
+    uploader.join()
+
+    small = np.array([d.wait_s for d in scheduler.docs if d.owner == "invoices"])
+    upload_doc = next(d for d in scheduler.docs if d.priority == "interactive")
+    return small.mean(), np.percentile(small, 95), upload_doc.wait_s, makespan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=4)
+    parser.add_argument("--statement-pages", type=int, default=50)
+    parser.add_argument("--invoices", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--upload-after", type=float, default=0.5, help="Seconds into the batch the upload arrives")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    statements = [synthetic_invoice(tmp / f"statement_{i}.pdf", invoice_pages=args.statement_pages, rows_per_page=20,
+                                    seed=100 + i)["path"] for i in range(args.statements)]
+    invoices = [synthetic_invoice(tmp / f"inv_{i:03d}.pdf", seed=i)["path"] for i in range(args.invoices)]
+    upload = synthetic_invoice(tmp / "upload.pdf", invoice_pages=2, seed=999)["path"]
+
+    print(f"{args.statements} x {args.statement_pages}-page statements, {args.invoices} one-page invoices, "
+          f"upload at +{args.upload_after}s, {args.workers} worker(s)")
+    docs = statements + invoices + [upload]
+    start = time.perf_counter()
+    for pdf_path in docs:
+        estimate_cost(pdf_path)
+    print(f"cost estimates: {(time.perf_counter() - start) / len(docs) * 1000:.2f} ms per document\n")
+    print(f"{'policy':<7} {'invoice wait mean (s)':>22} {'invoice wait p95 (s)':>21} {'upload wait (s)':>16} "
+          f"{'makespan (s)':>13}")
+    for policy in SCHEDULING_POLICIES:
+        mean, p95, upload_wait, makespan = run_policy(policy, statements, invoices, upload, args.workers,
+                                                      args.upload_after, tmp / "out")
+        print(f"{policy:<7} {mean:>22.2f} {p95:>21.2f} {upload_wait:>16.2f} {makespan:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
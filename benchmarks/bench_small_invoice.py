@@ -0,0 +1,68 @@
+"""
+bench_small_invoice.py
+Description:
+Per-document latency of parse_single_pdf for small invoices (the one-page, three-line mock
+invoice and similar synthetic ones), comparing the pandas pipeline with the pandas-free
+row pipeline. Both engines write identical CSV and audit files; this checks that too.
+
+Usage:
+    python -m benchmarks.bench_small_invoice --repeat 200
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.parse_pdf_data import PARSE_ENGINES, parse_single_pdf
+
+MOCK_INVOICE = Path(__file__).resolve().parent.parent / "data" / "raw" / "mock_invoice_01.pdf"
+
+
+def time_engine(pdf_path: Path, engine: str, repeat: int, out_dir: Path) -> np.ndarray:
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        parse_single_pdf(pdf_path, out_dir, engine=engine)  # warm-up: imports, pdfminer caches
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse_single_pdf(pdf_path, out_dir, engine=engine)
+            timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed parses per document and engine")
+    parser.add_argument("--rows", type=str, default="3,10", help="Line items of the synthetic one-page invoices")
+    args = parser.parse_args()
+
+    from scripts.synthetic_pdf import synthetic_invoice
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    docs = [MOCK_INVOICE] if MOCK_INVOICE.exists() else []
+    for n in [int(r) for r in args.rows.split(",")]:
+        docs.append(synthetic_invoice(tmp_dir / f"invoice_{n}_rows.pdf", rows_per_page=n)["path"])
+
+    print(f"{'document':<24} {'engine':<7} {'mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'speedup':>8}  output")
+    for pdf_path in docs:
+        results = {}
+        for engine in PARSE_ENGINES:
+            out_dir = tmp_dir / engine
+            results[engine] = time_engine(pdf_path, engine, args.repeat, out_dir)
+        stem = pdf_path.stem
+        identical = all(
+            (tmp_dir / "rows" / f).read_bytes() == (tmp_dir / "pandas" / f).read_bytes()
+            for f in (f"{stem}.csv", f"audit_{stem}.json")
+        )
+        base = results["pandas"].mean()
+        for engine, ms in results.items():
+            print(f"{pdf_path.name:<24} {engine:<7} {ms.mean():>10.2f} {np.percentile(ms, 50):>9.2f} "
+                  f"{np.percentile(ms, 95):>9.2f} {base / ms.mean():>7.2f}x  {'identical' if identical else 'DIFFERS'}")
+
+
+if __name__ == "__main__":
+    main()
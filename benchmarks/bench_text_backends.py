@@ -0,0 +1,79 @@
+"""
+bench_text_backends.py
+Description:
+Text extraction throughput per text backend (TEXT_BACKENDS in scripts/parse_pdf_data.py) on
+a synthetic corpus: every page's text layer read through pdfplumber (pdfminer layout analysis
+in Python) vs. PDFium (native, via pypdfium2). Also times the full parse with each backend
+(key-values + text-table fallback; tables are always detected by pdfplumber) and checks that
+both write identical files.
+
+Usage:
+    python -m benchmarks.bench_text_backends --documents 40 --max-pages 8
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from scripts.parse_pdf_data import TEXT_BACKENDS, open_text_document, parse_single_pdf
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def make_corpus(directory: Path, documents: int, max_pages: int):
+    """Mixed invoices: ruled (pdfplumber tables) and unruled (text fallback), with cover/terms pages."""
+    return [
+        synthetic_invoice(directory / f"doc_{i:03d}.pdf", invoice_pages=1 + i % max_pages, rows_per_page=3 + i % 15,
+                          cover_pages=i % 2, terms_pages=i % 3 == 0, ruled=i % 2 == 0, seed=i)["path"]
+        for i in range(documents)
+    ]
+
+
+def time_text(backend: str, docs):
+    pages = chars = 0
+    start = time.perf_counter()
+    for doc in docs:
+        with open_text_document(doc, backend) as document:
+            for page_no in range(1, document.n_pages + 1):
+                chars += len(document.page_text(page_no))
+            pages += document.n_pages
+    return pages, chars, time.perf_counter() - start
+
+
+def time_parse(backend: str, docs, output_dir: Path):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for doc in docs:
+            parse_single_pdf(doc, output_dir / backend, text_backend=backend)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--max-pages", type=int, default=8, help="Invoice pages cycle from 1 to this")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    docs = make_corpus(tmp / "corpus", args.documents, args.max_pages)
+
+    print(f"{args.documents} synthetic documents\n")
+    print(f"{'backend':<11} {'pages':>6} {'chars':>9} {'text (s)':>9} {'pages/s':>9} {'full parse (s)':>15}")
+    for backend in TEXT_BACKENDS:
+        time_text(backend, docs[:2])  # warm-up (imports, font caches)
+        pages, chars, elapsed = time_text(backend, docs)
+        parse_s = time_parse(backend, docs, tmp / "out")
+        print(f"{backend:<11} {pages:>6} {chars:>9} {elapsed:>9.2f} {pages / elapsed:>9.0f} {parse_s:>15.2f}")
+
+    backends = list(TEXT_BACKENDS)
+    differing = [
+        f.name for f in sorted((tmp / "out" / backends[0]).iterdir())
+        if (tmp / "out" / backends[1] / f.name).read_bytes() != f.read_bytes()
+    ]
+    print(f"\nOutput files differing between backends: {len(differing)}" + (f" ({', '.join(differing)})" if differing else ""))
+
+
+if __name__ == "__main__":
+    main()
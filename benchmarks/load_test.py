@@ -0,0 +1,352 @@
+"""
+load_test.py
+Description:
+Load generator for the parsing entry point. Replays a corpus of PDFs (the mock invoice plus
+synthetic invoices) as uploads at a configurable concurrency and arrival rate, and reports
+throughput, latency percentiles, error rate and server RSS over time.
+
+Targets:
+    inprocess  parse_single_pdf on the upload buffer in a thread pool, as app.py does
+               (Streamlit serves every session from a thread of one process)
+    streamlit  the full app.py script through streamlit.testing.v1.AppTest, with the file
+               uploader fed from the corpus
+    http       POST /parse on a parsing endpoint; without --url a local one is started
+               (python -m benchmarks.load_test --serve 8765 runs it standalone)
+
+Latency is measured from each request's scheduled arrival, so it includes time queued
+behind busy workers. --rate 0 runs closed-loop: every worker sends back to back.
+
+Usage:
+    python -m benchmarks.load_test --target inprocess --concurrency 8 --rate 20 --requests 400
+    python -m benchmarks.load_test --target streamlit --concurrency 4 --requests 100
+    python -m benchmarks.load_test --target http --concurrency 16 --rate 0 --requests 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from shutil import rmtree
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MOCK_INVOICE = REPO_ROOT / "data" / "raw" / "mock_invoice_01.pdf"
+UPLOAD_STATE_KEY = "load_test_upload"
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+def build_corpus(synthetic: int, pages: str = "1,3,10", seed: int = 0) -> list:
+    """[(file name, PDF bytes)]: the mock invoice plus `synthetic` invoices cycling through `pages` sizes."""
+    from scripts.synthetic_pdf import synthetic_invoice
+
+    corpus = []
+    if MOCK_INVOICE.exists():
+        corpus.append((MOCK_INVOICE.name, MOCK_INVOICE.read_bytes()))
+    sizes = [int(p) for p in pages.split(",")]
+    tmp_dir = Path(tempfile.mkdtemp())
+    for i in range(synthetic):
+        doc = synthetic_invoice(tmp_dir / f"synthetic_{i:03d}.pdf", invoice_pages=sizes[i % len(sizes)], seed=seed + i)
+        corpus.append((doc["path"].name, doc["path"].read_bytes()))
+    rmtree(tmp_dir, ignore_errors=True)
+    return corpus
+
+
+class NamedUpload(io.BytesIO):
+    """In-memory upload with the parts of Streamlit's UploadedFile that app.py uses."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def parse_upload(name: str, data: bytes) -> dict:
+    """Parse one upload the way app.py does (in place, into a throwaway output directory)."""
+    from scripts.parse_pdf_data import parse_single_pdf
+
+    output_dir = Path(tempfile.mkdtemp())
+    try:
+        return parse_single_pdf(NamedUpload(data, name), output_dir, name=name)
+    finally:
+        rmtree(output_dir, ignore_errors=True)
+
+
+# ---------------------------
+# Targets
+# ---------------------------
+class InProcessTarget:
+    def __call__(self, name: str, data: bytes):
+        parse_upload(name, data)
+
+    def rss_mb(self) -> float:
+        return current_rss_mb()
+
+    def close(self):
+        pass
+
+
+class StreamlitTarget:
+    """
+    Runs app.py with AppTest. AppTest has no file-uploader driver, so st.file_uploader is
+    replaced by one that returns the upload stored in the run's session state.
+    """
+
+    def __init__(self, app_path: Path = REPO_ROOT / "app.py", timeout: float = 120):
+        try:
+            import streamlit as st
+            from streamlit.logger import set_log_level
+            from streamlit.testing.v1 import AppTest
+        except ImportError as e:
+            raise SystemExit(f"The streamlit target needs streamlit installed ({e})")
+        set_log_level("error")  # bare-mode AppTest warns about a missing ScriptRunContext on every run
+
+        def file_uploader(label, *args, **kwargs):
+            upload = st.session_state.get(UPLOAD_STATE_KEY)
+            return NamedUpload(upload[1], upload[0]) if upload else None
+
+        st.file_uploader = file_uploader
+        os.chdir(REPO_ROOT)  # app.py loads banner.png and data/ relative to the repo root
+        self.app_test = AppTest
+        self.app_path = str(app_path)
+        self.timeout = timeout
+
+    def __call__(self, name: str, data: bytes):
+        at = self.app_test.from_file(self.app_path, default_timeout=self.timeout)
+        at.session_state[UPLOAD_STATE_KEY] = (name, data)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if at.error:
+            raise RuntimeError(at.error[0].value)
+        if not at.success:
+            raise RuntimeError("app finished without a parse result")
+
+    def rss_mb(self) -> float:
+        return current_rss_mb()
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """POSTs uploads to <url>/parse; starts a local endpoint in a subprocess when url is None."""
+
+    def __init__(self, url: str = None, port: int = 8765, timeout: float = 300):
+        self.timeout = timeout
+        self.server = None
+        if url is None:
+            self.server = subprocess.Popen([sys.executable, "-m", "benchmarks.load_test", "--serve", str(port)],
+                                           cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+            url = f"http://127.0.0.1:{port}"
+            self._wait_ready(url)
+        self.url = url.rstrip("/")
+
+    def _wait_ready(self, url: str, attempts: int = 100):
+        for _ in range(attempts):
+            try:
+                urllib.request.urlopen(f"{url}/stats", timeout=1).read()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"Endpoint {url} did not come up")
+
+    def __call__(self, name: str, data: bytes):
+        request = urllib.request.Request(f"{self.url}/parse", data=data, method="POST",
+                                         headers={"Content-Type": "application/pdf", "X-Filename": name})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            json.loads(response.read())
+
+    def rss_mb(self) -> float:
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=5) as response:
+            return json.loads(response.read())["rss_mb"]
+
+    def close(self):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+
+
+class ParseHandler(BaseHTTPRequestHandler):
+    """POST /parse (body: PDF bytes, X-Filename header) -> audit JSON; GET /stats -> server RSS."""
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._reply(404, {"error": "not found"})
+        self._reply(200, {"rss_mb": current_rss_mb(), "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+    def do_POST(self):
+        if self.path != "/parse":
+            return self._reply(404, {"error": "not found"})
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            audit = parse_upload(self.headers.get("X-Filename", "upload.pdf"), data)
+        except Exception as e:
+            return self._reply(500, {"error": str(e)})
+        self._reply(200, audit)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int):
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        ThreadingHTTPServer(("127.0.0.1", port), ParseHandler).serve_forever()
+
+
+# ---------------------------
+# Load generation
+# ---------------------------
+def run_load(target, corpus: list, requests: int, concurrency: int, rate: float,
+             sample_interval: float = 0.5, seed: int = 0) -> dict:
+    """
+    Send `requests` uploads drawn round-robin from `corpus`.
+    - rate: mean arrivals per second (Poisson); 0 = closed loop, all requests queued at once
+    Returns per-request records plus the RSS timeline.
+    """
+    rng = np.random.default_rng(seed)
+    if rate > 0:
+        arrivals = np.cumsum(rng.exponential(1 / rate, requests))
+    else:
+        arrivals = np.zeros(requests)
+    records = [None] * requests
+    rss = []
+    done = threading.Event()
+
+    def sample():
+        while True:
+            try:
+                rss.append((time.perf_counter() - t0, target.rss_mb()))
+            except OSError:
+                pass
+            if done.wait(sample_interval):
+                return
+
+    def send(i: int):
+        name, data = corpus[i % len(corpus)]
+        start = time.perf_counter()
+        error = None
+        try:
+            target(name, data)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        arrival = t0 + arrivals[i] if rate > 0 else start
+        records[i] = {"file": name, "latency": end - arrival, "service": end - start, "error": error}
+
+    t0 = time.perf_counter()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # parse_single_pdf progress lines
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(requests):
+                delay = t0 + arrivals[i] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, i)
+    elapsed = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    return {"records": records, "elapsed": elapsed, "rss": rss}
+
+
+def summarize(result: dict) -> dict:
+    records = result["records"]
+    ok = [r for r in records if r["error"] is None]
+    latency = np.array([r["latency"] for r in ok]) if ok else np.array([np.nan])
+    service = np.array([r["service"] for r in ok]) if ok else np.array([np.nan])
+    rss = [mb for _, mb in result["rss"]]
+    errors = [r["error"] for r in records if r["error"] is not None]
+    return {
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(records) if records else 0.0,
+        "first_errors": sorted(set(errors))[:3],
+        "elapsed_s": result["elapsed"],
+        "throughput_rps": len(ok) / result["elapsed"],
+        "latency_ms": {f"p{q}": float(np.percentile(latency, q) * 1000) for q in (50, 90, 95, 99)}
+                      | {"max": float(latency.max() * 1000)},
+        "service_ms_p50": float(np.percentile(service, 50) * 1000),
+        "rss_mb": {"start": rss[0], "peak": max(rss), "end": rss[-1]} if rss else None,
+        "rss_timeline": [(round(t, 2), round(mb, 1)) for t, mb in result["rss"]],
+    }
+
+
+def print_report(summary: dict, timeline_points: int = 10):
+    lat = summary["latency_ms"]
+    print(f"requests      {summary['requests']}  ({summary['errors']} errors, {summary['error_rate']:.1%})")
+    for error in summary["first_errors"]:
+        print(f"  error       {error}")
+    print(f"elapsed       {summary['elapsed_s']:.2f} s")
+    print(f"throughput    {summary['throughput_rps']:.2f} req/s")
+    print(f"latency (ms)  p50 {lat['p50']:.0f}  p90 {lat['p90']:.0f}  p95 {lat['p95']:.0f}  "
+          f"p99 {lat['p99']:.0f}  max {lat['max']:.0f}  (service p50 {summary['service_ms_p50']:.0f})")
+    if summary["rss_mb"]:
+        rss = summary["rss_mb"]
+        print(f"server RSS    start {rss['start']:.0f} MB  peak {rss['peak']:.0f} MB  end {rss['end']:.0f} MB")
+        timeline = summary["rss_timeline"]
+        step = max(1, len(timeline) // timeline_points)
+        print("RSS over time " + "  ".join(f"{t:.0f}s:{mb:.0f}" for t, mb in timeline[::step]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["inprocess", "streamlit", "http"], default="inprocess")
+    parser.add_argument("--url", type=str, default=None, help="Parsing endpoint for --target http (default: start one)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally started endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at most")
+    parser.add_argument("--rate", type=float, default=0.0, help="Mean arrivals per second (0 = closed loop)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--synthetic", type=int, default=8, help="Synthetic invoices added to the corpus")
+    parser.add_argument("--pages", type=str, default="1,3,10", help="Page counts cycled through by synthetic invoices")
+    parser.add_argument("--json", type=str, default=None, help="Also write the summary to this file")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="Run the parsing endpoint only")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    corpus = build_corpus(args.synthetic, args.pages)
+    if args.target == "inprocess":
+        target = InProcessTarget()
+    elif args.target == "streamlit":
+        target = StreamlitTarget()
+    else:
+        target = HttpTarget(args.url, port=args.port)
+    mode = f"{args.rate:g} req/s" if args.rate > 0 else "closed loop"
+    print(f"Target: {args.target} | corpus: {len(corpus)} PDFs | concurrency {args.concurrency} | {mode}\n")
+    try:
+        summary = summarize(run_load(target, corpus, args.requests, args.concurrency, args.rate))
+    finally:
+        target.close()
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
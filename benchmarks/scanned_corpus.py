@@ -0,0 +1,56 @@
+"""
+scanned_corpus.py
+Description:
+Builds "scanned" (image-only) versions of synthetic invoices for OCR benchmarks.
+Needs poppler (pdf2image) and Pillow.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def rasterize_pdf(src: Path, dst: Path, dpi: int = 200, noise: float = 0.0, seed: int = 0) -> Path:
+    """
+    Render every page of `src` to an image and save them as an image-only PDF at `dst`.
+    - noise: standard deviation of Gaussian pixel noise (0-255 scale) added to simulate poor scans
+    """
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for img in convert_from_path(str(src), dpi=dpi):
+        if noise:
+            pixels = np.asarray(img.convert("L"), dtype=np.float32)
+            pixels += rng.normal(0, noise, pixels.shape)
+            img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        images.append(img.convert("RGB"))
+    images[0].save(dst, save_all=True, append_images=images[1:], resolution=dpi)
+    return Path(dst)
+
+
+def page_texts(pdf_path: Path):
+    """Ground-truth text per page from the text layer of the original PDF."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def build_scanned_corpus(out_dir: Path, documents: int = 5, noisy_every: int = 2, pages: int = 1):
+    """
+    Write `documents` scanned synthetic invoices; every `noisy_every`-th one gets heavy noise.
+    Returns a list of (scanned_pdf, [ground-truth text per page]).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for i in range(documents):
+        truth = synthetic_invoice(out_dir / f"text_{i:03d}.pdf", invoice_pages=pages, rows_per_page=8, seed=i)
+        noise = 40.0 if noisy_every and i % noisy_every == noisy_every - 1 else 0.0
+        scanned = rasterize_pdf(truth["path"], out_dir / f"scan_{i:03d}.pdf", noise=noise, seed=i)
+        corpus.append((scanned, page_texts(truth["path"])))
+    return corpus
@@ -0,0 +1,162 @@
+"""
+arrow_results.py
+Description:
+Process-pool batch parsing that returns line items as Arrow data in shared memory instead of
+pickled DataFrames. Each worker writes its document's rows as an Arrow IPC (Feather v2) file
+in a spool directory (under /dev/shm when available) and sends back only a small handle and
+the audit dict. The parent memory-maps the files and concatenates them without copying.
+
+pyarrow ships with streamlit; it is imported lazily so the rest of the parser does not need it.
+
+Usage:
+    python -m scripts.arrow_results --input data/raw --output data/extracted/line_items.feather --workers 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from scripts.parse_pdf_data import iter_pdf_files, parse_pdf_to_rows, pdf_document_id, pdf_source_name
+
+SHARED_MEMORY_DIR = Path("/dev/shm")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Arrow result transfer needs pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+class ArrowSpool:
+    """
+    Directory of per-document Arrow IPC files shared by worker processes and the parent.
+    - root: parent directory for the spool; defaults to /dev/shm (RAM-backed) when it exists
+    Tables read from the spool are memory-mapped: keep the spool open while they are in use
+    (or write the consolidated result out) and close it to free the space.
+    """
+
+    def __init__(self, root=None):
+        if root is None and SHARED_MEMORY_DIR.is_dir():
+            root = SHARED_MEMORY_DIR
+        self.path = Path(tempfile.mkdtemp(prefix="pdfparser_spool_", dir=root))
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def rows_to_arrow(table, document_id: str = None):
+    """RowTable -> pyarrow.Table without going through pandas; adds a dictionary-encoded "file"
+    column holding document_id (the audits' "document_id", which reconcile joins on)."""
+    pa = _pyarrow()
+    arrays = {}
+    for c in table.columns:
+        values = table.column(c)
+        try:
+            arrays[c] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):  # mixed-type text column
+            arrays[c] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    if document_id is not None:
+        arrays["file"] = pa.DictionaryArray.from_arrays(
+            pa.array([0] * len(table), type=pa.int32()), pa.array([document_id])
+        )
+    return pa.table(arrays)
+
+
+def write_arrow(arrow_table, path: Path) -> dict:
+    """Write an uncompressed Arrow IPC file (so it can be mapped zero-copy); returns its handle."""
+    pa = _pyarrow()
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return {"path": str(path), "rows": arrow_table.num_rows}
+
+
+def read_arrow(handle: dict):
+    """Memory-map a handle's IPC file; the returned table's buffers point into the mapping."""
+    pa = _pyarrow()
+    return pa.ipc.open_file(pa.memory_map(handle["path"], "r")).read_all()
+
+
+def parse_to_spool(pdf_path, spool_dir: str, index: int, parse_kwargs: dict):
+    """Worker: parse one PDF into the spool; returns (handle or None, audit)."""
+    name = pdf_source_name(pdf_path)
+    table, audit = parse_pdf_to_rows(pdf_path, name=name, **parse_kwargs)
+    audit["document_id"] = pdf_document_id(pdf_path, name)
+    if table is None:
+        return None, audit
+    path = Path(spool_dir) / f"{index:06d}.arrow"
+    return write_arrow(rows_to_arrow(table, audit["document_id"]), path), audit
+
+
+def failed_audit(pdf_path, error: Exception) -> dict:
+    """Audit for a document whose parse raised, in parse_pdf_to_rows's shape."""
+    message = f"{type(error).__name__}: {error}"
+    return {"file": pdf_source_name(pdf_path), "pages": 0, "tables_found": 0,
+            "warnings": [f"Parse failed: {message}"], "error": message, "document_id": pdf_document_id(pdf_path)}
+
+
+def concat_arrow_results(handles):
+    """Map every handle and concatenate (zero-copy: the result is chunked over the mappings)."""
+    pa = _pyarrow()
+    tables = [read_arrow(h) for h in handles if h is not None]
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def parse_pdfs_to_arrow(pdf_paths, spool: ArrowSpool, workers: int = 4, **parse_kwargs):
+    """
+    Parse PDFs in a process pool with results transferred through `spool`.
+    Returns (pyarrow.Table of all line items with a "file" column of document ids, or None; list of audits).
+    A document whose parse raises contributes no rows; its audit records the error instead.
+    - parse_kwargs: passed to parse_pdf_to_rows (prescan, table_strategy, ocr_mode, ...)
+    """
+    pdf_paths = list(pdf_paths)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_to_spool, pdf_path, str(spool.path), index, parse_kwargs)
+                   for index, pdf_path in enumerate(pdf_paths)]
+        for pdf_path, future in zip(pdf_paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ Failed: {Path(pdf_path).name} ({e})")
+                results.append((None, failed_audit(pdf_path, e)))
+    handles = [handle for handle, _ in results]
+    return concat_arrow_results(handles), [audit for _, audit in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a directory of PDFs into one consolidated Feather file.")
+    parser.add_argument("--input", type=str, default="data/raw", help="Input directory containing PDFs")
+    parser.add_argument("--output", type=str, default="data/extracted/line_items.feather",
+                        help="Consolidated line items (Feather); audits go to <output stem>_audits.json")
+    parser.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=True,
+                        help="Include PDFs in subdirectories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    import pyarrow.feather as feather
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with ArrowSpool() as spool:
+        table, audits = parse_pdfs_to_arrow(sorted(iter_pdf_files(Path(args.input), args.recursive)), spool,
+                                            workers=args.workers)
+        if table is not None:
+            feather.write_feather(table, str(output))
+            print(f"✅ Exported: {output} ({table.num_rows} rows)")
+    with open(output.with_name(f"{output.stem}_audits.json"), "w", encoding="utf-8") as f:
+        json.dump(audits, f, indent=4)
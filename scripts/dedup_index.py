@@ -0,0 +1,328 @@
+"""
+dedup_index.py
+Description:
+Near-duplicate document index. Re-sent or re-scanned invoices are byte-different but
+content-identical; this fingerprints the first content page (the first page prescan_page keeps,
+so shared cover / terms / blank pages are skipped) with MinHash, over word shingles for text
+pages or over the set bits of a content-cropped difference hash for scans. Near-duplicates are
+found with locality-sensitive hashing in SQLite, and a stored parse result is only reused after
+its invoice number and total match the new document's (text layer, or OCR of the fingerprinted
+page for scans).
+
+Usage:
+    python -m scripts.dedup_index --input data/raw --output data/extracted --index data/dedup.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+from scripts.parse_pdf_data import (
+    extract_key_values_from_text,
+    iter_pdf_files,
+    match_key_values,
+    mirrored_output_dir,
+    ocr_pdf_to_text,
+    open_pdf,
+    parse_single_pdf,
+    pdf_document_id,
+    pdf_source_name,
+    prescan_page,
+    to_number,
+)
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs with Jaccard ~0.7+ almost always share a band
+IMAGE_HASH_SIZE = 32  # 32x32-cell difference hash of the content area (1024 bits)
+IMAGE_DPI = 100
+FINGERPRINT_PRESCAN = "balanced"  # prescan_page level that picks the fingerprinted page
+MAX_CANDIDATES = 50
+_PRIME = 4294967311  # smallest prime above 2**32
+_rng = np.random.default_rng(20251111)
+_PERM_A = _rng.integers(1, 2**31, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2**31, NUM_PERM, dtype=np.uint64)
+
+
+def _hash32(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def text_shingles(text: str, k: int = SHINGLE_WORDS) -> set:
+    """Lower-cased k-word shingles; whitespace and punctuation differences are ignored."""
+    words = re.findall(r"[a-z0-9]+(?:[.,/-][a-z0-9]+)*", text.lower())
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash_signature(shingles: set) -> np.ndarray:
+    """NUM_PERM-value MinHash signature (uint32) of a shingle set."""
+    hashes = np.fromiter((_hash32(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * h + b) mod p stays below 2**63 because a < 2**31 and h < 2**32
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def dhash_bits(img, size: int = IMAGE_HASH_SIZE, margin: int = 8) -> set:
+    """
+    Difference hash of a PIL page image as the set of its set bit positions. The page is first
+    cropped to its content (rows / columns with ink), so the hash covers text rather than margins,
+    then area-averaged to (size + 1) x size cells; a bit is set where a cell differs from its right
+    neighbour by more than `margin` (flat paper regions stay unset under scan noise).
+    """
+    from PIL import Image
+
+    gray = img.convert("L")
+    ink = np.asarray(gray) < 200
+    rows = np.flatnonzero(ink.sum(axis=1) > max(1, int(ink.shape[1] * 0.002)))
+    cols = np.flatnonzero(ink.sum(axis=0) > max(1, int(ink.shape[0] * 0.002)))
+    if rows.size == 0 or cols.size == 0:
+        return set()
+    gray = gray.crop((int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1))
+    pixels = np.asarray(gray.resize((size + 1, size), Image.BOX), dtype=np.int16)
+    bits = np.abs(pixels[:, :-1] - pixels[:, 1:]) > margin
+    return set(np.flatnonzero(bits).tolist())
+
+
+def image_fingerprint(img, page: int = 1):
+    """Fingerprint of a rendered page: MinHash over dhash_bits; None for a blank page."""
+    bits = dhash_bits(img)
+    if not bits:
+        return None
+    return {"kind": "image", "signature": minhash_signature({str(b) for b in bits}), "page": page}
+
+
+def fingerprint_page(pdf):
+    """(page number, text layer) of the first page prescan_page keeps; page 1 when none is kept."""
+    for page in pdf.pages:
+        keep, _ = prescan_page(page, FINGERPRINT_PRESCAN)
+        if keep:
+            return page.page_number, page.extract_text() or ""
+    return 1, pdf.pages[0].extract_text() or ""
+
+
+def document_fingerprint(pdf_path, poppler_path: str = None):
+    """
+    Fingerprint of a document's first content page (see fingerprint_page).
+    Returns {"kind": "text" | "image", "signature": ndarray, "page": int};
+    None when the page has no text and cannot be rendered.
+    """
+    with open_pdf(pdf_path) as pdf:
+        if not pdf.pages:
+            return None
+        page_no, text = fingerprint_page(pdf)
+    shingles = text_shingles(text)
+    if shingles:
+        return {"kind": "text", "signature": minhash_signature(shingles), "page": page_no}
+    if not isinstance(pdf_path, (str, Path)):
+        return None  # rendering a scanned page needs a file on disk
+    try:
+        from pdf2image import convert_from_path
+        kwargs = {"first_page": page_no, "last_page": page_no, "dpi": IMAGE_DPI, "grayscale": True}
+        if poppler_path:
+            kwargs["poppler_path"] = poppler_path
+        pages = convert_from_path(str(pdf_path), **kwargs)
+        return image_fingerprint(pages[0], page_no) if pages else None
+    except Exception:
+        return None
+
+
+def confirm_key_values(metadata: dict) -> dict:
+    """Invoice number and total of a key-value dict (or audit), normalized for comparison."""
+    invoice_no = metadata.get("invoice_no")
+    total = to_number(metadata.get("total"))
+    return {
+        "invoice_no": str(invoice_no).strip().upper() if invoice_no else None,
+        "total": round(total, 2) if total is not None else None,
+    }
+
+
+def document_key_values(pdf_path, fingerprint) -> dict:
+    """
+    Key-values that confirm a match: from the text layer (first / last page, as the parser reads
+    them), or from OCR of the fingerprinted page when the document is a scan.
+    """
+    if fingerprint["kind"] == "text":
+        return confirm_key_values(extract_key_values_from_text(pdf_path))
+    text = ocr_pdf_to_text(Path(pdf_path), fingerprint["page"], mode="regions")
+    return confirm_key_values(match_key_values(lambda page_no: text, 1))
+
+
+def band_keys(fingerprint) -> list:
+    """(band, key) pairs used for the LSH lookup table; text and image fingerprints use separate bands."""
+    rows = NUM_PERM // BANDS
+    offset = 0 if fingerprint["kind"] == "text" else BANDS
+    sig = fingerprint["signature"]
+    return [
+        (offset + b, int.from_bytes(hashlib.blake2b(sig[b * rows:(b + 1) * rows].tobytes(), digest_size=7).digest(), "little"))
+        for b in range(BANDS)
+    ]
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of two fingerprints (word shingles, or hash bits for scans)."""
+    if a["kind"] != b["kind"] or len(a["signature"]) != len(b["signature"]):
+        return 0.0
+    return float(np.mean(a["signature"] == b["signature"]))
+
+
+class NearDuplicateIndex:
+    """
+    SQLite-backed fingerprint index.
+    - path: database file (":memory:" for a throwaway index)
+    - threshold: minimum similarity for a stored text document to count as a duplicate
+    - image_threshold: the same for scans (re-scans blur and shift, so their hashes agree less;
+      key-values still have to match)
+    """
+
+    def __init__(self, path=":memory:", threshold: float = 0.9, image_threshold: float = 0.75):
+        self.threshold = threshold
+        self.image_threshold = image_threshold
+        self.conn = sqlite3.connect(str(path))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                fingerprint BLOB NOT NULL,
+                csv_path TEXT,
+                audit TEXT NOT NULL,
+                key_values TEXT
+            );
+            CREATE TABLE IF NOT EXISTS lsh (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS lsh_band_key ON lsh (band, key);
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if "key_values" not in columns:  # index written before matches were confirmed; its rows never match
+            self.conn.execute("ALTER TABLE documents ADD COLUMN key_values TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    @staticmethod
+    def _encode(fingerprint) -> bytes:
+        return fingerprint["signature"].tobytes()
+
+    @staticmethod
+    def _decode(kind: str, blob: bytes):
+        return {"kind": kind, "signature": np.frombuffer(blob, dtype=np.uint32)}
+
+    def add(self, fingerprint, name: str, audit: dict, csv_path: Path = None, key_values: dict = None) -> int:
+        """Store a parsed document's fingerprint, result and confirm_key_values; returns its id."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO documents (name, kind, fingerprint, csv_path, audit, key_values) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, fingerprint["kind"], self._encode(fingerprint),
+                 str(csv_path) if csv_path else None, json.dumps(audit),
+                 json.dumps(key_values if key_values is not None else confirm_key_values(audit))),
+            )
+            doc_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO lsh (band, key, doc_id) VALUES (?, ?, ?)",
+                [(band, key, doc_id) for band, key in band_keys(fingerprint)],
+            )
+        return doc_id
+
+    def query(self, fingerprint, key_values: dict = None):
+        """
+        Best stored match at or above the threshold, as
+        {"id", "name", "similarity", "csv_path", "audit", "key_values"}; None when there is none.
+        - key_values: confirm_key_values of the new document; only stored documents whose
+          key-values are equal can match
+        """
+        keys = band_keys(fingerprint)
+        clause = " OR ".join("(band = ? AND key = ?)" for _ in keys)
+        params = [v for pair in keys for v in pair]
+        rows = self.conn.execute(
+            f"SELECT d.id, d.name, d.kind, d.fingerprint, d.csv_path, d.audit, d.key_values, COUNT(*) AS hits "
+            f"FROM lsh JOIN documents d ON d.id = lsh.doc_id WHERE {clause} "
+            f"GROUP BY d.id ORDER BY hits DESC LIMIT ?",
+            params + [MAX_CANDIDATES],
+        ).fetchall()
+        threshold = self.threshold if fingerprint["kind"] == "text" else self.image_threshold
+        best = None
+        for doc_id, name, kind, blob, csv_path, audit, stored_key_values, _ in rows:
+            score = similarity(fingerprint, self._decode(kind, blob))
+            if score < threshold or (best is not None and score <= best["similarity"]):
+                continue
+            stored_key_values = json.loads(stored_key_values) if stored_key_values else None
+            if key_values is not None and stored_key_values != key_values:
+                continue
+            best = {"id": doc_id, "name": name, "similarity": round(score, 3), "csv_path": csv_path,
+                    "audit": json.loads(audit), "key_values": stored_key_values}
+        return best
+
+
+def parse_with_dedup(pdf_path, output_dir: Path, index: NearDuplicateIndex, name: str = None, **parse_kwargs):
+    """
+    parse_single_pdf, unless the index holds a near-duplicate whose CSV still exists and whose
+    invoice number and total equal this document's (document_key_values, only read when the
+    fingerprint has a candidate): then the stored CSV and audit are reused under this document's
+    name, with audit["duplicate_of"] and audit["similarity"] recording the match.
+    """
+    name = name or pdf_source_name(pdf_path)
+    stem = Path(name).stem
+    output_dir = Path(output_dir)
+    fingerprint = document_fingerprint(pdf_path)
+    key_values = None
+    match = index.query(fingerprint) if fingerprint else None
+    if match:
+        key_values = document_key_values(pdf_path, fingerprint)
+        match = index.query(fingerprint, key_values=key_values)
+
+    if match and match["csv_path"] and Path(match["csv_path"]).exists():
+        print(f"♻️ Near-duplicate: {name} ~ {match['name']} (similarity {match['similarity']})")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = output_dir / f"{stem}.csv"
+        if Path(match["csv_path"]).resolve() != csv_path.resolve():
+            shutil.copyfile(match["csv_path"], csv_path)
+        audit = dict(match["audit"], file=name, document_id=pdf_document_id(pdf_path, name),
+                     duplicate_of=match["name"], similarity=match["similarity"])
+        with open(output_dir / f"audit_{stem}.json", "w", encoding="utf-8") as f:
+            json.dump(audit, f, indent=4)
+        return audit
+
+    audit = parse_single_pdf(pdf_path, output_dir, name=name, **parse_kwargs)
+    if fingerprint:
+        if key_values is None:
+            key_values = (confirm_key_values(audit) if fingerprint["kind"] == "text" and "invoice_no" in audit
+                          else document_key_values(pdf_path, fingerprint))
+        csv_path = output_dir / f"{stem}.csv"
+        index.add(fingerprint, name, audit, csv_path if csv_path.exists() else None, key_values=key_values)
+    return audit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse PDFs, reusing results for near-duplicate documents.")
+    parser.add_argument("--input", type=str, default="data/raw", help="Input directory containing PDFs")
+    parser.add_argument("--output", type=str, default="data/extracted", help="Output directory for extracted CSVs")
+    parser.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=True,
+                        help="Include PDFs in subdirectories (outputs mirror the input tree)")
+    parser.add_argument("--index", type=str, default="data/dedup.sqlite", help="SQLite fingerprint index")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Minimum similarity to reuse a result")
+    args = parser.parse_args()
+
+    with NearDuplicateIndex(args.index, threshold=args.threshold) as index:
+        input_dir, output_dir = Path(args.input), Path(args.output)
+        for pdf_path in iter_pdf_files(input_dir, args.recursive):
+            parse_with_dedup(pdf_path, mirrored_output_dir(pdf_path, input_dir, output_dir), index)
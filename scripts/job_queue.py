@@ -0,0 +1,334 @@
+"""
+job_queue.py
+Description:
+Durable job queue for batch parsing across processes and machines. Producers enqueue PDF
+paths; any number of workers lease jobs with a visibility timeout, parse them with
+parse_single_pdf and write the audit back. Failed jobs are retried with exponential
+backoff, and jobs held by a killed worker become leasable again once their lease expires.
+
+The SQLite backend works for local runs, tests and several worker processes on one
+machine. Across machines, put the database on storage with working POSIX locks.
+While a job is parsed, the worker renews its lease from a heartbeat thread (every third of the
+visibility timeout), so long parses keep their job; the timeout only bounds how long a job
+held by a dead worker stays invisible.
+
+Usage:
+    python -m scripts.job_queue --db data/jobs.sqlite enqueue --input data/raw --output data/extracted
+    python -m scripts.job_queue --db data/jobs.sqlite worker --workers 4
+    python -m scripts.job_queue --db data/jobs.sqlite status
+"""
+
+import abc
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: int
+    pdf_path: str
+    output_dir: str
+    attempts: int
+    lease_owner: str
+    lease_expires: float
+
+
+class JobQueue(abc.ABC):
+    """Interface every queue backend implements; backends also expose visibility_timeout (seconds)."""
+
+    visibility_timeout: float
+
+    @abc.abstractmethod
+    def enqueue(self, pdf_paths, output_dir) -> int:
+        """Queue one job per PDF; returns the number queued."""
+
+    @abc.abstractmethod
+    def lease(self, worker_id: str):
+        """Next available job (or None), leased to worker_id until the visibility timeout."""
+
+    @abc.abstractmethod
+    def extend(self, job: Job) -> bool:
+        """Push a held lease's expiry forward (heartbeat); False if the lease was lost."""
+
+    @abc.abstractmethod
+    def complete(self, job: Job, audit: dict) -> bool:
+        """Mark a held job done with its audit; False if the lease was lost."""
+
+    @abc.abstractmethod
+    def fail(self, job: Job, error: str) -> bool:
+        """Re-queue a held job with backoff, or mark it failed on its last attempt."""
+
+    @abc.abstractmethod
+    def stats(self) -> dict:
+        """Job counts by state."""
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite-backed JobQueue.
+    - visibility_timeout: seconds a lease lasts before the job can be leased by another worker
+    - max_attempts: leases (including expired ones) before a job is marked failed
+    - backoff_base / backoff_max: retry delay is backoff_base * 2**(attempts - 1), capped
+    - clock: time source (injectable for tests)
+    """
+
+    def __init__(self, path, visibility_timeout: float = 600.0, max_attempts: int = 3,
+                 backoff_base: float = 10.0, backoff_max: float = 900.0, clock=time.time):
+        self.path = str(path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        # autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE; the connection is
+        # shared with the worker's heartbeat thread, so every use holds self._lock
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                pdf_path TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                audit TEXT,
+                enqueued_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state_available ON jobs (state, available_at);
+        """)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")  # take the write lock up front: one leaser at a time
+
+    def enqueue(self, pdf_paths, output_dir) -> int:
+        with self._lock:
+            now = self.clock()
+            rows = [(str(p), str(output_dir), QUEUED, now, now) for p in pdf_paths]
+            self._transaction()
+            try:
+                self.conn.executemany(
+                    "INSERT INTO jobs (pdf_path, output_dir, state, available_at, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return len(rows)
+
+    def lease(self, worker_id: str):
+        with self._lock:
+            now = self.clock()
+            self._transaction()
+            try:
+                while True:
+                    row = self.conn.execute(
+                        "SELECT id, pdf_path, output_dir, attempts FROM jobs "
+                        "WHERE (state = ? AND available_at <= ?) OR (state = ? AND lease_expires <= ?) "
+                        "ORDER BY available_at, id LIMIT 1",
+                        (QUEUED, now, LEASED, now),
+                    ).fetchone()
+                    if row is None:
+                        self.conn.execute("COMMIT")
+                        return None
+                    job_id, pdf_path, output_dir, attempts = row
+                    if attempts >= self.max_attempts:
+                        # only reachable through an expired lease: the worker holding it died
+                        self.conn.execute(
+                            "UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, finished_at = ? WHERE id = ?",
+                            (FAILED, "lease expired on final attempt", now, job_id),
+                        )
+                        continue
+                    expires = now + self.visibility_timeout
+                    self.conn.execute(
+                        "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ? WHERE id = ?",
+                        (LEASED, worker_id, expires, job_id),
+                    )
+                    self.conn.execute("COMMIT")
+                    return Job(job_id, pdf_path, output_dir, attempts + 1, worker_id, expires)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _update_held(self, job: Job, sql: str, params) -> bool:
+        """Run an UPDATE only while `job` still holds its lease (a re-leased job belongs to someone else)."""
+        with self._lock:
+            cur = self.conn.execute(
+                sql + " WHERE id = ? AND state = ? AND lease_owner = ? AND attempts = ?",
+                tuple(params) + (job.id, LEASED, job.lease_owner, job.attempts),
+            )
+            return cur.rowcount == 1
+
+    def extend(self, job: Job) -> bool:
+        job.lease_expires = self.clock() + self.visibility_timeout
+        return self._update_held(job, "UPDATE jobs SET lease_expires = ?", (job.lease_expires,))
+
+    def complete(self, job: Job, audit: dict) -> bool:
+        return self._update_held(
+            job, "UPDATE jobs SET state = ?, audit = ?, lease_owner = NULL, finished_at = ?",
+            (DONE, json.dumps(audit), self.clock()),
+        )
+
+    def fail(self, job: Job, error: str) -> bool:
+        now = self.clock()
+        if job.attempts >= self.max_attempts:
+            return self._update_held(
+                job, "UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, finished_at = ?",
+                (FAILED, error, now),
+            )
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+        return self._update_held(
+            job, "UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, available_at = ?",
+            (QUEUED, error, now + delay),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (QUEUED, LEASED, DONE, FAILED)}
+
+    def audits(self):
+        """(pdf_path, audit dict) for every finished job."""
+        with self._lock:
+            rows = self.conn.execute("SELECT pdf_path, audit FROM jobs WHERE state = ? ORDER BY id", (DONE,)).fetchall()
+        for pdf_path, audit in rows:
+            yield pdf_path, json.loads(audit)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseHeartbeat:
+    """
+    Context manager renewing a job's lease (queue.extend) from a background thread every
+    `interval` seconds while the job is processed; stops once the lease is lost.
+    """
+
+    def __init__(self, queue: JobQueue, job: Job, interval: float):
+        self.queue = queue
+        self.job = job
+        self.interval = interval
+        self.renewals = 0
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat-{job.id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.extend(self.job):
+                self.lost = True
+                return
+            self.renewals += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue: JobQueue, worker_id: str = None, poll_interval: float = 1.0,
+               stop_when_empty: bool = True, heartbeat_interval: float = None, **parse_kwargs) -> int:
+    """
+    Lease and parse jobs until the queue is drained (or forever when stop_when_empty=False).
+    Returns the number of jobs completed by this worker.
+    - heartbeat_interval: seconds between lease renewals while a job is parsed
+      (default: a third of the queue's visibility timeout)
+    """
+    from scripts.parse_pdf_data import parse_single_pdf
+
+    worker_id = worker_id or default_worker_id()
+    if heartbeat_interval is None:
+        heartbeat_interval = queue.visibility_timeout / 3
+    completed = 0
+    while True:
+        job = queue.lease(worker_id)
+        if job is None:
+            stats = queue.stats()
+            if stop_when_empty and stats[QUEUED] == 0 and stats[LEASED] == 0:
+                return completed
+            time.sleep(poll_interval)
+            continue
+        try:
+            with LeaseHeartbeat(queue, job, heartbeat_interval):
+                audit = parse_single_pdf(Path(job.pdf_path), Path(job.output_dir), **parse_kwargs)
+        except Exception:
+            queue.fail(job, traceback.format_exc(limit=5))
+            continue
+        if queue.complete(job, audit):
+            completed += 1
+
+
+def _worker_process(db_path: str, queue_kwargs: dict, parse_kwargs: dict):
+    with SQLiteJobQueue(db_path, **queue_kwargs) as queue:
+        run_worker(queue, **parse_kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable job queue for batch PDF parsing.")
+    parser.add_argument("--db", type=str, default="data/jobs.sqlite", help="SQLite queue database")
+    parser.add_argument("--visibility-timeout", type=float, default=600.0, help="Lease length in seconds")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    sub = parser.add_subparsers(dest="command", required=True)
+    enqueue = sub.add_parser("enqueue", help="Queue every PDF in a directory")
+    enqueue.add_argument("--input", type=str, default="data/raw")
+    enqueue.add_argument("--output", type=str, default="data/extracted")
+    enqueue.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=True,
+                         help="Include PDFs in subdirectories (outputs mirror the input tree)")
+    worker = sub.add_parser("worker", help="Process jobs until the queue is drained")
+    worker.add_argument("--workers", type=int, default=1, help="Worker processes on this machine")
+    sub.add_parser("status", help="Show job counts by state")
+    args = parser.parse_args()
+
+    queue_kwargs = {"visibility_timeout": args.visibility_timeout, "max_attempts": args.max_attempts}
+    if args.command == "enqueue":
+        from scripts.parse_pdf_data import iter_pdf_files, mirrored_output_dir
+
+        input_dir, output_dir = Path(args.input), Path(args.output)
+        by_output_dir = {}
+        for pdf_path in iter_pdf_files(input_dir, args.recursive):
+            by_output_dir.setdefault(mirrored_output_dir(pdf_path, input_dir, output_dir), []).append(pdf_path)
+        with SQLiteJobQueue(args.db, **queue_kwargs) as queue:
+            count = sum(queue.enqueue(paths, out_dir) for out_dir, paths in by_output_dir.items())
+        print(f"📥 Enqueued {count} PDF(s)")
+    elif args.command == "worker":
+        procs = [
+            multiprocessing.Process(target=_worker_process, args=(args.db, queue_kwargs, {}))
+            for _ in range(args.workers)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+    with SQLiteJobQueue(args.db, **queue_kwargs) as queue:
+        print(json.dumps(queue.stats()))
@@ -6,10 +6,26 @@ Extracts tabular and key-value data from PDFs and exports cleaned CSVs using pdf
 """
 
 import pdfplumber
+from pdfplumber.table import TableSettings
+from pdfminer.pdftypes import resolve1
+import numpy as np
 import pandas as pd
 import re
+import io
+import csv
 import json
+import hashlib
+import mmap
 import os
+import sys
+import time
+import cProfile
+import pstats
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass
 from pathlib import Path
 import argparse
 
@@ -19,17 +35,196 @@ import argparse
 DEFAULT_INPUT_DIR = Path("data/raw")
 DEFAULT_OUTPUT_DIR = Path("data/extracted")
 
+# ---------------------------
+# PDF Input Sources
+# ---------------------------
+def pdf_source_name(source, default: str = "document.pdf") -> str:
+    """File name for a PDF source: a path's name, a file object's .name, else `default`."""
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).name
+    name = getattr(source, "name", None)
+    return Path(name).name if isinstance(name, str) and name else default
+
+
+def pdf_document_id(source, default: str = "document.pdf") -> str:
+    """Batch-unique id for a PDF source: a path as given (POSIX form), else its pdf_source_name.
+    Unlike the file name, same-named files in different folders get different ids."""
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).as_posix()
+    return pdf_source_name(source, default)
+
+
+@contextmanager
+def open_pdf(source, use_mmap: bool = True):
+    """
+    Open a PDF with pdfplumber without copying its bytes.
+    - source: path, mmap.mmap, bytes-like object, or seekable binary file object
+      (e.g. a Streamlit UploadedFile)
+    - use_mmap: memory-map path inputs so pages are read lazily from the OS page cache
+    - yields the pdfplumber PDF; for path inputs, pdf.source_path holds the path (used by OCR)
+    """
+    mapped = None
+    source_path = None
+    if isinstance(source, (str, os.PathLike)):
+        source_path = Path(source)
+        stream = source_path
+        if use_mmap:
+            with open(source_path, "rb") as f:
+                # an empty file cannot be mapped; opening the path lets pdfplumber reject it as a PDF
+                if os.fstat(f.fileno()).st_size:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    stream = mapped
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        stream = io.BytesIO(source)  # shares an immutable bytes buffer until written to
+    else:
+        stream = source
+        if hasattr(stream, "seek"):
+            stream.seek(0)  # the same object is opened once for tables and once for key-values
+    try:
+        with pdfplumber.open(stream) as pdf:
+            pdf.source_path = source_path
+            yield pdf
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+# ---------------------------
+# Text Backends
+# ---------------------------
+class TextDocument:
+    """
+    Page text of one open PDF, as handed out by a text backend.
+    - n_pages: page count
+    - page_text(page_no): text layer of a 1-based page ("" when it has none)
+    """
+
+    def __init__(self, n_pages: int, page_text):
+        self.n_pages = n_pages
+        self.page_text = page_text
+
+
+@contextmanager
+def open_pdfplumber_text(source):
+    """pdfplumber/pdfminer text: full layout analysis in Python, the same text table detection sees."""
+    with open_pdf(source) as pdf:
+        def page_text(page_no):
+            page = pdf.pages[page_no - 1]
+            text = page.extract_text() or ""
+            page.close()
+            return text
+
+        yield TextDocument(len(pdf.pages), page_text)
+
+
+def _pypdfium2():
+    try:
+        import pypdfium2
+    except ImportError as e:
+        raise ImportError("The pdfium text backend needs pypdfium2 (pip install pypdfium2)") from e
+    return pypdfium2
+
+
+class _BufferReader(io.RawIOBase):
+    """Read-only stream over a buffer (mmap, memoryview) without copying it."""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: len(self.view)}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def readinto(self, b):
+        chunk = self.view[self.pos:self.pos + len(b)]
+        b[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+@contextmanager
+def open_pdfium_text(source):
+    """PDFium text (native code, via pypdfium2, which pdfplumber already depends on)."""
+    pdfium = _pypdfium2()
+    if isinstance(source, (str, os.PathLike)):
+        document = pdfium.PdfDocument(str(source))
+    elif isinstance(source, (bytes, bytearray)):
+        document = pdfium.PdfDocument(bytes(source))
+    elif isinstance(source, (memoryview, mmap.mmap)):
+        document = pdfium.PdfDocument(_BufferReader(source))
+    else:
+        # seekable file object: read through callbacks that seek before every read, so the
+        # same object can be shared with pdfplumber in this thread
+        if hasattr(source, "seek"):
+            source.seek(0)
+        document = pdfium.PdfDocument(source, autoclose=False)
+
+    def page_text(page_no):
+        page = document[page_no - 1]
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    try:
+        yield TextDocument(len(document), page_text)
+    finally:
+        document.close()
+
+
+# Backends for text-only work (key-values, text-table fallback); table detection always uses pdfplumber
+TEXT_BACKENDS = {
+    "pdfplumber": open_pdfplumber_text,
+    "pdfium": open_pdfium_text,
+}
+
+
+def open_text_document(source, backend: str = "pdfplumber"):
+    """Context manager yielding a TextDocument for source from a TEXT_BACKENDS backend."""
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend {backend!r}; expected one of {sorted(TEXT_BACKENDS)}")
+    return TEXT_BACKENDS[backend](source)
+
+
 # ---------------------------
 # Utility Functions
 # ---------------------------
-def ocr_pdf_to_text(pdf_path: Path, page_number: int = 1, poppler_path: str = None, dpi: int = 300):
+def ocr_pdf_to_text(pdf_path: Path, page_number: int = 1, poppler_path: str = None, dpi: int = 300,
+                    mode: str = "fixed", stats: dict = None):
     """
     Convert a single PDF page to image(s) and run Tesseract OCR to return extracted text.
     - pdf_path: Path to PDF
     - page_number: 1-based page index
     - poppler_path: optional path to poppler bin (if not in PATH)
+    - mode: "fixed" (color page at `dpi`), "adaptive" (see ocr_pdf_page_adaptive) or
+      "regions" (only dense text blocks, see ocr_pdf_page_regions)
+    - stats: optional dict; filled with the page's OCR stats (DPI, confidence / regions)
     - returns string of extracted text for that page (or empty string)
     """
+    if mode in ("adaptive", "regions"):
+        if mode == "adaptive":
+            text, page_stats = ocr_pdf_page_adaptive(pdf_path, page_number, poppler_path=poppler_path, retry_dpi=dpi)
+        else:
+            text, page_stats = ocr_pdf_page_regions(pdf_path, page_number, poppler_path=poppler_path, dpi=dpi)
+        if stats is not None:
+            stats.update(page_stats)
+        return text
+    if stats is not None:
+        stats.update({"page": page_number, "dpi": dpi, "confidence": None, "retried": False})
     try:
         from pdf2image import convert_from_path
         import pytesseract
@@ -45,54 +240,652 @@ def ocr_pdf_to_text(pdf_path: Path, page_number: int = 1, poppler_path: str = No
     except Exception:
         return ""
 
-def extract_tables_from_pdf(pdf_path: Path):
-    """Extract all tables from all pages of a PDF. Uses pdfplumber tables first,
-       then a text-based fallback for pages where extract_tables() returns empty.
+
+def binarize_image(img, threshold: int = None):
     """
-    all_tables = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            # try native table extraction
-            tables = page.extract_tables()
-            if tables:
-                for table in tables:
-                    df = pd.DataFrame(table[1:], columns=table[0])  # first row = header
-                    df["page_number"] = i
-                    all_tables.append(df)
+    Grayscale + binarize a PIL image for OCR.
+    - threshold: 0-255 cut-off; computed with Otsu's method when None
+    """
+    from PIL import Image
+
+    gray = np.asarray(img.convert("L"))
+    if threshold is None:
+        hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+        weights = np.cumsum(hist)
+        means = np.cumsum(hist * np.arange(256))
+        total, total_mean = weights[-1], means[-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            between = (total_mean * weights - means * total) ** 2 / (weights * (total - weights))
+        threshold = int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+    return Image.fromarray(np.where(gray > threshold, 255, 0).astype(np.uint8))
+
+
+def words_to_text(data: dict):
+    """
+    Rebuild page text and mean word confidence from pytesseract.image_to_data(output_type=DICT).
+    Returns (text, confidence) with confidence None when no words were recognized.
+    """
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data.get("text", [])):
+        conf = float(data["conf"][i])
+        if conf < 0 or not str(word).strip():
+            continue  # layout rows (page/block/line boxes) carry conf -1
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(str(word).strip())
+        confidences.append(conf)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = round(sum(confidences) / len(confidences), 1) if confidences else None
+    return text, confidence
+
+
+def ocr_pdf_page_adaptive(pdf_path: Path, page_number: int = 1, poppler_path: str = None,
+                          base_dpi: int = 150, retry_dpi: int = 300, min_confidence: float = 80.0):
+    """
+    OCR a page at `base_dpi` on a binarized grayscale image; re-OCR at `retry_dpi` only when
+    the mean word confidence is below `min_confidence`. The higher-confidence result is kept.
+    Returns (text, {"page", "dpi", "confidence", "retried"}).
+    """
+    stats = {"page": page_number, "dpi": None, "confidence": None, "retried": False}
+    try:
+        from pdf2image import convert_from_path
+        import pytesseract
+    except Exception:
+        return "", stats
+
+    def ocr_at(dpi):
+        kwargs = {"first_page": page_number, "last_page": page_number, "dpi": dpi, "grayscale": True}
+        if poppler_path:
+            kwargs["poppler_path"] = poppler_path
+        pages = convert_from_path(str(pdf_path), **kwargs)
+        if not pages:
+            return "", None
+        data = pytesseract.image_to_data(binarize_image(pages[0]), output_type=pytesseract.Output.DICT)
+        return words_to_text(data)
+
+    best_text = ""
+    try:
+        best_text, stats["confidence"] = ocr_at(base_dpi)
+        stats["dpi"] = base_dpi
+        if retry_dpi > base_dpi and (stats["confidence"] or 0) < min_confidence:
+            stats["retried"] = True
+            text, confidence = ocr_at(retry_dpi)
+            if (confidence or 0) >= (stats["confidence"] or 0):
+                best_text, stats["dpi"], stats["confidence"] = text, retry_dpi, confidence
+    except Exception:
+        pass
+    return best_text or "", stats
+
+
+def _runs(mask, max_gap: int = 0):
+    """(start, end) index pairs of True runs in a 1-D mask, bridging gaps of up to max_gap."""
+    idx = np.flatnonzero(mask)
+    if idx.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > max_gap + 1)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def find_text_regions(img, line_gap: float = 0.025, footer_fraction: float = 0.08,
+                      max_fill: float = 0.45, min_height: float = 0.004):
+    """
+    Locate dense text blocks on a page image with projection profiles (no OCR).
+    Each block keeps its full width, so table rows stay whole lines for parse_text_table; a
+    block is only split around logos / images inside it, which are dropped.
+    - line_gap: vertical gap (fraction of page height) that separates blocks; smaller gaps,
+      such as those between table rows, are bridged
+    - footer_fraction: blocks starting in this bottom fraction of the page are dropped (footers, legal text)
+    - max_fill: column runs with a higher ink ratio are dropped as logos / images rather than text
+    - min_height: blocks shorter than this fraction of the page height are dropped as specks / rules
+    Returns (left, top, right, bottom) pixel boxes in reading order (top to bottom, left to right).
+    """
+    ink = np.asarray(binarize_image(img)) == 0
+    height, width = ink.shape
+    rows = ink.sum(axis=1) > max(1, int(width * 0.002))
+    pad = max(2, int(height * 0.003))
+    regions = []
+    for top, bottom in _runs(rows, max_gap=int(height * line_gap)):
+        if bottom - top < height * min_height or top > height * (1 - footer_fraction):
+            continue
+        cols = ink[top:bottom].any(axis=0)
+        # group neighbouring text column runs; a logo run ends the group
+        groups, group = [], []
+        for left, right in _runs(cols, max_gap=int(width * 0.05)):
+            if ink[top:bottom, left:right].mean() > max_fill:
+                groups, group = groups + [group], []
+            else:
+                group.append((left, right))
+        for group in groups + [group]:
+            if not group:
                 continue
+            left, right = group[0][0], group[-1][1]
+            text_cols = np.zeros(width, dtype=bool)
+            for run_left, run_right in group:
+                text_cols[run_left:run_right] = True
+            block_rows = np.flatnonzero(ink[top:bottom][:, text_cols].any(axis=1))  # tighten to the text's own rows
+            b_top, b_bottom = top + int(block_rows[0]), top + int(block_rows[-1]) + 1
+            regions.append((max(0, left - pad), max(0, b_top - pad), min(width, right + pad), min(height, b_bottom + pad)))
+    return sorted(regions, key=lambda box: (box[1], box[0]))
+
+
+def ocr_regions(img, regions, workers: int = 4):
+    """OCR each region crop in parallel (tesseract runs as a subprocess) and join them in reading order."""
+    import pytesseract
+    from concurrent.futures import ThreadPoolExecutor
+
+    crops = [img.crop(box) for box in regions]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        texts = list(pool.map(lambda crop: pytesseract.image_to_string(crop, config="--psm 6"), crops))
+    return "\n".join(t.strip() for t in texts if t and t.strip())
+
+
+def ocr_pdf_page_regions(pdf_path: Path, page_number: int = 1, poppler_path: str = None,
+                         dpi: int = 300, workers: int = 4):
+    """
+    OCR only the dense text blocks of a scanned page (see find_text_regions).
+    Returns (text, {"page", "dpi", "regions", "ocr_area_fraction"}).
+    """
+    stats = {"page": page_number, "dpi": dpi, "regions": 0, "ocr_area_fraction": 0.0}
+    try:
+        from pdf2image import convert_from_path
+        kwargs = {"first_page": page_number, "last_page": page_number, "dpi": dpi, "grayscale": True}
+        if poppler_path:
+            kwargs["poppler_path"] = poppler_path
+        pages = convert_from_path(str(pdf_path), **kwargs)
+        if not pages:
+            return "", stats
+        img = pages[0]
+        regions = find_text_regions(img)
+        area = sum((r - l) * (b - t) for l, t, r, b in regions)
+        stats["regions"] = len(regions)
+        stats["ocr_area_fraction"] = round(area / (img.width * img.height), 3)
+        return ocr_regions(img, regions, workers=workers), stats
+    except Exception:
+        return "", stats
+
+
+# ---------------------------
+# Page Pre-scan
+# ---------------------------
+# Header words that mark a line-item table (matched against the page's raw characters)
+TABLE_HEADER_KEYWORDS = ["description", "qty", "quantity", "unit", "price", "amount", "total"]
+
+# Aggressiveness levels for prescan_page: higher levels skip more pages (faster, lower recall).
+# A page is kept when it has more numeric characters than min_numeric_ratio AND either enough
+# header keywords or enough ruling lines/rects.
+PRESCAN_LEVELS = {
+    "conservative": {"min_numeric_ratio": 0.0, "min_header_hits": 1, "min_ruling_objects": 1},
+    "balanced": {"min_numeric_ratio": 0.03, "min_header_hits": 2, "min_ruling_objects": 4},
+    "aggressive": {"min_numeric_ratio": 0.08, "min_header_hits": 3, "min_ruling_objects": 8},
+}
+
+
+# Content-stream tokens: literal strings (one level of nested parentheses), hex strings, names, operators
+_CONTENT_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)|<[0-9A-Fa-f\s]*>|/[^\s/\[\]()<>{}%]+|[A-Za-z'\"*]+",
+    re.DOTALL,
+)
+_INLINE_IMAGE = re.compile(rb"\bBI\b.*?\bID\s.*?\bEI\b", re.DOTALL)
+_STRING_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+_TEXT_SHOW_OPERATORS = {b"Tj", b"TJ", b"'", b'"'}
+# Encodings whose codes for letters, digits and punctuation are their latin-1 bytes
+_LATIN1_ENCODINGS = {"WinAnsiEncoding", "MacRomanEncoding", "StandardEncoding"}
+_PATH_SEGMENTS = {b"m": "m", b"l": "l", b"c": "c", b"v": "c", b"y": "c", b"h": "h"}
+_PATH_PAINTS = {b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*"}
+_CLOSING_PAINTS = {b"s", b"b", b"b*"}
+
+
+class UndecodableContent(Exception):
+    """The page's text cannot be read from its content stream (re-encoded fonts or form XObjects)."""
 
+
+def _resource(resources: dict, kind: str, name: str):
+    return resolve1((resolve1(resources.get(kind)) or {}).get(name))
+
+
+def _subtype(obj) -> str:
+    subtype = obj.get("Subtype") if obj is not None else None
+    return getattr(subtype, "name", subtype)
+
+
+def _latin1_font(font) -> bool:
+    """Whether a font's string bytes are its text: a simple font without a /ToUnicode CMap, with a
+    standard encoding (no /Differences), or with none and no embedded (possibly subset) font program."""
+    if font is None or _subtype(font) in ("Type0", "Type3") or "ToUnicode" in font:
+        return False
+    encoding = resolve1(font.get("Encoding"))
+    if encoding is None:
+        descriptor = resolve1(font.get("FontDescriptor")) or {}
+        return not any(key in descriptor for key in ("FontFile", "FontFile2", "FontFile3"))
+    return getattr(encoding, "name", encoding) in _LATIN1_ENCODINGS
+
+
+def _ruling_shapes(subpaths) -> int:
+    """Painted subpaths pdfminer turns into lines or rects (page.lines / page.rects): a single
+    segment ("ml") or a rectangle (re, or four straight segments); curves and polylines are neither."""
+    return sum(1 for shape in subpaths if shape in ("ml", "re", "mlllh", "mllll"))
+
+
+def _decode_string(token: bytes) -> str:
+    if token[:1] == b"<":
+        data = bytes.fromhex(re.sub(rb"\s", b"", token[1:-1]).decode("ascii").ljust(2, "0"))
+    else:
+        data = re.sub(
+            rb"\\([0-7]{1,3}|.)",
+            lambda m: bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)[:1].isdigit()
+            else _STRING_ESCAPES.get(m.group(1), m.group(1)),
+            token[1:-1], flags=re.DOTALL,
+        )
+    return data.decode("latin-1")
+
+
+def content_stream_signals(page) -> dict:
+    """
+    Pre-scan signals read straight from a page's content stream, without pdfminer layout analysis:
+    text shown by Tj/TJ/'/" (fonts whose bytes are latin-1 text only, see _latin1_font), painted
+    lines and rectangles counted as page.lines + page.rects counts them, and drawn images
+    (image XObjects and inline images).
+    - page: pdfplumber Page
+    - raises UndecodableContent when the text needs font decoding (Type0, Type3, /ToUnicode or
+      /Differences fonts) or lives in form XObjects
+    """
+    resources = page.page_obj.resources or {}
+    data = b"\n".join(resolve1(stream).get_data() for stream in page.page_obj.contents)
+    data, inline_images = _INLINE_IMAGE.subn(b" ", data)
+
+    text, pending, last_name = [], [], None
+    ruling = images = 0
+    subpaths = []  # current path, one shape string per subpath ("ml", "re", "mlllh", ...)
+    for token in _CONTENT_TOKEN.findall(data):
+        first = token[:1]
+        if first in b"(<":
+            pending.append(token)
+            continue
+        if first == b"/":
+            last_name = token[1:].decode("latin-1")
+            continue
+        if token in _TEXT_SHOW_OPERATORS:
+            text.extend(_decode_string(t) for t in pending)
+        elif token in _PATH_SEGMENTS:
+            if token == b"m" or not subpaths:
+                subpaths.append("")
+            subpaths[-1] += _PATH_SEGMENTS[token]
+        elif token == b"re":
+            subpaths.append("re")
+        elif token in _PATH_PAINTS:
+            if token in _CLOSING_PAINTS and subpaths:
+                subpaths[-1] += "h"
+            ruling += _ruling_shapes(subpaths)
+            subpaths = []
+        elif token == b"n":  # end of a clip (W n) or discarded path: nothing is drawn
+            subpaths = []
+        elif token == b"Tf" and not _latin1_font(_resource(resources, "Font", last_name)):
+            raise UndecodableContent(f"font {last_name} needs decoding")
+        elif token == b"Do":
+            subtype = _subtype(_resource(resources, "XObject", last_name))
+            if subtype == "Form":
+                raise UndecodableContent(f"form XObject {last_name}")
+            images += subtype == "Image"
+        pending = []
+    return {"text": "".join(text), "images": images + inline_images, "ruling_objects": ruling}
+
+
+def layout_signals(page) -> dict:
+    """content_stream_signals through pdfminer layout analysis (slow; for pages it cannot decode)."""
+    return {
+        "text": "".join(ch.get("text", "") for ch in page.chars),
+        "images": len(page.images),
+        "ruling_objects": len(page.lines) + len(page.rects),
+    }
+
+
+def prescan_page(page, level: str = "balanced"):
+    """
+    Decide cheaply whether a page can hold a line-item table, before running table detection.
+    Signals come from the raw content stream (content_stream_signals), so skipped pages never
+    go through layout analysis; pages whose text needs font decoding fall back to layout_signals.
+    - page: pdfplumber Page
+    - level: key of PRESCAN_LEVELS
+    - returns (keep, signals) where signals holds the counts the decision was based on
+    """
+    if level not in PRESCAN_LEVELS:
+        raise ValueError(f"Unknown prescan level {level!r}; expected one of {sorted(PRESCAN_LEVELS)}")
+    thresholds = PRESCAN_LEVELS[level]
+
+    try:
+        raw_signals = content_stream_signals(page)
+    except UndecodableContent:
+        raw_signals = layout_signals(page)
+    raw = raw_signals["text"].lower()
+    visible = [c for c in raw if not c.isspace()]
+    digits = sum(c.isdigit() for c in visible)
+    signals = {
+        "chars": len(visible),
+        "images": raw_signals["images"],
+        "ruling_objects": raw_signals["ruling_objects"],
+        "numeric_ratio": round(digits / len(visible), 3) if visible else 0.0,
+        "header_hits": sum(1 for k in TABLE_HEADER_KEYWORDS if k in raw),
+    }
+
+    if not visible:
+        # no text layer: keep image-only pages (scans the OCR fallback may read), skip blank ones
+        return signals["images"] > 0, signals
+    if signals["numeric_ratio"] <= thresholds["min_numeric_ratio"]:
+        return False, signals
+    keep = (
+        signals["header_hits"] >= thresholds["min_header_hits"]
+        or signals["ruling_objects"] >= thresholds["min_ruling_objects"]
+    )
+    return keep, signals
+
+
+# ---------------------------
+# Table Detection Strategies
+# ---------------------------
+# pdfplumber table_settings profiles. "lines" is pdfplumber's default (ruled tables),
+# "text" infers columns from word alignment (unruled tables), "explicit" uses caller-supplied
+# explicit_vertical_lines (pass them through table_settings).
+TABLE_SETTINGS_PROFILES = {
+    "lines": {"vertical_strategy": "lines", "horizontal_strategy": "lines"},
+    "text": {"vertical_strategy": "text", "horizontal_strategy": "text"},
+    "explicit": {"vertical_strategy": "explicit", "horizontal_strategy": "text"},
+}
+
+# Order in which table_strategy="auto" tries profiles; the first one that yields a usable table
+# (see table_is_usable) is locked in
+AUTO_STRATEGY_ORDER = ["lines", "text", "explicit"]
+
+# Header words table_is_usable accepts whole; a header word that is a clipped piece of one of
+# these ("Line Tota", "escription") marks a cell boundary cutting through the header text
+HEADER_WORDS = {"description", "desc", "item", "qty", "quantity", "unit", "price", "amount", "line", "total"}
+
+
+def resolve_table_settings(strategy: str, table_settings: dict = None) -> dict:
+    """Merge a TABLE_SETTINGS_PROFILES entry with caller overrides."""
+    if strategy not in TABLE_SETTINGS_PROFILES:
+        raise ValueError(
+            f"Unknown table strategy {strategy!r}; expected one of {sorted(TABLE_SETTINGS_PROFILES)} or 'auto'"
+        )
+    settings = dict(TABLE_SETTINGS_PROFILES[strategy])
+    settings.update(table_settings or {})
+    if strategy == "explicit" and not settings.get("explicit_vertical_lines"):
+        raise ValueError("The 'explicit' table strategy needs table_settings['explicit_vertical_lines'].")
+    return settings
+
+
+def header_row_index(rows):
+    """Index of the header row (the first row with 2+ header keywords), else None."""
+    for idx, row in enumerate(rows):
+        hits = sum(1 for c in row if c and any(k in str(c).lower() for k in TABLE_HEADER_KEYWORDS))
+        if hits >= 2:
+            return idx
+    return None
+
+
+def trim_table_to_header(table):
+    """
+    Drop empty rows and anything above the header row (see header_row_index).
+    Text-aligned strategies pick up page headers and blank spacer rows; returns [] when
+    no header row or no data rows are found.
+    """
+    rows = [r for r in table if any(c is not None and str(c).strip() for c in r)]
+    idx = header_row_index(rows)
+    if idx is None:
+        return []
+    return rows[idx:] if len(rows) > idx + 1 else []
+
+
+def repair_header_cells(page, table, rows):
+    """
+    Rebuild the header row of a text-strategy table from whole words. Cell edges inferred from the
+    data rows can cut through a wider header ("Line Tota"); each word in the header row's band is
+    given to the cell it overlaps most, so header text is never clipped.
+    - table: pdfplumber Table the rows were extracted from
+    """
+    idx = header_row_index(rows)
+    if idx is None:
+        return rows
+    row = table.rows[idx]
+    cells = row.cells
+    assigned = [[] for _ in cells]
+    for word in page.extract_words():
+        if not row.bbox[1] <= (word["top"] + word["bottom"]) / 2 <= row.bbox[3]:
+            continue
+        overlaps = [
+            min(word["x1"], cell[2]) - max(word["x0"], cell[0]) if cell is not None else 0
+            for cell in cells
+        ]
+        best = max(range(len(cells)), key=overlaps.__getitem__, default=None)
+        if best is not None and overlaps[best] > 0:
+            assigned[best].append(word["text"])
+    header = [" ".join(words) if words else value for words, value in zip(assigned, rows[idx])]
+    return rows[:idx] + [header] + rows[idx + 1:]
+
+
+def line_item_column(header_cell) -> str:
+    """The normalized line-item column a header cell maps to (normalize_numeric_rows' renames), else None."""
+    low = re.sub(r"\s+", " ", str(header_cell or "")).strip().lower()
+    if "line" in low and "total" in low or low == "total":
+        return "line_total"
+    if "unit" in low and "price" in low or low == "price":
+        return "unit_price"
+    if low in ("qty", "quantity"):
+        return "quantity"
+    if "description" in low:
+        return "description"
+    return None
+
+
+def table_is_usable(table, min_numeric_share: float = 0.8) -> bool:
+    """
+    Quality check for a raw extracted table (header row first) before auto mode trusts its strategy:
+    no header word may be a clipped piece of a known header word, at least two header cells must
+    map to line-item columns (one of them numeric), and the numeric columns' cells must parse.
+    - min_numeric_share: share of non-empty cells in each numeric column that to_number must accept
+    """
+    header, rows = table[0], table[1:]
+    for cell in header:
+        for word in str(cell or "").lower().split():
+            if word not in HEADER_WORDS and len(word) >= 2 and any(
+                    known.startswith(word) or known.endswith(word) for known in HEADER_WORDS):
+                return False
+    columns = [line_item_column(c) for c in header]
+    numeric = [i for i, c in enumerate(columns) if c in NUMERIC_COLUMNS]
+    if sum(c is not None for c in columns) < 2 or not numeric:
+        return False
+    for i in numeric:
+        values = [r[i] for r in rows if i < len(r) and r[i] is not None and str(r[i]).strip()]
+        if values and sum(to_number(v) is not None for v in values) < min_numeric_share * len(values):
+            return False
+    return True
+
+
+def extract_page_tables(page, strategy: str = "lines", table_settings: dict = None, as_rows: bool = False,
+                        usable_only: bool = False):
+    """Run pdfplumber table detection on one page with a strategy profile; returns DataFrames
+    (RowTables with as_rows=True). usable_only drops tables failing table_is_usable."""
+    settings = resolve_table_settings(strategy, table_settings)
+    if strategy == "lines":
+        tables = page.extract_tables(settings)
+    else:
+        text_settings = TableSettings.resolve(settings).text_settings or {}
+        tables = [
+            trim_table_to_header(repair_header_cells(page, found, found.extract(**text_settings)))
+            for found in page.find_tables(settings)
+        ]
+        tables = [t for t in tables if t]
+    if usable_only:
+        tables = [t for t in tables if table_is_usable(t)]
+    make = RowTable if as_rows else (lambda header, rows: pd.DataFrame(rows, columns=header))
+    return [make(table[0], table[1:]) for table in tables]  # first row = header
+
+
+def iter_pdf_page_tables(pdf_path, prescan: str = None, audit: dict = None,
+                         table_strategy: str = "lines", table_settings: dict = None,
+                         release_pages: bool = True, ocr_mode: str = "fixed", as_rows: bool = False,
+                         capture: dict = None, text_backend: str = "pdfplumber"):
+    """Yield (page_number, tables) for every page as it is harvested: pdfplumber tables first,
+       then a text-based fallback for pages where extract_tables() returns empty.
+    - pdf_path: path or in-memory source accepted by open_pdf
+    - prescan: optional PRESCAN_LEVELS key; pages failing prescan_page skip table detection
+    - audit: optional dict; prescan decisions and the table strategy are recorded in it
+      once the last page has been yielded
+    - table_strategy: TABLE_SETTINGS_PROFILES key, or "auto" to try profiles on the first page
+      with a usable table (table_is_usable) and lock in the winner ("fallback" when only the text
+      parser succeeds); later pages whose tables fail the check go to the text parser
+    - table_settings: pdfplumber table_settings overrides merged into the profile
+    - release_pages: flush each page's pdfplumber caches once it has been harvested, keeping
+      memory roughly constant in the page count
+    - ocr_mode: "fixed", "adaptive" or "regions" OCR for pages without a text layer
+      (see ocr_pdf_to_text); per-page OCR stats are recorded under audit["ocr_pages"]
+    - as_rows: yield RowTables instead of DataFrames (pandas-free fast path)
+    - capture: optional dict filled with what later stages need to re-run without the PDF:
+      "n_pages", "texts" {page: text layer} for every page the pre-scan keeps (see captured_page_text
+      for the skipped ones), "fallback_texts" {page: text given to the text fallback, OCR text for
+      scanned pages} and "native_tables" {page: pdfplumber tables}
+    - text_backend: TEXT_BACKENDS key for the text fallback and captured texts; tables are
+      always detected with pdfplumber
+    """
+    if capture is not None:
+        capture.update(n_pages=0, texts={}, fallback_texts={}, native_tables={})
+    if table_strategy == "auto":
+        candidates = [
+            s for s in AUTO_STRATEGY_ORDER
+            if s != "explicit" or (table_settings or {}).get("explicit_vertical_lines")
+        ]
+        locked = None
+    else:
+        resolve_table_settings(table_strategy, table_settings)  # fail fast on bad settings
+        candidates = [table_strategy]
+        locked = table_strategy
+    locked_on_page = None
+
+    skipped_pages = []
+    ocr_pages = []
+
+    def harvest(i, page):
+        nonlocal locked, locked_on_page
+        if prescan:
+            keep, signals = prescan_page(page, prescan)
+            if not keep:
+                skipped_pages.append({"page": i, **signals})
+                return []
+
+        # try native table extraction (every candidate until one strategy is locked in)
+        tables = []
+        if locked != "fallback":
+            for strategy in ([locked] if locked else candidates):
+                tables = extract_page_tables(page, strategy, table_settings, as_rows=as_rows,
+                                             usable_only=table_strategy == "auto")
+                if tables:
+                    if locked is None:
+                        locked, locked_on_page = strategy, i
+                    break
+        if tables:
+            if capture is not None:
+                capture["native_tables"][i] = tables
+        else:
             # fallback: try extracting a visually-aligned table from page text
-            fallback_tables = extract_table_from_text_fallback(page)
-            if fallback_tables:
-                for df in fallback_tables:
-                    df["page_number"] = i
-                    all_tables.append(df)
+            text = page_fallback_text(page, ocr_mode=ocr_mode, ocr_stats=ocr_pages, text_layer=page_text(i))
+            if capture is not None:
+                capture["fallback_texts"][i] = text
+            tables = parse_text_table(text, i, as_rows=as_rows)
+            if tables and locked is None:
+                locked, locked_on_page = "fallback", i
+        for table in tables:
+            if as_rows:
+                table.set_column("page_number", i)
+            else:
+                table["page_number"] = i
+        return tables
+
+    with open_pdf(pdf_path) as pdf, \
+            (open_text_document(pdf_path, text_backend) if text_backend != "pdfplumber" else nullcontext()) as text_doc:
+        page_text = text_doc.page_text if text_doc is not None else lambda page_no: None
+        if capture is not None:
+            capture["n_pages"] = len(pdf.pages)
+        for i, page in enumerate(pdf.pages, start=1):
+            try:
+                tables = harvest(i, page)
+            finally:
+                # skipped pages never go through layout analysis, so their text is not extracted here either
+                if capture is not None and not (skipped_pages and skipped_pages[-1]["page"] == i):
+                    text = page_text(i)
+                    capture["texts"][i] = (page.extract_text() or "") if text is None else text
+                if release_pages:
+                    page.close()  # drop cached chars/layout objects so memory stays flat across pages
+            yield i, tables
+
+        if prescan and audit is not None:
+            audit["prescan"] = {
+                "level": prescan,
+                "pages_scanned": len(pdf.pages),
+                "pages_skipped": len(skipped_pages),
+                "skipped_pages": skipped_pages,
+            }
+    if audit is not None and ocr_pages:
+        audit["ocr_pages"] = ocr_pages
+    if audit is not None and (table_strategy != "lines" or table_settings):
+        audit["table_strategy"] = {
+            "requested": table_strategy,
+            "selected": locked,
+            "selected_on_page": locked_on_page,
+        }
+
+
+def extract_tables_from_pdf(pdf_path, prescan: str = None, audit: dict = None,
+                            table_strategy: str = "lines", table_settings: dict = None,
+                            release_pages: bool = True, ocr_mode: str = "fixed", as_rows: bool = False,
+                            capture: dict = None, text_backend: str = "pdfplumber"):
+    """Extract all tables from all pages of a PDF (see iter_pdf_page_tables for the arguments)."""
+    all_tables = []
+    for _, tables in iter_pdf_page_tables(pdf_path, prescan=prescan, audit=audit, table_strategy=table_strategy,
+                                          table_settings=table_settings, release_pages=release_pages,
+                                          ocr_mode=ocr_mode, as_rows=as_rows, capture=capture,
+                                          text_backend=text_backend):
+        all_tables.extend(tables)
     return all_tables
 
 
 # --- START: fallback text-table parser ---
-def extract_table_from_text_fallback(page, header_keywords=None):
+def page_fallback_text(page, ocr_mode: str = "fixed", ocr_stats: list = None, text_layer: str = None) -> str:
     """
-    Attempt to parse a visually-aligned table from the page's text.
-    Returns a list with one DataFrame if successful, otherwise [].
+    Text the fallback parser works on: the page's text layer, or OCR text for scanned pages.
+    - ocr_mode: passed to ocr_pdf_to_text for pages without a text layer
+    - ocr_stats: optional list; per-page OCR stats are appended to it
+    - text_layer: the page's text from another text backend (default: page.extract_text())
     """
-    import pandas as pd
-    text = page.extract_text() or ""
+    text = (page.extract_text() or "") if text_layer is None else text_layer
     if not text:
         try:
             from pathlib import Path
             import os
             pdf_path = None
-            if hasattr(page, "pdf") and hasattr(page.pdf, "stream") and getattr(page.pdf.stream, "name", None):
+            if getattr(getattr(page, "pdf", None), "source_path", None):
+                pdf_path = page.pdf.source_path
+            elif hasattr(page, "pdf") and hasattr(page.pdf, "stream") and getattr(page.pdf.stream, "name", None):
                 pdf_path = Path(page.pdf.stream.name)
             elif os.environ.get("PDFPARSER_CURRENT_PDF"):
                 pdf_path = Path(os.environ["PDFPARSER_CURRENT_PDF"])
             if pdf_path and pdf_path.exists():
-                ocr_text = ocr_pdf_to_text(pdf_path, page.page_number)
+                page_stats = {}
+                ocr_text = ocr_pdf_to_text(pdf_path, page.page_number, mode=ocr_mode, stats=page_stats)
+                if ocr_stats is not None:
+                    ocr_stats.append(page_stats)
                 if ocr_text:
                     text = ocr_text
         except Exception:
             text = text
+    return text
+
+
+def parse_text_table(text: str, page_no: int = None, header_keywords=None, as_rows: bool = False):
+    """
+    Parse a visually-aligned table from page text.
+    Returns a list with one DataFrame (RowTable with as_rows=True) if successful, otherwise [].
+    """
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     if not lines:
         return []
@@ -140,37 +933,135 @@ def extract_table_from_text_fallback(page, header_keywords=None):
     if not data_rows:
         return []
 
+    if as_rows:
+        table = RowTable(cols, [r for r in data_rows if not all(v is None for v in r)])
+        if page_no is not None:
+            table.set_column("page_number", page_no)
+        return [table]
+
     df = pd.DataFrame(data_rows, columns=cols)
     df = df.dropna(how="all").reset_index(drop=True)
+    if page_no is not None:
+        df["page_number"] = page_no
+    return [df]
+
+
+def extract_table_from_text_fallback(page, header_keywords=None, ocr_mode: str = "fixed", ocr_stats: list = None,
+                                     as_rows: bool = False):
+    """
+    Attempt to parse a visually-aligned table from the page's text.
+    Returns a list with one DataFrame (RowTable with as_rows=True) if successful, otherwise [].
+    - ocr_mode: passed to ocr_pdf_to_text for pages without a text layer
+    - ocr_stats: optional list; per-page OCR stats are appended to it
+    """
+    text = page_fallback_text(page, ocr_mode=ocr_mode, ocr_stats=ocr_stats)
     try:
         page_no = page.page_number
     except Exception:
         page_no = None
-    if page_no is not None:
-        df["page_number"] = page_no
-    return [df]
+    return parse_text_table(text, page_no, header_keywords=header_keywords, as_rows=as_rows)
 # --- END: fallback text-table parser ---
 
 
-def extract_key_values_from_text(pdf_path: Path):
-    """Extract key-value metadata (invoice no, date, total) using regex."""
-    patterns = {
-        "invoice_no": r"(?:invoice|bill)\s*#?:?\s*([A-Za-z0-9-]+)",
-        "date": r"date\s*[:\-]?\s*([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
-        "total": r"total\s*(?:amount)?\s*[:\-]?\s*\$?([0-9,]+\.?[0-9]*)"
-    }
+KEY_VALUE_PATTERNS = {
+    "invoice_no": r"(?:invoice|bill)\s*#?:?\s*([A-Za-z0-9-]+)",
+    "date": r"date\s*[:\-]?\s*([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
+    "total": r"(?<!sub)(?<!sub\s)(?<!sub-)\btotal\s*(?:amount)?\s*[:\-]?\s*\$?([0-9,]+\.?[0-9]*)",
+    "subtotal": r"\bsub-?\s*total\s*[:\-]?\s*\$?([0-9,]+\.?[0-9]*)",
+    # an optional rate ("(8%)", "8%", "@ 20%") precedes the amount; a number followed by % is never captured
+    "tax": r"\b(?:sales\s+)?(?:tax|vat|gst)\b(?:\s*\([^)\n]*\))?(?:\s*@?\s*[0-9]+(?:\.[0-9]+)?\s*%)?"
+           r"\s*[:\-]?\s*\$?([0-9,]+\.?[0-9]*)(?![0-9.,]*\s*%)",
+}
+
+# Fields many invoices do not print: matched on the pages read for the other fields, but never
+# the reason to read another page (so documents without them keep the first/last page search)
+KEY_VALUE_OPTIONAL = ("subtotal", "tax")
+
+# Invoice number and date are almost always on page 1 and the total on the last page
+KEY_VALUE_PAGE_ORDER = ("first", "last", "rest")
 
-    text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    extracted = {}
-    for key, pattern in patterns.items():
-        match = re.search(pattern, text, flags=re.IGNORECASE)
-        extracted[key] = match.group(1).strip() if match else None
+
+def page_priority(n_pages: int, order=KEY_VALUE_PAGE_ORDER):
+    """
+    Page numbers (1-based) in search order, each page once.
+    - order: sequence of "first", "last", "rest" and/or explicit 1-based page numbers
+    """
+    seen = []
+    for token in order:
+        if token == "first":
+            candidates = [1]
+        elif token == "last":
+            candidates = [n_pages]
+        elif token == "rest":
+            candidates = range(1, n_pages + 1)
+        elif isinstance(token, int):
+            candidates = [token]
+        else:
+            raise ValueError(f"Unknown page order token {token!r}; expected 'first', 'last', 'rest' or a page number")
+        seen.extend(p for p in candidates if 1 <= p <= n_pages and p not in seen)
+    return seen
+
+
+def match_key_values(page_text, n_pages: int, page_order=KEY_VALUE_PAGE_ORDER, audit: dict = None):
+    """
+    Search KEY_VALUE_PATTERNS page by page in page_order; each field stops searching once found
+    and page_text(page_no) is only called for pages some required (not KEY_VALUE_OPTIONAL) field
+    still needs.
+    - audit: optional dict; the page each field was resolved on goes to audit["key_value_pages"]
+    """
+    extracted = {key: None for key in KEY_VALUE_PATTERNS}
+    found_on = {}
+    for page_no in page_priority(n_pages, page_order):
+        pending = [key for key in KEY_VALUE_PATTERNS if key not in found_on]
+        if all(key in KEY_VALUE_OPTIONAL for key in pending):
+            break
+        text = page_text(page_no)
+        for key in pending:
+            match = re.search(KEY_VALUE_PATTERNS[key], text, flags=re.IGNORECASE)
+            if match:
+                extracted[key] = match.group(1).strip()
+                found_on[key] = page_no
+    if audit is not None:
+        audit["key_value_pages"] = {key: found_on.get(key) for key in KEY_VALUE_PATTERNS}
     return extracted
 
 
+@contextmanager
+def captured_page_text(texts: dict, source, text_backend: str = "pdfplumber"):
+    """
+    Context manager yielding page_text(page_no) for match_key_values over a capture's "texts":
+    pages without captured text (skipped by the pre-scan) are read from source, which is only
+    opened if match_key_values reaches one of them; read texts are added to texts.
+    - texts: {page: text} as iter_pdf_page_tables captures it
+    - source: the PDF the texts were captured from (see open_pdf)
+    """
+    with ExitStack() as stack:
+        document = None
+
+        def page_text(page_no):
+            nonlocal document
+            if page_no not in texts:
+                if document is None:
+                    document = stack.enter_context(open_text_document(source, text_backend))
+                texts[page_no] = document.page_text(page_no)
+            return texts[page_no]
+
+        yield page_text
+
+
+def extract_key_values_from_text(pdf_path, page_order=KEY_VALUE_PAGE_ORDER, audit: dict = None,
+                                 text_backend: str = "pdfplumber"):
+    """
+    Extract key-value metadata (invoice no, date, total; subtotal and tax when printed) using regex.
+    Pages are searched in page_order; each field stops searching once found and text is
+    only extracted from pages some field still needs.
+    - audit: optional dict; the page each field was resolved on goes to audit["key_value_pages"]
+    - text_backend: TEXT_BACKENDS key used to read page text
+    """
+    with open_text_document(pdf_path, text_backend) as document:
+        return match_key_values(document.page_text, document.n_pages, page_order, audit)
+
+
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Basic cleaning for extracted tables."""
     df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
@@ -178,6 +1069,66 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def to_number(cell):
+    """Robust per-cell numeric parser (currency symbols and separators stripped); None when not a number."""
+    # handle list/tuple
+    if isinstance(cell, (list, tuple)):
+        for item in cell:
+            if item is None:
+                continue
+            s = str(item).strip()
+            if s.lower() not in ("", "nan", "none"):
+                cell = item
+                break
+        else:
+            return None
+
+    # handle pandas Series-like by trying to extract first element
+    if hasattr(cell, "__len__") and not isinstance(cell, (str, bytes)):
+        try:
+            # handle pandas Series with iloc to avoid FutureWarning
+            if hasattr(cell, 'iloc'):
+                # It's a pandas Series, use iloc[0] to get first element
+                if len(cell) > 0:
+                    cell = cell.iloc[0]
+                else:
+                    return None
+            else:
+                # convert to list and pick first non-empty
+                lst = list(cell)
+                for item in lst:
+                    if item is None:
+                        continue
+                    s = str(item).strip()
+                    if s.lower() not in ("", "nan", "none"):
+                        cell = item
+                        break
+                else:
+                    return None
+        except Exception:
+            cell = str(cell)
+
+    # now cell should be scalar-ish
+    try:
+        if pd.isna(cell):
+            return None
+    except Exception:
+        pass
+
+    s = str(cell).strip()
+    if s.lower() in ("", "nan", "none"):
+        return None
+
+    s = s.replace(",", "").replace("$", "")
+    s = re.sub(r"[^\d.\-]", "", s)
+    if s in ("", "-", "."):
+        return None
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
 def normalize_numeric_columns(df: pd.DataFrame):
     """
     Convert common currency/number-looking columns to numeric.
@@ -255,65 +1206,6 @@ def normalize_numeric_columns(df: pd.DataFrame):
     if col_map:
         df = df.rename(columns=col_map)
 
-    # robust per-cell numeric parser
-    def to_number(cell):
-        # handle list/tuple
-        if isinstance(cell, (list, tuple)):
-            for item in cell:
-                if item is None:
-                    continue
-                s = str(item).strip()
-                if s.lower() not in ("", "nan", "none"):
-                    cell = item
-                    break
-            else:
-                return None
-
-        # handle pandas Series-like by trying to extract first element
-        if hasattr(cell, "__len__") and not isinstance(cell, (str, bytes)):
-            try:
-                # handle pandas Series with iloc to avoid FutureWarning
-                if hasattr(cell, 'iloc'):
-                    # It's a pandas Series, use iloc[0] to get first element
-                    if len(cell) > 0:
-                        cell = cell.iloc[0]
-                    else:
-                        return None
-                else:
-                    # convert to list and pick first non-empty
-                    lst = list(cell)
-                    for item in lst:
-                        if item is None:
-                            continue
-                        s = str(item).strip()
-                        if s.lower() not in ("", "nan", "none"):
-                            cell = item
-                            break
-                    else:
-                        return None
-            except Exception:
-                cell = str(cell)
-
-        # now cell should be scalar-ish
-        try:
-            if pd.isna(cell):
-                return None
-        except Exception:
-            pass
-
-        s = str(cell).strip()
-        if s.lower() in ("", "nan", "none"):
-            return None
-
-        s = s.replace(",", "").replace("$", "")
-        s = re.sub(r"[^\d.\-]", "", s)
-        if s in ("", "-", "."):
-            return None
-        try:
-            return float(s)
-        except Exception:
-            return None
-
     # apply per-column conversions (use apply to keep it per-cell)
     if "quantity" in df.columns:
         df["quantity"] = df["quantity"].apply(to_number)
@@ -377,30 +1269,395 @@ def normalize_numeric_columns(df: pd.DataFrame):
     return df
 
 
-def parse_single_pdf(pdf_path: Path, output_dir: Path):
-    """Parse a single PDF and export results."""
-    print(f"🔍 Parsing: {pdf_path.name}")
-    audit = {"file": pdf_path.name, "pages": 0, "tables_found": 0, "warnings": []}
+# ---------------------------
+# Row Tables (pandas-free fast path)
+# ---------------------------
+NUMERIC_COLUMNS = ["quantity", "unit_price", "line_total"]
 
-    # Extract tables
-    tables = extract_tables_from_pdf(pdf_path)
-    if not tables:
-        audit["warnings"].append("No tables detected.")
-        return audit
 
-    # Combine tables
-    combined_df = pd.concat([clean_dataframe(df) for df in tables], ignore_index=True)
+class UnsupportedRowShape(Exception):
+    """Raised when a table shape is only handled by the pandas pipeline (e.g. duplicate columns)."""
 
-    # Normalize numeric columns & compute line totals
-    combined_df = normalize_numeric_columns(combined_df)
 
-    audit["pages"] = combined_df["page_number"].nunique()
-    audit["tables_found"] = len(tables)
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
 
-    # Extract metadata
-    metadata = extract_key_values_from_text(pdf_path)
-    audit.update(metadata)
 
+class RowTable:
+    """
+    Column-named rows for the pandas-free pipeline: `columns` is a list of names and
+    `rows` a list of row lists. Mirrors the DataFrame operations the parser needs.
+    """
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns, rows):
+        self.columns = list(columns)
+        self.rows = [list(r) for r in rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name) -> list:
+        idx = self.columns.index(name)
+        return [r[idx] for r in self.rows]
+
+    def set_column(self, name, values):
+        """Replace column `name` (or append it) with a list of values or a scalar."""
+        if not isinstance(values, list):
+            values = [values] * len(self.rows)
+        if name in self.columns:
+            idx = self.columns.index(name)
+            for row, v in zip(self.rows, values):
+                row[idx] = v
+        else:
+            self.columns.append(name)
+            for row, v in zip(self.rows, values):
+                row.append(v)
+
+    def drop_columns(self, names):
+        keep = [i for i, c in enumerate(self.columns) if c not in names]
+        self.columns = [self.columns[i] for i in keep]
+        self.rows = [[r[i] for i in keep] for r in self.rows]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "RowTable":
+        values = df.astype(object).where(df.notna(), None).values.tolist()
+        return cls([str(c) for c in df.columns], values)
+
+    def to_dataframe(self, numeric_columns=NUMERIC_COLUMNS) -> pd.DataFrame:
+        """DataFrame with the given columns as float64 (as normalize_numeric_columns leaves them)."""
+        df = pd.DataFrame(self.rows, columns=self.columns)
+        for c in numeric_columns:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors="coerce")
+        return df
+
+    def to_csv(self, path: Path):
+        """Write like DataFrame.to_csv(index=False): missing values as empty fields."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(self.columns)
+            writer.writerows(["" if _is_missing(v) else v for v in row] for row in self.rows)
+
+
+def clean_rows(table: RowTable) -> RowTable:
+    """clean_dataframe for a RowTable."""
+    if any(c is None for c in table.columns):
+        raise UnsupportedRowShape("unnamed column")  # pandas' name for it depends on the version
+    columns = [str(c).strip().lower().replace(" ", "_") for c in table.columns]
+    return RowTable(columns, [r for r in table.rows if not all(_is_missing(v) for v in r)])
+
+
+def concat_rows(tables) -> RowTable:
+    """pd.concat(tables, ignore_index=True) for RowTables: columns in order of first appearance."""
+    columns = []
+    for t in tables:
+        if len(set(t.columns)) != len(t.columns):
+            raise UnsupportedRowShape(f"duplicate columns {t.columns}")
+        columns.extend(c for c in t.columns if c not in columns)
+    rows = []
+    for t in tables:
+        if t.columns == columns:
+            rows.extend(t.rows)
+            continue
+        positions = [t.columns.index(c) if c in t.columns else None for c in columns]
+        rows.extend([r[p] if p is not None else None for p in positions] for r in t.rows)
+    return RowTable(columns, rows)
+
+
+def normalize_numeric_rows(table: RowTable) -> RowTable:
+    """normalize_numeric_columns for a RowTable (same column merges, renames and two-pass to_number)."""
+    lc = lambda cols: [str(c).lower().strip() for c in cols]  # noqa: E731
+
+    cols = table.columns
+    i = 0
+    while i < len(cols) - 1:
+        a, b = lc(cols)[i], lc(cols)[i + 1]
+        target = "line_total" if ("line" in a and "total" in b) else "unit_price" if ("unit" in a and "price" in b) else None
+        if target is None:
+            i += 1
+            continue
+        if target in cols:
+            raise UnsupportedRowShape(f"{target} already present")
+        first, second = table.column(cols[i]), table.column(cols[i + 1])
+        merged = []
+        for v1, v2 in zip(first, second):
+            v1 = "" if _is_missing(v1) else v1
+            v2 = "" if _is_missing(v2) else v2
+            merged.append(v1 if str(v1).strip() else v2 if str(v2).strip() else "")
+        table.set_column(target, merged)
+        table.drop_columns({cols[i], cols[i + 1]})
+        cols = table.columns
+
+    renamed = []
+    for c, low in zip(cols, lc(cols)):
+        if "line" in low and "total" in low:
+            renamed.append("line_total")
+        elif "unit" in low and "price" in low:
+            renamed.append("unit_price")
+        elif low in ("qty", "quantity"):
+            renamed.append("quantity")
+        elif low == "price":
+            renamed.append("unit_price")
+        elif low == "total":
+            renamed.append("line_total")
+        elif "description" in low:
+            renamed.append("description")
+        else:
+            renamed.append(c)
+    if len(set(renamed)) != len(renamed):
+        raise UnsupportedRowShape(f"columns collide after renaming: {renamed}")
+    table.columns = renamed
+
+    def convert(name):
+        if name in table.columns:
+            table.set_column(name, [to_number(v) for v in table.column(name)])
+
+    for c in NUMERIC_COLUMNS:
+        convert(c)
+    if "line_total" not in table.columns and {"quantity", "unit_price"}.issubset(table.columns):
+        table.set_column("line_total", [
+            q * p if q is not None and p is not None else None
+            for q, p in zip(table.column("quantity"), table.column("unit_price"))
+        ])
+    for c in NUMERIC_COLUMNS:
+        convert(c)  # second pass, as normalize_numeric_columns re-applies to_number before pd.to_numeric
+    return table
+
+
+# ---------------------------
+# Dtype Policies
+# ---------------------------
+AMOUNT_COLUMNS = ["unit_price", "line_total"]
+
+
+@dataclass(frozen=True)
+class DtypePolicy:
+    """
+    In-memory storage types for line-item frames (see apply_dtype_policy).
+    - amounts: "float64", "float32", or "cents" (unit_price/line_total become nullable
+      Int64 columns named <col>_cents, holding round(value * 100))
+    - quantity: float dtype for the quantity column
+    - text: "object" or "category" for description and any other string columns
+    - page_number: integer dtype for page_number (widened automatically if it would overflow)
+    """
+    amounts: str = "float64"
+    quantity: str = "float64"
+    text: str = "object"
+    page_number: str = "int64"
+
+
+DTYPE_POLICIES = {
+    "default": DtypePolicy(),
+    "compact": DtypePolicy(amounts="float32", quantity="float32", text="category", page_number="int16"),
+    "cents": DtypePolicy(amounts="cents", quantity="float32", text="category", page_number="int16"),
+}
+
+
+def get_dtype_policy(policy) -> DtypePolicy:
+    """Resolve a DTYPE_POLICIES key (or pass through a DtypePolicy)."""
+    if isinstance(policy, DtypePolicy):
+        return policy
+    if policy not in DTYPE_POLICIES:
+        raise ValueError(f"Unknown dtype policy {policy!r}; expected one of {sorted(DTYPE_POLICIES)}")
+    return DTYPE_POLICIES[policy]
+
+
+def _is_text_column(series: pd.Series) -> bool:
+    return series.dtype == object or pd.api.types.is_string_dtype(series)
+
+
+def apply_dtype_policy(df: pd.DataFrame, policy="compact") -> pd.DataFrame:
+    """Return a copy of a normalized line-item frame stored with the policy's dtypes."""
+    policy = get_dtype_policy(policy)
+    df = df.copy()
+    for c in list(df.columns):
+        if c == "page_number":
+            pages = pd.to_numeric(df[c], errors="coerce")
+            dtype = policy.page_number
+            if pages.notna().any() and pages.max() > np.iinfo(dtype).max:
+                dtype = "int32"
+            df[c] = pages.astype(dtype if pages.notna().all() else dtype.capitalize())
+        elif c == "quantity":
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(policy.quantity)
+        elif c in AMOUNT_COLUMNS:
+            values = pd.to_numeric(df[c], errors="coerce")
+            if policy.amounts == "cents":
+                df.insert(df.columns.get_loc(c), f"{c}_cents", (values * 100).round().astype("Int64"))
+                df = df.drop(columns=[c])
+            else:
+                df[c] = values.astype(policy.amounts)
+        elif policy.text == "category" and _is_text_column(df[c]):
+            df[c] = df[c].astype("category")
+    return df
+
+
+def concat_line_items(frames, policy="compact") -> pd.DataFrame:
+    """
+    Merge many line-item frames under a dtype policy.
+    - frames: list of DataFrames, or dict of {file name: DataFrame} (adds a "file" column)
+    Text columns are encoded per frame as integer codes into one shared category index, so
+    the merged frame never holds a full object-dtype copy of them.
+    """
+    policy = get_dtype_policy(policy)
+    names = None
+    if isinstance(frames, dict):
+        names, frames = list(frames), list(frames.values())
+    if not frames:
+        return pd.DataFrame()
+    order = list(dict.fromkeys(c for df in frames for c in df.columns))
+
+    categories = {}
+    if policy.text == "category":
+        text_cols = [c for c in order if c not in AMOUNT_COLUMNS and c not in ("quantity", "page_number")
+                     and any(c in df.columns and _is_text_column(df[c]) for df in frames)]
+        for c in text_cols:
+            uniques = [df[c].dropna().unique() for df in frames if c in df.columns]
+            categories[c] = pd.Index(pd.unique(np.concatenate(uniques)))
+
+    # Index.get_indexer reuses the index's cached hash table across frames
+    codes = {c: [] for c in categories}
+    for df in frames:
+        for c, cats in categories.items():
+            codes[c].append(cats.get_indexer(df[c]) if c in df.columns else np.full(len(df), -1))
+    merged = pd.concat([df.drop(columns=[c for c in categories if c in df.columns]) for df in frames],
+                       ignore_index=True)
+    merged = apply_dtype_policy(merged, policy)
+    for c, cats in categories.items():
+        merged[c] = pd.Categorical.from_codes(np.concatenate(codes[c]), dtype=pd.CategoricalDtype(cats))
+
+    if names is not None:
+        file_codes = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+        files = pd.Categorical.from_codes(file_codes, dtype=pd.CategoricalDtype(names))
+        merged["file"] = files if policy.text == "category" else np.asarray(files)
+        order.append("file")
+    if policy.amounts == "cents":
+        order = [f"{c}_cents" if c in AMOUNT_COLUMNS else c for c in order]
+    return merged[order]
+
+
+# ---------------------------
+# Profiling
+# ---------------------------
+PROFILE_ENTRY_POINTS = {"parse_single_pdf", "parse_pdf_to_dataframe", "parse_pdf_to_rows", "profile"}
+
+
+def _frame_label(code) -> str:
+    # collapsed-stack lines are "frame;frame;... count": frames must not contain spaces or ";"
+    return re.sub(r"[\s;]", "_", f"{Path(code.co_filename).stem}:{code.co_name}")
+
+
+class BatchProfiler:
+    """
+    Per-document cProfile capture, aggregated across a batch (see parse_single_pdf(profiler=...)).
+    - sample_interval: seconds between stack samples for the collapsed-stack (flamegraph) output;
+      0 disables sampling
+    - top_functions: dominant functions recorded per document
+    """
+
+    def __init__(self, sample_interval: float = 0.005, top_functions: int = 3):
+        self.sample_interval = sample_interval
+        self.top_functions = top_functions
+        self.stats = None
+        self.documents = []
+        self.stacks = Counter()
+
+    def _sample(self, thread_id: int, stop: threading.Event):
+        while not stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def dominant_functions(self, stats: pstats.Stats):
+        """
+        Parser functions (this module, entry points excluded) with the most cumulative time,
+        plus the functions with the most self time anywhere.
+        """
+        module = Path(__file__).name
+        parser_funcs, hotspots = [], []
+        for (filename, _, func), (_, calls, self_time, cum_time, _) in stats.stats.items():
+            label = f"{Path(filename).stem}:{func}" if filename != "~" else func
+            hotspots.append((self_time, label, calls))
+            if Path(filename).name == module and func not in PROFILE_ENTRY_POINTS:
+                parser_funcs.append((cum_time, func, calls))
+        n = self.top_functions
+        return {
+            "dominant": [{"function": f, "cumulative_s": round(t, 4), "calls": c}
+                         for t, f, c in sorted(parser_funcs, reverse=True)[:n]],
+            "hotspots": [{"function": f, "self_s": round(t, 4), "calls": c}
+                         for t, f, c in sorted(hotspots, reverse=True)[:n]],
+        }
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the enclosed block as one document of the batch."""
+        profiler = cProfile.Profile()
+        stop = threading.Event()
+        sampler = None
+        if self.sample_interval:
+            sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stop), daemon=True)
+            sampler.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            stop.set()
+            if sampler is not None:
+                sampler.join()
+            stats = pstats.Stats(profiler)
+            self.documents.append({"file": name, "seconds": round(elapsed, 4), **self.dominant_functions(stats)})
+            if self.stats is None:
+                self.stats = stats
+            else:
+                self.stats.add(stats)
+
+    def slowest(self, n: int = 10):
+        return sorted(self.documents, key=lambda d: d["seconds"], reverse=True)[:n]
+
+    def dump(self, output_dir: Path, top_n: int = 10) -> dict:
+        """
+        Write profile.pstats (aggregate, for pstats/snakeviz), profile.collapsed (one
+        "frame;frame;... count" line per sampled stack, for flamegraph.pl/speedscope) and
+        profile_summary.json (top_n slowest documents). Returns the written paths.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        paths = {
+            "pstats": output_dir / "profile.pstats",
+            "collapsed": output_dir / "profile.collapsed",
+            "summary": output_dir / "profile_summary.json",
+        }
+        if self.stats is not None:
+            self.stats.dump_stats(paths["pstats"])
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        summary = {
+            "documents": len(self.documents),
+            "total_seconds": round(sum(d["seconds"] for d in self.documents), 4),
+            "slowest": self.slowest(top_n),
+        }
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        return paths
+
+    def print_report(self, top_n: int = 10):
+        print(f"⏱️ Slowest {min(top_n, len(self.documents))} of {len(self.documents)} document(s):")
+        for doc in self.slowest(top_n):
+            dominant = ", ".join(f"{d['function']} {d['cumulative_s']:.2f}s" for d in doc["dominant"])
+            print(f"   {doc['seconds']:8.2f}s  {doc['file']}  [{dominant}]")
+
+
+
+def record_total_validation(audit: dict, metadata: dict, line_sum):
+    """Compare the extracted invoice total with the line-item sum and record the result in audit."""
     # Validate invoice total if possible (robust parsing)
     invoice_total = None
     raw_total = metadata.get("total")
@@ -412,6 +1669,56 @@ def parse_single_pdf(pdf_path: Path, output_dir: Path):
         except Exception:
             invoice_total = None
 
+    # record validation results in audit
+    if invoice_total is not None and line_sum is not None:
+        match = abs(invoice_total - line_sum) < 0.01  # tolerance
+        audit["invoice_total_matches"] = bool(match)
+        audit["line_sum"] = round(float(line_sum), 2)
+        if not match:
+            audit["mismatch_amount"] = round(float(invoice_total - line_sum), 2)
+            audit["warnings"].append("Invoice total does not match sum of line totals.")
+    else:
+        audit["invoice_total_matches"] = None
+        audit["line_sum"] = (round(float(line_sum), 2) if line_sum is not None and not pd.isna(line_sum) else None)
+
+
+PARSE_ENGINES = ("rows", "pandas")
+
+
+def parse_pdf_to_dataframe(pdf_path, prescan: str = None, table_strategy: str = "lines",
+                           table_settings: dict = None, name: str = None, dtype_policy=None,
+                           key_value_page_order=KEY_VALUE_PAGE_ORDER, ocr_mode: str = "fixed",
+                           text_backend: str = "pdfplumber"):
+    """
+    Parse a single PDF into (line_items_df, audit) without writing any files.
+    - line_items_df is None when no tables are detected
+    - dtype_policy: optional DTYPE_POLICIES key or DtypePolicy applied to the returned frame
+    - other arguments: see parse_single_pdf
+    """
+    name = name or pdf_source_name(pdf_path)
+    audit = {"file": name, "pages": 0, "tables_found": 0, "warnings": []}
+
+    # Extract tables
+    tables = extract_tables_from_pdf(pdf_path, prescan=prescan, audit=audit, table_strategy=table_strategy,
+                                     table_settings=table_settings, ocr_mode=ocr_mode, text_backend=text_backend)
+    if not tables:
+        audit["warnings"].append("No tables detected.")
+        return None, audit
+
+    # Combine tables
+    combined_df = pd.concat([clean_dataframe(df) for df in tables], ignore_index=True)
+
+    # Normalize numeric columns & compute line totals
+    combined_df = normalize_numeric_columns(combined_df)
+
+    audit["pages"] = combined_df["page_number"].nunique()
+    audit["tables_found"] = len(tables)
+
+    # Extract metadata
+    metadata = extract_key_values_from_text(pdf_path, page_order=key_value_page_order, audit=audit,
+                                            text_backend=text_backend)
+    audit.update(metadata)
+
     # compute line_sum: prefer explicit line_total column, else compute from qty*unit_price
     line_sum = None
     if "line_total" in combined_df.columns:
@@ -437,24 +1744,163 @@ def parse_single_pdf(pdf_path: Path, output_dir: Path):
             result = prod.sum()
             line_sum = float(result) if not pd.isna(result) else None
 
-    # record validation results in audit
-    if invoice_total is not None and line_sum is not None:
-        match = abs(invoice_total - line_sum) < 0.01  # tolerance
-        audit["invoice_total_matches"] = bool(match)
-        audit["line_sum"] = round(float(line_sum), 2)
-        if not match:
-            audit["mismatch_amount"] = round(float(invoice_total - line_sum), 2)
-            audit["warnings"].append("Invoice total does not match sum of line totals.")
-    else:
-        audit["invoice_total_matches"] = None
-        audit["line_sum"] = (round(float(line_sum), 2) if line_sum is not None and not pd.isna(line_sum) else None)
+    record_total_validation(audit, metadata, line_sum)
+
+    if dtype_policy is not None:
+        combined_df = apply_dtype_policy(combined_df, dtype_policy)
+    return combined_df, audit
+
+
+def normalize_row_tables(tables) -> RowTable:
+    """clean_rows + concat_rows + normalize_numeric_rows, through pandas for shapes only it handles."""
+    try:
+        return normalize_numeric_rows(concat_rows([clean_rows(t) for t in tables]))
+    except UnsupportedRowShape:
+        frames = [clean_dataframe(t.to_dataframe(numeric_columns=())) for t in tables]
+        return RowTable.from_dataframe(normalize_numeric_columns(pd.concat(frames, ignore_index=True)))
+
+
+def rows_line_sum(table: RowTable):
+    """Line-item sum as parse_pdf_to_dataframe computes it: line_total, else quantity * unit_price."""
+    values = []
+    if "line_total" in table.columns:
+        values = [v for v in table.column("line_total") if not _is_missing(v)]
+    if not values and {"quantity", "unit_price"}.issubset(table.columns):
+        values = [q * p for q, p in zip(table.column("quantity"), table.column("unit_price"))
+                  if not _is_missing(q) and not _is_missing(p)]
+    if not values:
+        return None
+    result = float(np.asarray(values, dtype="float64").sum())  # same pairwise summation as Series.sum
+    return result if result == result else None
+
+
+def parse_pdf_to_rows(pdf_path, prescan: str = None, table_strategy: str = "lines",
+                      table_settings: dict = None, name: str = None,
+                      key_value_page_order=KEY_VALUE_PAGE_ORDER, ocr_mode: str = "fixed",
+                      text_backend: str = "pdfplumber"):
+    """
+    parse_pdf_to_dataframe without DataFrames: returns (RowTable | None, audit) with the same
+    content, for small documents where pandas overhead dominates. Call .to_dataframe() on
+    the table when a frame is needed. Shapes only the pandas pipeline handles (duplicate or
+    colliding column names) are normalized through it and converted back.
+    - arguments: see parse_single_pdf
+    """
+    name = name or pdf_source_name(pdf_path)
+    audit = {"file": name, "pages": 0, "tables_found": 0, "warnings": []}
+
+    tables = extract_tables_from_pdf(pdf_path, prescan=prescan, audit=audit, table_strategy=table_strategy,
+                                     table_settings=table_settings, ocr_mode=ocr_mode, as_rows=True,
+                                     text_backend=text_backend)
+    if not tables:
+        audit["warnings"].append("No tables detected.")
+        return None, audit
+
+    combined = normalize_row_tables(tables)
+
+    audit["pages"] = len({v for v in combined.column("page_number") if not _is_missing(v)})
+    audit["tables_found"] = len(tables)
+
+    metadata = extract_key_values_from_text(pdf_path, page_order=key_value_page_order, audit=audit,
+                                            text_backend=text_backend)
+    audit.update(metadata)
+    record_total_validation(audit, metadata, rows_line_sum(combined))
+    return combined, audit
+
+
+def parse_pdf_progressively(pdf_path, first_pages: int = 5, update_pages: int = 25, prescan: str = None,
+                            table_strategy: str = "lines", table_settings: dict = None, name: str = None,
+                            key_value_page_order=KEY_VALUE_PAGE_ORDER, ocr_mode: str = "fixed",
+                            text_backend: str = "pdfplumber"):
+    """
+    parse_pdf_to_rows in installments, so long documents show results before they finish.
+    Yields snapshots {"table": RowTable | None, "audit": dict, "pages_done": int, "pages_total": int,
+    "done": bool}: the first once `first_pages` pages are parsed, then every `update_pages` pages,
+    and a final one (done=True) whose table and audit equal parse_pdf_to_rows's.
+    Intermediate audits take key-values from the pages parsed so far (header fields are usually
+    on page 1; the total often only on the last page) and skip total validation.
+    - first_pages: pages parsed before the first snapshot
+    - update_pages: pages parsed between later snapshots
+    - other arguments: see parse_single_pdf
+    """
+    name = name or pdf_source_name(pdf_path)
+    audit = {"file": name, "pages": 0, "tables_found": 0, "warnings": []}
+    capture = {}
+    tables = []
+
+    def snapshot(pages_done, done):
+        snap_audit = audit if done else dict(audit, warnings=list(audit["warnings"]))
+        if not tables:
+            if done:
+                snap_audit["warnings"].append("No tables detected.")
+                return {"table": None, "audit": snap_audit, "pages_done": pages_done,
+                        "pages_total": capture["n_pages"], "done": True}
+            combined = None
+        else:
+            combined = normalize_row_tables(tables)
+            snap_audit["pages"] = len({v for v in combined.column("page_number") if not _is_missing(v)})
+            snap_audit["tables_found"] = len(tables)
+        with captured_page_text(capture["texts"], pdf_path, text_backend) as page_text:
+            metadata = match_key_values(lambda page_no: page_text(page_no) if page_no <= pages_done else "",
+                                        capture["n_pages"], key_value_page_order, snap_audit)
+        snap_audit.update(metadata)
+        if done:
+            record_total_validation(snap_audit, metadata, rows_line_sum(combined))
+        return {"table": combined, "audit": snap_audit, "pages_done": pages_done,
+                "pages_total": capture["n_pages"], "done": done}
+
+    next_snapshot = first_pages
+    pages = iter_pdf_page_tables(pdf_path, prescan=prescan, audit=audit, table_strategy=table_strategy,
+                                 table_settings=table_settings, ocr_mode=ocr_mode, as_rows=True, capture=capture,
+                                 text_backend=text_backend)
+    for page_no, page_tables in pages:
+        tables.extend(page_tables)
+        if page_no >= next_snapshot and page_no < capture["n_pages"]:
+            next_snapshot = page_no + update_pages
+            yield snapshot(page_no, done=False)
+    yield snapshot(capture["n_pages"], done=True)
+
+
+def parse_single_pdf(pdf_path, output_dir: Path, prescan: str = None,
+                     table_strategy: str = "lines", table_settings: dict = None, name: str = None,
+                     key_value_page_order=KEY_VALUE_PAGE_ORDER, ocr_mode: str = "fixed",
+                     profiler: BatchProfiler = None, engine: str = "rows", text_backend: str = "pdfplumber"):
+    """Parse a single PDF and export results.
+    - pdf_path: path or in-memory source (mmap, bytes, file object) accepted by open_pdf
+    - name: file name used for outputs when pdf_path is not a path (defaults to pdf_source_name)
+    - prescan: optional PRESCAN_LEVELS key used to skip pages that cannot hold a line-item table
+    - table_strategy / table_settings: see extract_tables_from_pdf
+    - key_value_page_order: page search order for key-values, see extract_key_values_from_text
+    - ocr_mode: "fixed", "adaptive" or "regions" OCR for scanned pages, see ocr_pdf_to_text
+    - profiler: optional BatchProfiler that records this document's parse
+    - engine: "rows" (pandas-free parse_pdf_to_rows + csv module) or "pandas"
+      (parse_pdf_to_dataframe + DataFrame.to_csv); both write identical files
+    - text_backend: TEXT_BACKENDS key for key-values and the text-table fallback ("pdfium" reads
+      text in native code; table detection always uses pdfplumber)
+    """
+    if engine not in PARSE_ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {PARSE_ENGINES}")
+    name = name or pdf_source_name(pdf_path)
+    stem = Path(name).stem
+    print(f"🔍 Parsing: {name}")
+    parse = parse_pdf_to_rows if engine == "rows" else parse_pdf_to_dataframe
+    with profiler.profile(name) if profiler is not None else nullcontext():
+        combined, audit = parse(pdf_path, prescan=prescan, table_strategy=table_strategy,
+                                table_settings=table_settings, name=name,
+                                key_value_page_order=key_value_page_order, ocr_mode=ocr_mode,
+                                text_backend=text_backend)
+    audit["document_id"] = pdf_document_id(pdf_path, name)
+    if combined is None:
+        return audit
 
     # Export results
     output_dir.mkdir(parents=True, exist_ok=True)
-    csv_path = output_dir / f"{pdf_path.stem}.csv"
-    json_path = output_dir / f"audit_{pdf_path.stem}.json"
+    csv_path = output_dir / f"{stem}.csv"
+    json_path = output_dir / f"audit_{stem}.json"
 
-    combined_df.to_csv(csv_path, index=False)
+    if engine == "rows":
+        combined.to_csv(csv_path)
+    else:
+        combined.to_csv(csv_path, index=False)
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(audit, f, indent=4)
 
@@ -462,14 +1908,258 @@ def parse_single_pdf(pdf_path: Path, output_dir: Path):
     return audit
 
 
-def parse_all_pdfs(input_dir: Path, output_dir: Path):
-    """Parse all PDFs from the input directory."""
-    pdf_files = list(input_dir.glob("*.pdf"))
-    if not pdf_files:
+# ---------------------------
+# Input Discovery
+# ---------------------------
+def iter_pdf_files(input_dir: Path, recursive: bool = True):
+    """
+    Yield PDFs under input_dir as they are found (os.scandir, depth-first, no sorting), so
+    parsing starts before a huge directory has been listed and memory does not grow with it.
+    - recursive: descend into subdirectories (directory symlinks are not followed)
+    Matches the .pdf extension case-insensitively.
+    """
+    stack = [Path(input_dir)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if recursive and entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                            yield Path(entry.path)
+                    except OSError:
+                        continue  # entry vanished or is unreadable
+        except OSError as e:
+            print(f"⚠️ Cannot list {directory}: {e}")
+
+
+def iter_pdf_list(file_list):
+    """Yield paths from a file with one PDF path per line ("-" reads stdin); blank lines are skipped,
+    and listed paths that are not files are reported and skipped."""
+    with (nullcontext(sys.stdin) if str(file_list) == "-" else open(file_list, encoding="utf-8")) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            path = Path(line)
+            if not path.is_file():
+                print(f"⚠️ Listed PDF not found: {path}")
+                continue
+            yield path
+
+
+def mirrored_output_dir(pdf_path: Path, input_dir: Path, output_dir: Path) -> Path:
+    """output_dir plus pdf_path's directory, so same-named files in different folders do not
+    overwrite each other's outputs (or journal entries): the subdirectory under input_dir, or for
+    paths outside it (and any path when input_dir is None) the whole directory path, without its
+    drive/root and with ".." as "__" so outputs stay inside output_dir."""
+    parent = Path(pdf_path).parent
+    if input_dir is not None:
+        try:
+            return output_dir / parent.relative_to(input_dir)
+        except ValueError:
+            pass
+    parts = parent.parts[1:] if parent.anchor else parent.parts
+    return output_dir.joinpath(*("__" if part == ".." else part for part in parts))
+
+
+# ---------------------------
+# Batch Journal
+# ---------------------------
+JOURNAL_FSYNC_POLICIES = ("always", "batch", "never")
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BatchJournal:
+    """
+    Append-only JSON-lines log of finished documents, so a restarted batch skips completed work.
+    Each record holds the input path, size, mtime, sha256 and output locations.
+    - path: journal file (created if missing; a torn last line from a crash is ignored)
+    - fsync: "always" (fsync every record), "batch" (every fsync_every records and on close),
+      or "never" (leave flushing to the OS)
+    Every record is a single os.write on an O_APPEND descriptor, so several processes may
+    append to the same journal.
+    """
+
+    def __init__(self, path: Path, fsync: str = "batch", fsync_every: int = 64):
+        if fsync not in JOURNAL_FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}; expected one of {JOURNAL_FSYNC_POLICIES}")
+        self.path = Path(path)
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self._by_stat = {}
+        self._by_hash = {}
+        self._hashes = {}  # stat key -> sha256 computed by is_done, reused by record
+        self._unsynced = 0
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def __len__(self):
+        return len(self._by_stat)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            if self.fsync != "never" and self._unsynced:
+                os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    def _index(self, entry: dict):
+        self._by_stat[(entry["path"], entry["size"], entry["mtime_ns"], entry["output_dir"])] = entry
+        self._by_hash[(entry["path"], entry["sha256"], entry["output_dir"])] = entry
+
+    @staticmethod
+    def _stat_key(pdf_path: Path):
+        st = os.stat(pdf_path)
+        return str(Path(pdf_path).resolve()), st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _outputs_exist(entry: dict) -> bool:
+        return entry["csv"] is None or Path(entry["csv"]).exists()
+
+    def is_done(self, pdf_path: Path, output_dir: Path) -> bool:
+        """
+        True when pdf_path was already parsed into output_dir and its CSV is still there.
+        Unchanged files are matched on (path, size, mtime) without being read; a file whose
+        mtime changed is hashed, matched on (path, content), and re-journaled under its new mtime.
+        """
+        key = self._stat_key(pdf_path)
+        entry = self._by_stat.get(key + (str(Path(output_dir).resolve()),))
+        if entry is not None:
+            return self._outputs_exist(entry)
+        if not self._by_hash:
+            return False  # nothing to match on content: skip hashing on a fresh journal
+        sha256 = self._hashes[key] = file_sha256(pdf_path)
+        entry = self._by_hash.get((key[0], sha256, str(Path(output_dir).resolve())))
+        if entry is None or not self._outputs_exist(entry):
+            return False
+        self.record(pdf_path, output_dir, csv_path=entry["csv"], audit_path=entry["audit"])
+        return True
+
+    def record(self, pdf_path: Path, output_dir: Path, csv_path: Path = None, audit_path: Path = None,
+               sha256: str = None):
+        """Append a finished document to the journal."""
+        key = self._stat_key(pdf_path)
+        path, size, mtime_ns = key
+        entry = {
+            "path": path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256 or self._hashes.pop(key, None) or file_sha256(pdf_path),
+            "output_dir": str(Path(output_dir).resolve()),
+            "csv": str(csv_path) if csv_path else None,
+            "audit": str(audit_path) if audit_path else None,
+            "finished": time.time(),
+        }
+        os.write(self._fd, (json.dumps(entry) + "\n").encode("utf-8"))
+        self._unsynced += 1
+        if self.fsync == "always" or (self.fsync == "batch" and self._unsynced >= self.fsync_every):
+            os.fsync(self._fd)
+            self._unsynced = 0
+        self._index(entry)
+        return entry
+
+
+def _journal_outputs(output_dir: Path, pdf_path: Path):
+    """CSV and audit paths parse_single_pdf wrote for pdf_path (None when it exported nothing)."""
+    stem = Path(pdf_path).stem
+    csv_path = output_dir / f"{stem}.csv"
+    if not csv_path.exists():
+        return None, None
+    return csv_path, output_dir / f"audit_{stem}.json"
+
+
+def parse_all_pdfs(input_dir: Path, output_dir: Path, prescan: str = None,
+                   table_strategy: str = "lines", table_settings: dict = None, ocr_mode: str = "fixed",
+                   profiler: BatchProfiler = None, journal: BatchJournal = None, workers: int = 1,
+                   engine: str = "rows", recursive: bool = True, file_list=None, text_backend: str = "pdfplumber"):
+    """Parse all PDFs from the input directory (or a file list), streaming them from discovery.
+    - input_dir: directory searched with iter_pdf_files; outputs mirror its subdirectories (with a
+      file list, pass None: outputs then mirror each listed path's directory, see mirrored_output_dir)
+    - journal: optional BatchJournal; journaled documents are skipped and finished ones recorded
+    - workers: parse in this many processes (profiling needs workers=1)
+    - recursive: include PDFs in subdirectories of input_dir
+    - file_list: read PDF paths from this file ("-" for stdin) instead of listing input_dir
+    - text_backend: see parse_single_pdf
+    """
+    if workers > 1 and profiler is not None:
+        raise ValueError("Profiling requires workers=1")
+    pdf_files = iter_pdf_list(file_list) if file_list is not None else iter_pdf_files(input_dir, recursive)
+
+    kwargs = dict(prescan=prescan, table_strategy=table_strategy, table_settings=table_settings, ocr_mode=ocr_mode,
+                  engine=engine, text_backend=text_backend)
+    counts = {"found": 0, "skipped": 0}
+
+    def todo():
+        for pdf_path in pdf_files:
+            counts["found"] += 1
+            pdf_output_dir = mirrored_output_dir(pdf_path, input_dir, output_dir)
+            if journal is not None and journal.is_done(pdf_path, pdf_output_dir):
+                counts["skipped"] += 1
+                continue
+            yield pdf_path, pdf_output_dir
+
+    def finished(pdf_path, pdf_output_dir):
+        if journal is not None:
+            csv_path, audit_path = _journal_outputs(pdf_output_dir, pdf_path)
+            journal.record(pdf_path, pdf_output_dir, csv_path=csv_path, audit_path=audit_path)
+
+    if workers <= 1:
+        for pdf_path, pdf_output_dir in todo():
+            try:
+                parse_single_pdf(pdf_path, pdf_output_dir, profiler=profiler, **kwargs)
+            except Exception as e:
+                print(f"❌ Failed: {pdf_path.name} ({e})")
+                continue
+            finished(pdf_path, pdf_output_dir)
+    else:
+        # workers only parse; the journal is written here, by the one parent process.
+        # At most 2 * workers documents are in flight, so discovery stays lazy.
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                pdf_path, pdf_output_dir = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Failed: {pdf_path.name} ({e})")
+                    continue
+                finished(pdf_path, pdf_output_dir)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for pdf_path, pdf_output_dir in todo():
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[pool.submit(parse_single_pdf, pdf_path, pdf_output_dir, **kwargs)] = (pdf_path, pdf_output_dir)
+            collect(as_completed(list(pending)))
+
+    if not counts["found"]:
         print("⚠️ No PDF files found in input directory.")
-        return
-    for pdf_path in pdf_files:
-        parse_single_pdf(pdf_path, output_dir)
+    elif counts["skipped"]:
+        print(f"⏭️ Skipped {counts['skipped']} journaled PDF(s)")
 
 
 # ---------------------------
@@ -478,7 +2168,44 @@ def parse_all_pdfs(input_dir: Path, output_dir: Path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse PDFs into structured CSVs.")
     parser.add_argument("--input", type=str, default=str(DEFAULT_INPUT_DIR), help="Input directory containing PDFs")
+    parser.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=True,
+                        help="Include PDFs in subdirectories (outputs mirror the input tree)")
+    parser.add_argument("--file-list", type=str, default=None,
+                        help="Parse the PDFs listed in this file, one path per line ('-' reads stdin); "
+                             "outputs mirror each listed path's folder")
     parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT_DIR), help="Output directory for extracted CSVs")
+    parser.add_argument("--prescan", choices=sorted(PRESCAN_LEVELS), default=None,
+                        help="Skip pages that cannot hold a line-item table (higher levels skip more)")
+    parser.add_argument("--table-strategy", choices=sorted(TABLE_SETTINGS_PROFILES) + ["auto"], default="lines",
+                        help="pdfplumber table detection profile; 'auto' picks one on the first table page")
+    parser.add_argument("--table-settings", type=json.loads, default=None,
+                        help='JSON pdfplumber table_settings overrides, e.g. \'{"explicit_vertical_lines": [45, 295]}\'')
+    parser.add_argument("--ocr-mode", choices=["fixed", "adaptive", "regions"], default="fixed",
+                        help="OCR scanned pages at a fixed 300 DPI, at low DPI with confidence-driven retry, "
+                             "or only their dense text blocks")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each document; writes pstats, collapsed stacks and a summary to <output>/profile")
+    parser.add_argument("--profile-top", type=int, default=10, help="Slowest documents to report with --profile")
+    parser.add_argument("--journal", type=str, default=None,
+                        help="Batch journal file; finished PDFs are recorded and skipped when the run is restarted")
+    parser.add_argument("--fsync", choices=JOURNAL_FSYNC_POLICIES, default="batch",
+                        help="Journal durability: fsync every record, every 64 records, or never")
+    parser.add_argument("--workers", type=int, default=1, help="Parse PDFs in this many processes")
+    parser.add_argument("--engine", choices=PARSE_ENGINES, default="rows",
+                        help="Line-item pipeline: plain rows + csv module (fast for small documents) or pandas")
+    parser.add_argument("--text-backend", choices=sorted(TEXT_BACKENDS), default="pdfplumber",
+                        help="Text for key-values and the text-table fallback: pdfplumber, or pdfium (native, faster)")
     args = parser.parse_args()
 
-    parse_all_pdfs(Path(args.input), Path(args.output))
+    profiler = BatchProfiler() if args.profile else None
+    with BatchJournal(args.journal, fsync=args.fsync) if args.journal else nullcontext() as journal:
+        input_dir = None if args.file_list is not None else Path(args.input)
+        parse_all_pdfs(input_dir, Path(args.output), prescan=args.prescan,
+                       table_strategy=args.table_strategy, table_settings=args.table_settings,
+                       ocr_mode=args.ocr_mode, profiler=profiler, journal=journal, workers=args.workers,
+                       engine=args.engine, recursive=args.recursive, file_list=args.file_list,
+                       text_backend=args.text_backend)
+    if profiler is not None:
+        paths = profiler.dump(Path(args.output) / "profile", top_n=args.profile_top)
+        profiler.print_report(args.profile_top)
+        print(f"📊 Profile: {paths['pstats']} | {paths['collapsed']} | {paths['summary'].name}")
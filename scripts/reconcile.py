@@ -0,0 +1,187 @@
+"""
+reconcile.py
+Description:
+Batch reconciliation over consolidated results: one pass of grouped pandas/NumPy operations on
+the audit table (one row per document) and, optionally, the consolidated line items, instead of
+per-document validation. Checks:
+
+    total_mismatch      declared total vs. line-item sum, outside the tolerance
+    tax_mismatch        subtotal + tax vs. declared total (documents that print a subtotal
+                        and a tax line; see KEY_VALUE_PATTERNS)
+    duplicate_invoice   invoice number seen on more than one document
+    outlier_total       declared total far from the batch (modified z-score of log amounts)
+    unverifiable        no declared total or no line items to compare it with
+
+Audits come from parse_all_pdfs output directories (audit_*.json), audit lists
+(arrow_results' <stem>_audits.json) or job-queue exports; line items from arrow_results'
+Feather file, whose "file" column holds each audit's "document_id" (the PDF path, so same-named
+files in different folders stay apart). Without line items, each audit's line_sum is used.
+
+Usage:
+    python -m scripts.reconcile --audits data/extracted --report data/extracted/reconciliation.csv
+    python -m scripts.reconcile --audits data/extracted/line_items_audits.json \\
+        --line-items data/extracted/line_items.feather --tolerance 0.01 --rel-tolerance 0.0005
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+AMOUNT_FIELDS = ("total", "subtotal", "tax")
+CHECKS = ("total_mismatch", "tax_mismatch", "duplicate_invoice", "outlier_total", "unverifiable")
+
+
+def iter_audits(source):
+    """
+    Audit dicts from a directory (audit_*.json, recursively), a JSON list file or a single audit file.
+    Directory audits without a "document_id" get their path relative to the directory instead.
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in source.rglob("audit_*.json"):
+            with open(path, encoding="utf-8") as f:
+                audit = json.load(f)
+            audit.setdefault("document_id", path.relative_to(source).as_posix())
+            yield audit
+        return
+    with open(source, encoding="utf-8") as f:
+        data = json.load(f)
+    yield from (data if isinstance(data, list) else [data])
+
+
+def audits_to_frame(audits) -> pd.DataFrame:
+    """One row per document with the fields reconciliation needs (missing fields become NaN/None)."""
+    columns = ["file", "document_id", "invoice_no", "date", *AMOUNT_FIELDS, "line_sum"]
+    rows = [[audit.get(c) for c in columns] for audit in audits]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """Vectorized record_total_validation amount parsing: "$1,234.50" -> 1234.5, anything else -> NaN."""
+    text = values.astype("string").str.strip().str.replace(r"[^\d.\-]", "", regex=True)
+    return pd.to_numeric(text.where(~text.isin(["", "-", "."])), errors="coerce").astype("float64")
+
+
+def line_sums(line_items: pd.DataFrame) -> pd.Series:
+    """Per-document line-item sum (keyed by the "file" column) as rows_line_sum computes it:
+    line_total, else quantity * unit_price."""
+    grouped = line_items.groupby("file", observed=True, sort=False)
+    total = None
+    if "line_total" in line_items.columns:
+        total = grouped["line_total"].sum(min_count=1)
+    if {"quantity", "unit_price"}.issubset(line_items.columns):
+        product = (line_items["quantity"] * line_items["unit_price"]).groupby(
+            line_items["file"], observed=True, sort=False).sum(min_count=1)
+        total = product if total is None else total.fillna(product)
+    if total is None:
+        return pd.Series(dtype="float64")
+    total.index = total.index.astype(str)
+    return total
+
+
+def invoice_keys(values: pd.Series) -> pd.Series:
+    """Invoice numbers compared case- and whitespace-insensitively."""
+    return values.astype("string").str.strip().str.upper()
+
+
+def robust_z(values: pd.Series) -> pd.Series:
+    """Modified z-score (0.6745 * (x - median) / MAD) of log amounts; NaN where undefined."""
+    logs = np.log1p(values.where(values > 0))
+    median = logs.median()
+    mad = (logs - median).abs().median()
+    if not mad or np.isnan(mad):
+        return pd.Series(np.nan, index=values.index)
+    return 0.6745 * (logs - median) / mad
+
+
+def document_keys(audits: pd.DataFrame) -> pd.Series:
+    """Key joining audits to line items: "document_id", else "file" (audits written before the id existed)."""
+    return audits["document_id"].where(audits["document_id"].notna(), audits["file"]).astype(str)
+
+
+def reconcile(audits: pd.DataFrame, line_items: pd.DataFrame = None, tolerance: float = 0.01,
+              rel_tolerance: float = 0.0, outlier_z: float = 3.5) -> pd.DataFrame:
+    """
+    Run every check over a batch; returns the audit frame with parsed amounts, differences and
+    one boolean column per CHECKS entry.
+    - line_items: consolidated line items whose "file" column holds document ids (see document_keys);
+      their sums take precedence over the audits' line_sum
+    - tolerance / rel_tolerance: amounts match when |difference| < max(tolerance, rel_tolerance * |total|),
+      the same comparison record_total_validation makes with its fixed 0.01
+    - outlier_z: modified z-score beyond which a declared total is an outlier
+    """
+    report = audits.copy()
+    for field in AMOUNT_FIELDS:
+        report[field] = parse_amounts(report[field])
+    report["line_sum"] = pd.to_numeric(report["line_sum"], errors="coerce").astype("float64")
+    if line_items is not None:
+        sums = line_sums(line_items)
+        report["line_sum"] = document_keys(report).map(sums).astype("float64").fillna(report["line_sum"])
+
+    allowed = np.maximum(tolerance, rel_tolerance * report["total"].abs())
+    report["total_diff"] = report["total"] - report["line_sum"]
+    report["total_mismatch"] = report["total_diff"].abs() >= allowed  # NaN compares False
+
+    report["tax_diff"] = report["subtotal"] + report["tax"] - report["total"]
+    report["tax_mismatch"] = report["tax_diff"].abs() >= allowed
+
+    invoice_key = invoice_keys(report["invoice_no"])
+    report["duplicate_count"] = invoice_key.map(invoice_key.value_counts()).fillna(0).astype("int64")
+    report["duplicate_invoice"] = report["duplicate_count"] > 1
+
+    report["total_z"] = robust_z(report["total"])
+    report["outlier_total"] = report["total_z"].abs() > outlier_z
+
+    report["unverifiable"] = report["total"].isna() | report["line_sum"].isna()
+    return report
+
+
+def summarize(report: pd.DataFrame) -> dict:
+    flagged = report[list(CHECKS)].any(axis=1)
+    return {
+        "documents": int(len(report)),
+        "flagged": int(flagged.sum()),
+        **{check: int(report[check].sum()) for check in CHECKS},
+        "total_mismatch_amount": round(float(report.loc[report["total_mismatch"], "total_diff"].abs().sum()), 2),
+        "duplicate_invoice_numbers": int(invoice_keys(report.loc[report["duplicate_invoice"], "invoice_no"]).nunique()),
+    }
+
+
+def mismatches(report: pd.DataFrame) -> pd.DataFrame:
+    """Flagged documents only, worst total difference first."""
+    flagged = report[report[list(CHECKS)].any(axis=1)]
+    return flagged.sort_values("total_diff", key=lambda d: d.abs(), ascending=False, na_position="last")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile a batch of parsed documents.")
+    parser.add_argument("--audits", type=str, default="data/extracted",
+                        help="Directory of audit_*.json files, or a JSON file with a list of audits")
+    parser.add_argument("--line-items", type=str, default=None,
+                        help="Consolidated line items (Feather/Parquet/CSV with a 'file' column of document ids)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Absolute amount tolerance")
+    parser.add_argument("--rel-tolerance", type=float, default=0.0, help="Relative amount tolerance (of the total)")
+    parser.add_argument("--outlier-z", type=float, default=3.5, help="Modified z-score for outlier totals")
+    parser.add_argument("--report", type=str, default="data/extracted/reconciliation.csv",
+                        help="Mismatch report (flagged documents); the summary goes to <stem>_summary.json")
+    args = parser.parse_args()
+
+    line_items = None
+    if args.line_items:
+        suffix = Path(args.line_items).suffix.lower()
+        readers = {".feather": pd.read_feather, ".arrow": pd.read_feather, ".parquet": pd.read_parquet}
+        line_items = readers.get(suffix, pd.read_csv)(args.line_items)
+
+    report = reconcile(audits_to_frame(iter_audits(args.audits)), line_items, tolerance=args.tolerance,
+                       rel_tolerance=args.rel_tolerance, outlier_z=args.outlier_z)
+    summary = summarize(report)
+    report_path = Path(args.report)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    mismatches(report).to_csv(report_path, index=False)
+    with open(report_path.with_name(f"{report_path.stem}_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+    print(json.dumps(summary, indent=4))
+    print(f"✅ Exported: {report_path}")
@@ -0,0 +1,275 @@
+"""
+stage_store.py
+Description:
+Staged, persisted parsing so rule changes do not re-read PDFs. A document is processed in
+three stages, each stored as gzip'd JSON keyed by the document's sha256 and the stage's
+config key:
+
+    pages   page text layers, OCR/fallback text and pdfplumber tables (layout analysis, OCR)
+    tables  raw tables: pdfplumber tables plus text-fallback tables parsed from stored text
+    rows    normalized line items and the audit
+
+A stage's key hashes its settings, the source code of the functions that implement it and
+the key of the stage before it, so editing the fallback header rules or the column mapping
+in normalize_numeric_rows invalidates exactly the stages downstream of the change. A re-run
+restarts from the earliest stage whose key has no stored artifact.
+
+Usage:
+    python -m scripts.stage_store --input data/raw --output data/extracted --store data/stages
+"""
+
+import argparse
+import gzip
+import hashlib
+import inspect
+import json
+import re
+from pathlib import Path
+
+from scripts import parse_pdf_data as core
+
+STAGES = ("pages", "tables", "rows")
+STAGE_FORMAT = 2
+
+# Functions, classes and rule tables each stage depends on (everything their code reaches in
+# parse_pdf_data, see tests/test_stage_store.py); their source is part of the stage key
+STAGE_CODE = {
+    "pages": ["extract_tables_from_pdf", "iter_pdf_page_tables", "extract_page_tables", "resolve_table_settings",
+              "trim_table_to_header", "header_row_index", "repair_header_cells", "table_is_usable",
+              "line_item_column", "prescan_page", "content_stream_signals", "layout_signals", "_decode_string",
+              "_resource", "_subtype", "_latin1_font", "_ruling_shapes", "UndecodableContent", "page_fallback_text",
+              "ocr_pdf_to_text", "ocr_pdf_page_adaptive", "ocr_pdf_page_regions", "find_text_regions", "_runs",
+              "ocr_regions", "binarize_image", "words_to_text", "open_pdf", "open_text_document",
+              "open_pdfplumber_text", "open_pdfium_text", "TextDocument", "_BufferReader", "_pypdfium2", "to_number",
+              "RowTable", "_is_missing", "TABLE_SETTINGS_PROFILES", "AUTO_STRATEGY_ORDER", "PRESCAN_LEVELS",
+              "TABLE_HEADER_KEYWORDS", "HEADER_WORDS", "NUMERIC_COLUMNS", "TEXT_BACKENDS", "_CONTENT_TOKEN",
+              "_INLINE_IMAGE", "_STRING_ESCAPES", "_TEXT_SHOW_OPERATORS", "_LATIN1_ENCODINGS", "_PATH_SEGMENTS",
+              "_PATH_PAINTS", "_CLOSING_PAINTS"],
+    "tables": ["parse_text_table", "RowTable", "_is_missing"],
+    "rows": ["normalize_row_tables", "clean_rows", "concat_rows", "normalize_numeric_rows", "to_number",
+             "clean_dataframe", "normalize_numeric_columns", "rows_line_sum", "record_total_validation",
+             "match_key_values", "page_priority", "captured_page_text", "open_text_document", "open_pdfplumber_text",
+             "open_pdfium_text", "TextDocument", "_BufferReader", "_pypdfium2", "open_pdf", "RowTable", "_is_missing",
+             "UnsupportedRowShape", "NUMERIC_COLUMNS", "KEY_VALUE_PATTERNS", "KEY_VALUE_OPTIONAL", "TEXT_BACKENDS"],
+}
+
+
+_source_cache = {}
+
+
+def _stable_repr(obj) -> str:
+    """repr of a rule table that is the same in every process: sets sorted (string hashing is
+    randomized per process), functions by name (their source is fingerprinted separately)."""
+    if isinstance(obj, (set, frozenset)):
+        return "{" + ", ".join(sorted(_stable_repr(v) for v in obj)) + "}"
+    if isinstance(obj, dict):
+        return "{" + ", ".join(f"{_stable_repr(k)}: {_stable_repr(v)}" for k, v in obj.items()) + "}"
+    if isinstance(obj, (list, tuple)):
+        return type(obj).__name__ + "[" + ", ".join(_stable_repr(v) for v in obj) + "]"
+    if isinstance(obj, re.Pattern):
+        return f"re.compile({obj.pattern!r}, {obj.flags})"  # Pattern's repr truncates long patterns
+    if callable(obj):
+        return getattr(obj, "__qualname__", repr(obj))
+    return repr(obj)
+
+
+def _fingerprint(name: str) -> str:
+    obj = getattr(core, name)
+    if not callable(obj):
+        return _stable_repr(obj)  # rule tables (dicts, lists, patterns) can change in place
+    key = (name, id(obj))
+    if key not in _source_cache:
+        _source_cache[key] = inspect.getsource(obj)
+    return _source_cache[key]
+
+
+def stage_keys(prescan: str = None, table_strategy: str = "lines", table_settings: dict = None,
+               ocr_mode: str = "fixed", key_value_page_order=core.KEY_VALUE_PAGE_ORDER,
+               header_keywords=None, text_backend: str = "pdfplumber") -> dict:
+    """{stage: key} for these settings; each key chains the previous stage's key."""
+    settings = {
+        "pages": {"prescan": prescan, "table_strategy": table_strategy, "table_settings": table_settings,
+                  "ocr_mode": ocr_mode, "text_backend": text_backend},
+        "tables": {"header_keywords": header_keywords},
+        "rows": {"key_value_page_order": list(key_value_page_order)},
+    }
+    code = dict(STAGE_CODE)
+    if table_strategy == "auto":
+        # "auto" can lock in the text fallback, so the fallback parser shapes the pages stage too
+        code["pages"] = code["pages"] + code["tables"]
+    keys, previous = {}, ""
+    for stage in STAGES:
+        digest = hashlib.sha256()
+        digest.update(json.dumps([STAGE_FORMAT, previous, settings[stage]], sort_keys=True, default=str).encode())
+        for name in code[stage]:
+            digest.update(_fingerprint(name).encode())
+        keys[stage] = previous = digest.hexdigest()[:16]
+    return keys
+
+
+class StageStore:
+    """
+    Artifact directory: <root>/<sha[:2]>/<sha>/<stage>-<key>.json.gz
+    - root: store directory (created on first write)
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, doc_hash: str, stage: str, key: str) -> Path:
+        return self.root / doc_hash[:2] / doc_hash / f"{stage}-{key}.json.gz"
+
+    def load(self, doc_hash: str, stage: str, key: str):
+        path = self.path(doc_hash, stage, key)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, doc_hash: str, stage: str, key: str, artifact) -> Path:
+        path = self.path(doc_hash, stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(artifact, f, separators=(",", ":"))
+        tmp.replace(path)  # readers never see a half-written artifact
+        return path
+
+
+def _table_to_json(table) -> dict:
+    return {"columns": table.columns, "rows": table.rows}
+
+
+def _table_from_json(data) -> core.RowTable:
+    return core.RowTable(list(data["columns"]), [list(r) for r in data["rows"]])
+
+
+def run_pages_stage(pdf_path, name: str, prescan=None, table_strategy="lines", table_settings=None,
+                    ocr_mode="fixed", text_backend="pdfplumber") -> dict:
+    """Everything that needs the PDF: page texts (pages the pre-scan keeps), fallback texts, pdfplumber
+    tables and the extraction audit."""
+    audit = {"file": name, "pages": 0, "tables_found": 0, "warnings": []}
+    capture = {}
+    core.extract_tables_from_pdf(pdf_path, prescan=prescan, audit=audit, table_strategy=table_strategy,
+                                 table_settings=table_settings, ocr_mode=ocr_mode, as_rows=True, capture=capture,
+                                 text_backend=text_backend)
+    # page numbers become strings in JSON; use them as strings from the start so fresh and loaded artifacts match
+    return {
+        "audit": audit,
+        "n_pages": capture["n_pages"],
+        "texts": {str(p): text for p, text in capture["texts"].items()},
+        "fallback_texts": {str(p): text for p, text in capture["fallback_texts"].items()},
+        "native_tables": {str(p): [_table_to_json(t) for t in tables] for p, tables in capture["native_tables"].items()},
+    }
+
+
+def run_tables_stage(pages: dict, header_keywords=None) -> list:
+    """pdfplumber tables plus fallback tables re-parsed from the stored page text, in page order."""
+    tables = {int(p): list(ts) for p, ts in pages["native_tables"].items()}
+    for p, text in pages["fallback_texts"].items():
+        parsed = core.parse_text_table(text, int(p), header_keywords=header_keywords, as_rows=True)
+        tables[int(p)] = [_table_to_json(t) for t in parsed]
+    return [t for p in sorted(tables) for t in tables[p]]
+
+
+def run_rows_stage(pages: dict, tables: list, key_value_page_order=core.KEY_VALUE_PAGE_ORDER, pdf_path=None,
+                   text_backend="pdfplumber") -> dict:
+    """
+    Normalization, key-values from the stored page text and total validation, as parse_pdf_to_rows does them.
+    - pdf_path: read pages without stored text (skipped by the pre-scan) from this PDF when a key-value
+      search reaches them
+    """
+    audit = json.loads(json.dumps(pages["audit"]))
+    if not tables:
+        audit["warnings"].append("No tables detected.")
+        return {"table": None, "audit": audit}
+    row_tables = [_table_from_json(t) for t in tables]
+    combined = core.normalize_row_tables(row_tables)
+
+    audit["pages"] = len({v for v in combined.column("page_number") if v is not None})
+    audit["tables_found"] = len(row_tables)
+
+    texts = {int(p): text for p, text in pages["texts"].items()}
+    with core.captured_page_text(texts, pdf_path, text_backend) as page_text:
+        metadata = core.match_key_values(page_text, pages["n_pages"], key_value_page_order, audit)
+    audit.update(metadata)
+    core.record_total_validation(audit, metadata, core.rows_line_sum(combined))
+    return {"table": _table_to_json(combined), "audit": audit}
+
+
+def parse_staged(pdf_path, store: StageStore, prescan: str = None, table_strategy: str = "lines",
+                 table_settings: dict = None, header_keywords=None, name: str = None,
+                 key_value_page_order=core.KEY_VALUE_PAGE_ORDER, ocr_mode: str = "fixed",
+                 text_backend: str = "pdfplumber"):
+    """
+    parse_pdf_to_rows through the stage store. Returns (RowTable | None, audit, started_from),
+    where started_from is the first stage that had to be computed (None when all were stored).
+    - pdf_path: path to the PDF (its sha256 keys the artifacts)
+    - header_keywords: passed to parse_text_table for the text fallback
+    - other arguments: see parse_single_pdf
+    """
+    pdf_path = Path(pdf_path)
+    name = name or pdf_path.name
+    doc_hash = core.file_sha256(pdf_path)
+    keys = stage_keys(prescan, table_strategy, table_settings, ocr_mode, key_value_page_order, header_keywords,
+                      text_backend)
+
+    artifacts = {stage: store.load(doc_hash, stage, keys[stage]) for stage in STAGES}
+    missing = [stage for stage in STAGES if artifacts[stage] is None]
+    started_from = missing[0] if missing else None
+    if started_from is not None:
+        # everything from the earliest missing stage on is recomputed
+        redo = STAGES[STAGES.index(started_from):]
+        if "pages" in redo:
+            artifacts["pages"] = run_pages_stage(pdf_path, name, prescan, table_strategy, table_settings, ocr_mode,
+                                                 text_backend)
+        if "tables" in redo:
+            artifacts["tables"] = run_tables_stage(artifacts["pages"], header_keywords)
+        artifacts["rows"] = run_rows_stage(artifacts["pages"], artifacts["tables"], key_value_page_order, pdf_path,
+                                           text_backend)
+        for stage in redo:
+            store.save(doc_hash, stage, keys[stage], artifacts[stage])
+
+    rows = artifacts["rows"]
+    audit = dict(rows["audit"], file=name)
+    table = _table_from_json(rows["table"]) if rows["table"] is not None else None
+    return table, audit, started_from
+
+
+def parse_single_staged(pdf_path, output_dir: Path, store: StageStore, **parse_kwargs):
+    """parse_single_pdf through the stage store; returns (audit, started_from)."""
+    pdf_path = Path(pdf_path)
+    table, audit, started_from = parse_staged(pdf_path, store, **parse_kwargs)
+    audit["document_id"] = core.pdf_document_id(pdf_path)  # not stored: artifacts are keyed by content
+    if table is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        table.to_csv(output_dir / f"{pdf_path.stem}.csv")
+        with open(output_dir / f"audit_{pdf_path.stem}.json", "w", encoding="utf-8") as f:
+            json.dump(audit, f, indent=4)
+    return audit, started_from
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse PDFs through the staged artifact store.")
+    parser.add_argument("--input", type=str, default="data/raw", help="Input directory containing PDFs")
+    parser.add_argument("--output", type=str, default="data/extracted", help="Output directory for results")
+    parser.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=True,
+                        help="Include PDFs in subdirectories (outputs mirror the input tree)")
+    parser.add_argument("--store", type=str, default="data/stages", help="Stage artifact directory")
+    parser.add_argument("--prescan", choices=sorted(core.PRESCAN_LEVELS), default=None)
+    parser.add_argument("--table-strategy", choices=sorted(core.TABLE_SETTINGS_PROFILES) + ["auto"], default="lines")
+    parser.add_argument("--ocr-mode", choices=["fixed", "adaptive", "regions"], default="fixed")
+    parser.add_argument("--text-backend", choices=sorted(core.TEXT_BACKENDS), default="pdfplumber")
+    args = parser.parse_args()
+
+    store = StageStore(args.store)
+    input_dir, output_dir = Path(args.input), Path(args.output)
+    counts = {stage: 0 for stage in STAGES + (None,)}
+    for pdf_path in core.iter_pdf_files(input_dir, args.recursive):
+        pdf_output_dir = core.mirrored_output_dir(pdf_path, input_dir, output_dir)
+        _, started_from = parse_single_staged(pdf_path, pdf_output_dir, store, prescan=args.prescan,
+                                              table_strategy=args.table_strategy, ocr_mode=args.ocr_mode,
+                                              text_backend=args.text_backend)
+        counts[started_from] += 1
+    print("📦 Restarted from: " + ", ".join(f"{stage} {counts[stage]}" for stage in STAGES)
+          + f", fully cached {counts[None]}")
@@ -0,0 +1,246 @@
+"""
+synthetic_pdf.py
+Description:
+Dependency-free writer for synthetic invoice PDFs (text layer, optional ruled tables,
+cover / terms / blank pages and padding) used by tests and benchmarks.
+"""
+
+import random
+import re
+from pathlib import Path
+
+# Column x-positions match scripts/generate_mock_invoice.py
+COLUMNS = [("Description", 50), ("Qty", 300), ("Unit Price", 360), ("Line Total", 460)]
+ROW_HEIGHT = 20
+TERMS_TEXT = (
+    "Payment is due within 30 days of the invoice date. Late payments may incur interest "
+    "as permitted by law. All goods remain the property of the seller until paid in full."
+)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_ops(x: float, y: float, text: str, size: int = 10, bold: bool = False) -> str:
+    """Content-stream operators drawing one line of Helvetica text at (x, y)."""
+    font = "F2" if bold else "F1"
+    return f"BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET\n"
+
+
+def line_ops(x1: float, y1: float, x2: float, y2: float) -> str:
+    """Content-stream operators stroking a straight line."""
+    return f"{x1} {y1} m {x2} {y2} l S\n"
+
+
+def money(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def invoice_page(items, invoice_no=None, date=None, total=None, ruled=False) -> str:
+    """
+    Content stream for an invoice page laid out like the mock invoice.
+    - items: list of (description, qty, unit_price) tuples
+    - ruled: draw cell borders so line-based table detection finds the table
+    """
+    ops = []
+    y = 800
+    if invoice_no:
+        ops.append(text_ops(50, y, f"Invoice #{invoice_no}", size=14, bold=True))
+        y -= 15
+    if date:
+        ops.append(text_ops(50, y, f"Date: {date}"))
+        y -= 15
+    ops.append(text_ops(50, y, "Bill To: Acme Corporation"))
+
+    header_y = 740
+    for name, x in COLUMNS:
+        ops.append(text_ops(x, header_y, name))
+    y = header_y - ROW_HEIGHT
+    for desc, qty, unit_price in items:
+        values = [desc, str(qty), money(unit_price), money(qty * unit_price)]
+        for (_, x), value in zip(COLUMNS, values):
+            ops.append(text_ops(x, y, value))
+        y -= ROW_HEIGHT
+
+    if ruled:
+        top = header_y + 14
+        bottom = y + ROW_HEIGHT - 6
+        for row in range(len(items) + 2):
+            ry = top - row * ROW_HEIGHT
+            ops.append(line_ops(45, ry, 550, ry))
+        for _, x in COLUMNS:
+            ops.append(line_ops(x - 5, top, x - 5, bottom))
+        ops.append(line_ops(550, top, 550, bottom))
+
+    if total is not None:
+        ops.append(text_ops(400, y - 20, f"Total: {money(total)}"))
+    return "".join(ops)
+
+
+def cover_page(title: str = "Account Statement") -> str:
+    return text_ops(180, 600, title, size=24, bold=True) + text_ops(180, 570, "Prepared for Acme Corporation")
+
+
+def terms_page(paragraphs: int = 20) -> str:
+    ops = [text_ops(50, 800, "Terms and Conditions", size=14, bold=True)]
+    y = 780
+    for _ in range(paragraphs):
+        ops.append(text_ops(50, y, TERMS_TEXT[:95]))
+        ops.append(text_ops(50, y - 12, TERMS_TEXT[95:]))
+        y -= 30
+    return "".join(ops)
+
+
+# Glyph names for subset fonts; letters are their own names
+GLYPH_NAMES = {
+    " ": "space", ".": "period", ",": "comma", ":": "colon", "#": "numbersign", "/": "slash", "-": "hyphen",
+    **{str(d): name for d, name in enumerate(
+        ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"])},
+}
+_SHOWN_STRING = re.compile(r"\(((?:\\.|[^\\()])*)\) Tj")
+
+
+def subset_encoding(page_streams) -> dict:
+    """{character: code} for a subset font: codes 1, 2, ... in order of the sorted alphabet."""
+    alphabet = set()
+    for content in page_streams:
+        for m in _SHOWN_STRING.finditer(content):
+            alphabet.update(re.sub(r"\\(.)", r"\1", m.group(1)))
+    return {c: i + 1 for i, c in enumerate(sorted(alphabet))}
+
+
+def _encode_shown_strings(content: str, codes: dict) -> str:
+    """Re-encode every (text) Tj as a hex string of subset-font codes."""
+    def encode(m):
+        text = re.sub(r"\\(.)", r"\1", m.group(1))
+        return "<" + "".join(f"{codes[c]:02X}" for c in text) + "> Tj"
+    return _SHOWN_STRING.sub(encode, content)
+
+
+def _subset_font_objects(codes: dict):
+    """(Encoding dict with /Differences, ToUnicode CMap stream data) for a subset font."""
+    differences = " ".join(f"{code} /{GLYPH_NAMES.get(c, c)}" for c, code in codes.items())
+    encoding = f"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [{differences}] >>".encode()
+    bfchar = "\n".join(f"<{code:02X}> <{ord(c):04X}>" for c, code in codes.items())
+    cmap = (
+        "/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+        "1 begincodespacerange <00> <FF> endcodespacerange\n"
+        f"{len(codes)} beginbfchar\n{bfchar}\nendbfchar\n"
+        "endcmap CMapName currentdict /CMap defineresource pop end end"
+    ).encode()
+    return encoding, cmap
+
+
+def make_items(count: int, rng: random.Random):
+    return [
+        (f"Item {rng.randint(100, 999)}", rng.randint(1, 9), float(rng.randint(5, 2000)))
+        for _ in range(count)
+    ]
+
+
+def write_pdf(path: Path, page_streams, padding_bytes: int = 0, subset_fonts: bool = False) -> Path:
+    """
+    Write a minimal PDF with one page per content stream.
+    - padding_bytes: size of an unreferenced binary stream object, used to simulate very large files
+    - subset_fonts: draw text like a subsetting PDF producer: codes 1, 2, ... mapped to glyphs by
+      an /Encoding /Differences array, with a /ToUnicode CMap (the raw bytes are not latin-1 text)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    n_pages = len(page_streams)
+    # object numbers: 1 catalog, 2 page tree, 3-4 fonts, then (page, content) pairs, then padding,
+    # then the subset-font encoding and CMap
+    page_ids = [5 + 2 * i for i in range(n_pages)]
+    encoding_id = 5 + 2 * n_pages + (1 if padding_bytes else 0)
+    font_encoding = b"/WinAnsiEncoding"
+    if subset_fonts:
+        codes = subset_encoding(page_streams)
+        page_streams = [_encode_shown_strings(content, codes) for content in page_streams]
+        font_encoding = b"%d 0 R /ToUnicode %d 0 R" % (encoding_id, encoding_id + 1)
+    offsets = {}
+
+    with open(path, "wb") as f:
+        def obj(num: int, body: bytes):
+            offsets[num] = f.tell()
+            f.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+        def stream_obj(num: int, data: bytes):
+            obj(num, b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+        obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % n_pages)
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding " + font_encoding + b" >>")
+        obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding " + font_encoding + b" >>")
+        for pid, content in zip(page_ids, page_streams):
+            obj(pid, (
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>" % (pid + 1)
+            ))
+            stream_obj(pid + 1, content.encode("latin-1"))
+
+        last = 4 + 2 * n_pages
+        if padding_bytes:
+            last += 1
+            offsets[last] = f.tell()
+            f.write(b"%d 0 obj\n<< /Length %d >>\nstream\n" % (last, padding_bytes))
+            chunk = bytes(range(256)) * 4096
+            remaining = padding_bytes
+            while remaining > 0:
+                f.write(chunk[:remaining])
+                remaining -= len(chunk)
+            f.write(b"\nendstream\nendobj\n")
+        if subset_fonts:
+            encoding, cmap = _subset_font_objects(codes)
+            obj(encoding_id, encoding)
+            stream_obj(encoding_id + 1, cmap)
+            last = encoding_id + 1
+
+        xref_at = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (last + 1))
+        for num in range(1, last + 1):
+            f.write(b"%010d 00000 n \n" % offsets[num])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (last + 1, xref_at))
+    return path
+
+
+def synthetic_invoice(path: Path, invoice_pages: int = 1, rows_per_page: int = 3, cover_pages: int = 0,
+                      terms_pages: int = 0, blank_pages: int = 0, ruled: bool = False,
+                      padding_bytes: int = 0, subset_fonts: bool = False, seed: int = 0) -> dict:
+    """
+    Write a synthetic statement: cover pages, invoice pages, terms pages, then blank pages.
+    - subset_fonts: see write_pdf
+    Returns the ground truth: {"path", "invoice_no", "date", "total", "items", "pages"}.
+    """
+    rng = random.Random(seed)
+    invoice_no = f"INV-{rng.randint(2020, 2030)}-{rng.randint(1, 999):03d}"
+    date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025"
+    streams = [cover_page() for _ in range(cover_pages)]
+    all_items = []
+    for i in range(invoice_pages):
+        items = make_items(rows_per_page, rng)
+        all_items.extend(items)
+        first, last = i == 0, i == invoice_pages - 1
+        total = sum(q * p for _, q, p in all_items) if last else None
+        streams.append(invoice_page(
+            items,
+            invoice_no=invoice_no if first else None,
+            date=date if first else None,
+            total=total,
+            ruled=ruled,
+        ))
+    streams += [terms_page() for _ in range(terms_pages)]
+    streams += ["" for _ in range(blank_pages)]
+    write_pdf(path, streams, padding_bytes=padding_bytes, subset_fonts=subset_fonts)
+    return {
+        "path": Path(path),
+        "invoice_no": invoice_no,
+        "date": date,
+        "total": round(sum(q * p for _, q, p in all_items), 2),
+        "items": all_items,
+        "pages": len(streams),
+    }
@@ -0,0 +1,57 @@
+"""
+Tests for Arrow result transfer from worker processes
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+pa = pytest.importorskip("pyarrow")
+
+from scripts.arrow_results import ArrowSpool, concat_arrow_results, parse_pdfs_to_arrow, rows_to_arrow, write_arrow
+from scripts.parse_pdf_data import parse_pdf_to_rows
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def test_batch_matches_single_document_parses(tmp_path):
+    """Test that the consolidated table holds every document's rows, tagged by file"""
+    docs = [synthetic_invoice(tmp_path / f"inv_{i}.pdf", invoice_pages=i + 1, seed=i)["path"] for i in range(3)]
+    with ArrowSpool(tmp_path) as spool:
+        table, audits = parse_pdfs_to_arrow(docs, spool, workers=2)
+        assert [a["file"] for a in audits] == [d.name for d in docs]
+        for doc in docs:
+            rows, _ = parse_pdf_to_rows(doc)
+            subset = table.filter(pa.compute.equal(table["file"].cast(pa.string()), doc.as_posix()))
+            assert subset["line_total"].to_pylist() == rows.column("line_total")
+            assert subset["description"].to_pylist() == rows.column("description")
+        spool_path = spool.path
+    assert not spool_path.exists()
+
+
+def test_bad_file_does_not_lose_the_batch(tmp_path):
+    """Test that a non-PDF in the batch gets an error audit while the other documents are kept"""
+    good = synthetic_invoice(tmp_path / "good.pdf", seed=1)["path"]
+    bad = tmp_path / "bad.pdf"
+    bad.write_text("not a pdf")
+    with ArrowSpool(tmp_path) as spool:
+        table, audits = parse_pdfs_to_arrow([bad, good], spool, workers=2)
+        assert [a["file"] for a in audits] == ["bad.pdf", "good.pdf"]
+        assert audits[0]["error"] and audits[0]["warnings"][0].startswith("Parse failed")
+        assert "error" not in audits[1]
+        assert set(table["file"].cast(pa.string()).to_pylist()) == {good.as_posix()}
+
+
+def test_parent_assembly_is_zero_copy(tmp_path):
+    """Test that mapping and concatenating spool files allocates no Arrow memory"""
+    doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=3)["path"]
+    rows, _ = parse_pdf_to_rows(doc)
+    with ArrowSpool(tmp_path) as spool:
+        handles = [write_arrow(rows_to_arrow(rows, f"copy_{i}.pdf"), spool.path / f"{i}.arrow") for i in range(4)]
+        before = pa.total_allocated_bytes()
+        merged = concat_arrow_results(handles)
+        assert pa.total_allocated_bytes() == before
+        assert merged.num_rows == 4 * len(rows)
+        assert merged["file"].num_chunks == 4
@@ -0,0 +1,104 @@
+"""
+Tests for the near-duplicate document index
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from scripts.dedup_index import (
+    NearDuplicateIndex,
+    band_keys,
+    document_fingerprint,
+    image_fingerprint,
+    parse_with_dedup,
+    similarity,
+)
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def test_resent_pdf_reuses_stored_result(tmp_path):
+    """Test that a byte-different, content-identical PDF is served from the index"""
+    original = synthetic_invoice(tmp_path / "in" / "invoice.pdf", seed=7)
+    resent = synthetic_invoice(tmp_path / "in" / "invoice_resent.pdf", seed=7, padding_bytes=4096)
+    assert original["path"].read_bytes() != resent["path"].read_bytes()
+
+    out = tmp_path / "out"
+    with NearDuplicateIndex(tmp_path / "index.sqlite") as index:
+        first = parse_with_dedup(original["path"], out, index)
+        second = parse_with_dedup(resent["path"], out, index)
+        assert len(index) == 1
+
+    assert "duplicate_of" not in first
+    assert second["duplicate_of"] == "invoice.pdf"
+    assert second["similarity"] == 1.0
+    assert second["file"] == "invoice_resent.pdf"
+    assert second["line_sum"] == first["line_sum"]
+    assert (out / "invoice_resent.csv").read_text() == (out / "invoice.csv").read_text()
+
+
+def test_different_invoice_is_parsed(tmp_path):
+    """Test that a different invoice does not match"""
+    a = synthetic_invoice(tmp_path / "a.pdf", seed=1)
+    b = synthetic_invoice(tmp_path / "b.pdf", seed=2)
+    with NearDuplicateIndex() as index:
+        parse_with_dedup(a["path"], tmp_path / "out", index)
+        audit = parse_with_dedup(b["path"], tmp_path / "out", index)
+        assert len(index) == 2
+    assert "duplicate_of" not in audit
+    assert similarity(document_fingerprint(a["path"]), document_fingerprint(b["path"])) < 0.9
+
+
+def test_shared_cover_page_is_not_a_duplicate(tmp_path):
+    """Test that statements sharing a cover page are fingerprinted on their content"""
+    a = synthetic_invoice(tmp_path / "a.pdf", cover_pages=1, seed=1)
+    b = synthetic_invoice(tmp_path / "b.pdf", cover_pages=1, seed=2)
+    assert similarity(document_fingerprint(a["path"]), document_fingerprint(b["path"])) < 0.5
+    with NearDuplicateIndex() as index:
+        parse_with_dedup(a["path"], tmp_path / "out", index)
+        audit = parse_with_dedup(b["path"], tmp_path / "out", index)
+    assert "duplicate_of" not in audit
+    assert audit["invoice_no"] == b["invoice_no"]
+
+
+def test_match_needs_equal_key_values(tmp_path):
+    """Test that an identical first page with a different total is parsed, not reused"""
+    one_page = synthetic_invoice(tmp_path / "one.pdf", invoice_pages=1, seed=4)
+    two_pages = synthetic_invoice(tmp_path / "two.pdf", invoice_pages=2, seed=4)
+    assert similarity(document_fingerprint(one_page["path"]), document_fingerprint(two_pages["path"])) >= 0.9
+    with NearDuplicateIndex() as index:
+        parse_with_dedup(one_page["path"], tmp_path / "out", index)
+        audit = parse_with_dedup(two_pages["path"], tmp_path / "out", index)
+        assert len(index) == 2
+    assert "duplicate_of" not in audit
+    assert audit["line_sum"] == round(two_pages["total"], 2)
+
+
+def test_image_fingerprint_separates_content_not_template(tmp_path):
+    """Test that a noisy re-scan matches while an invoice with a different row count does not"""
+    import numpy as np
+    from PIL import Image, ImageFilter
+
+    pdfium = pytest.importorskip("pypdfium2")
+
+    def render(truth):
+        pdf = pdfium.PdfDocument(str(truth["path"]))
+        img = pdf[0].render(scale=100 / 72, grayscale=True).to_pil().convert("L")
+        pdf.close()
+        return img
+
+    short = render(synthetic_invoice(tmp_path / "short.pdf", rows_per_page=3, seed=1))
+    long = render(synthetic_invoice(tmp_path / "long.pdf", rows_per_page=8, seed=2))
+    rng = np.random.default_rng(0)
+    noisy = np.asarray(short.filter(ImageFilter.BoxBlur(1)), dtype=np.int16) + rng.integers(-15, 15, short.size[::-1])
+    rescan = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+
+    a, b, c = image_fingerprint(short), image_fingerprint(rescan), image_fingerprint(long)
+    assert similarity(a, b) >= 0.75
+    assert similarity(a, c) < 0.5
+    assert image_fingerprint(Image.new("L", (850, 1100), 255)) is None  # blank pages get no buckets
+    assert {band for band, _ in band_keys(a)}.isdisjoint(band for band, _ in band_keys(document_fingerprint(
+        tmp_path / "short.pdf")))
@@ -0,0 +1,140 @@
+"""
+Tests for the durable job queue
+"""
+
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.job_queue import JobQueue, SQLiteJobQueue, run_worker
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_expired_lease_is_released_to_another_worker(tmp_path):
+    """Test that a job held by a dead worker is re-leased after the visibility timeout"""
+    clock = FakeClock()
+    with SQLiteJobQueue(tmp_path / "q.sqlite", visibility_timeout=60, clock=clock) as queue:
+        queue.enqueue(["a.pdf"], tmp_path)
+        first = queue.lease("worker-1")
+        assert first.pdf_path == "a.pdf"
+        assert queue.lease("worker-2") is None
+
+        clock.now += 61
+        second = queue.lease("worker-2")
+        assert second.id == first.id and second.attempts == 2
+        # the original worker finishing late must not overwrite the new lease
+        assert not queue.complete(first, {"file": "a.pdf"})
+        assert queue.complete(second, {"file": "a.pdf"})
+        assert queue.stats()["done"] == 1
+
+
+def test_failed_job_retries_with_backoff_then_fails(tmp_path):
+    """Test exponential backoff between attempts and the final failed state"""
+    clock = FakeClock()
+    with SQLiteJobQueue(tmp_path / "q.sqlite", max_attempts=3, backoff_base=10, clock=clock) as queue:
+        queue.enqueue(["bad.pdf"], tmp_path)
+        for delay in (10, 20):
+            job = queue.lease("w")
+            assert queue.fail(job, "boom")
+            clock.now += delay - 1
+            assert queue.lease("w") is None
+            clock.now += 1
+        job = queue.lease("w")
+        assert job.attempts == 3
+        queue.fail(job, "boom")
+        assert queue.stats() == {"queued": 0, "leased": 0, "done": 0, "failed": 1}
+
+
+def _lease_all(db_path, worker_id, results):
+    with SQLiteJobQueue(db_path) as queue:
+        while (job := queue.lease(worker_id)) is not None:
+            queue.complete(job, {"worker": worker_id})
+            results.put(job.id)
+
+
+def test_concurrent_workers_never_share_a_job(tmp_path):
+    """Test that several processes leasing from one database each get distinct jobs"""
+    db_path = tmp_path / "q.sqlite"
+    with SQLiteJobQueue(db_path) as queue:
+        queue.enqueue([f"{i}.pdf" for i in range(60)], tmp_path)
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_lease_all, args=(db_path, f"w{i}", results)) for i in range(4)]
+    for proc in procs:
+        proc.start()
+    leased = [results.get(timeout=60) for _ in range(60)]
+    for proc in procs:
+        proc.join()
+    assert sorted(leased) == list(range(1, 61))
+
+
+def test_worker_parses_jobs_and_stores_audits(tmp_path):
+    """Test that run_worker drains the queue and writes audits back to it"""
+    docs = [synthetic_invoice(tmp_path / "in" / f"inv_{i}.pdf", seed=i) for i in range(2)]
+    out = tmp_path / "out"
+    with SQLiteJobQueue(tmp_path / "q.sqlite", backoff_base=0) as queue:
+        queue.enqueue([d["path"] for d in docs] + [tmp_path / "in" / "missing.pdf"], out)
+        assert run_worker(queue, worker_id="w", poll_interval=0) == 2
+        audits = dict(queue.audits())
+        stats = queue.stats()
+
+    assert stats == {"queued": 0, "leased": 0, "done": 2, "failed": 1}
+    for doc in docs:
+        assert audits[str(doc["path"])]["invoice_no"] == doc["invoice_no"]
+        assert (out / f"{doc['path'].stem}.csv").exists()
+
+
+def test_heartbeat_keeps_long_parse_leased(tmp_path, monkeypatch):
+    """Test that a parse outlasting the visibility timeout keeps its lease and is parsed once"""
+    from scripts import parse_pdf_data
+
+    db_path = tmp_path / "q.sqlite"
+    stolen = []
+
+    def slow_parse(pdf_path, output_dir, **kwargs):
+        with SQLiteJobQueue(db_path, visibility_timeout=0.3) as other:
+            for _ in range(4):  # 1.2 s: four visibility timeouts
+                time.sleep(0.3)
+                stolen.append(other.lease("w2"))
+        return {"file": Path(pdf_path).name}
+
+    monkeypatch.setattr(parse_pdf_data, "parse_single_pdf", slow_parse)
+    with SQLiteJobQueue(db_path, visibility_timeout=0.3, max_attempts=1) as queue:
+        queue.enqueue(["statement.pdf"], tmp_path)
+        assert run_worker(queue, worker_id="w1", poll_interval=0) == 1
+        assert queue.stats() == {"queued": 0, "leased": 0, "done": 1, "failed": 0}
+    assert stolen == [None] * 4
+
+
+def test_job_queue_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_enqueue_cli_finds_nested_pdfs_with_mirrored_outputs(tmp_path):
+    """Test that the enqueue CLI discovers PDFs like parse_all_pdfs and keeps same-named files apart"""
+    import subprocess
+
+    for folder in ("", "2024", "2025"):
+        (tmp_path / "in" / folder).mkdir(parents=True, exist_ok=True)
+        (tmp_path / "in" / folder / "inv.PDF").write_bytes(b"%PDF-1.4")
+    db_path = tmp_path / "q.sqlite"
+    subprocess.run([sys.executable, "-m", "scripts.job_queue", "--db", str(db_path), "enqueue",
+                    "--input", str(tmp_path / "in"), "--output", str(tmp_path / "out")],
+                   cwd=Path(__file__).parent.parent, check=True, capture_output=True)
+    with SQLiteJobQueue(db_path) as queue:
+        jobs = queue.conn.execute("SELECT pdf_path, output_dir FROM jobs").fetchall()
+    assert sorted(Path(out).relative_to(tmp_path / "out").as_posix() for _, out in jobs) == [".", "2024", "2025"]
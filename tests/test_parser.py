@@ -11,10 +11,37 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from scripts.parse_pdf_data import (
+    BatchJournal,
+    BatchProfiler,
+    DtypePolicy,
+    RowTable,
+    apply_dtype_policy,
+    binarize_image,
     clean_dataframe,
+    concat_line_items,
+    content_stream_signals,
+    find_text_regions,
+    iter_pdf_files,
+    layout_signals,
+    mirrored_output_dir,
     extract_key_values_from_text,
+    match_key_values,
+    extract_tables_from_pdf,
     normalize_numeric_columns,
+    open_pdf,
+    open_text_document,
+    page_priority,
+    parse_all_pdfs,
+    parse_pdf_progressively,
+    parse_pdf_to_dataframe,
+    parse_pdf_to_rows,
+    parse_single_pdf,
+    parse_text_table,
+    table_is_usable,
+    UndecodableContent,
+    words_to_text,
 )
+from scripts.synthetic_pdf import synthetic_invoice, text_ops, write_pdf
 import pandas as pd
 
 
@@ -90,10 +117,666 @@ class TestKeyValueExtraction:
         assert match is not None
         assert "3,250.00" in match.group(1)
 
+    def test_extract_subtotal_and_tax(self):
+        """Test that subtotal and tax are extracted and "Subtotal" is not taken for the total"""
+        pages = {1: "Invoice #INV-9\nSubtotal: $1,000.00\nSales Tax (8%): $80.00\nTotal: $1,080.00"}
+        values = match_key_values(pages.get, 1)
+        assert (values["subtotal"], values["tax"], values["total"]) == ("1,000.00", "80.00", "1,080.00")
+
+        for text, tax in [("Tax 8%: $80.00", "80.00"), ("VAT 20% 20.00", "20.00"), ("VAT @ 17.5%: 1,750.00", "1,750.00")]:
+            assert match_key_values({1: text}.get, 1)["tax"] == tax  # the rate is not the amount
+
+        values = match_key_values({1: "Sub Total: 50.00\nTax ID: 12-345"}.get, 1)
+        assert values["subtotal"] == "50.00"
+        assert values["total"] is None and values["tax"] is None
+
+
+class TestPagePrescan:
+    """Test the cheap page pre-scan that skips non-table pages"""
+
+    def test_prescan_skips_cover_terms_and_blank_pages(self, tmp_path):
+        """Test that only invoice pages reach table detection"""
+        truth = synthetic_invoice(tmp_path / "statement.pdf", invoice_pages=2, cover_pages=1,
+                                  terms_pages=2, blank_pages=1)
+        audit = {}
+        tables = extract_tables_from_pdf(truth["path"], prescan="balanced", audit=audit)
+
+        skipped = [p["page"] for p in audit["prescan"]["skipped_pages"]]
+        assert skipped == [1, 4, 5, 6]
+        assert audit["prescan"]["pages_scanned"] == 6
+        assert sorted({int(df["page_number"].iloc[0]) for df in tables}) == [2, 3]
+
+    def test_prescan_keeps_same_rows_as_full_path(self, tmp_path):
+        """Test that prescan does not lose line items on an ordinary invoice"""
+        truth = synthetic_invoice(tmp_path / "invoice.pdf", invoice_pages=1, terms_pages=1)
+        full = extract_tables_from_pdf(truth["path"])
+        for level in ("conservative", "balanced", "aggressive"):
+            scanned = extract_tables_from_pdf(truth["path"], prescan=level)
+            assert sum(len(df) for df in scanned) == sum(len(df) for df in full)
+
+    def test_prescan_reads_content_stream_without_layout(self, tmp_path, monkeypatch):
+        """Test that skipped pages never go through layout analysis and signals match the layout ones"""
+        import pdfplumber
+        import pdfplumber.page
+
+        truth = synthetic_invoice(tmp_path / "statement.pdf", invoice_pages=2, cover_pages=1,
+                                  terms_pages=2, blank_pages=1, ruled=True)
+        with pdfplumber.open(truth["path"]) as pdf:
+            for page in pdf.pages:
+                fast, slow = content_stream_signals(page), layout_signals(page)
+                assert fast["text"].replace(" ", "") == slow["text"].replace(" ", "")
+                assert (fast["images"], fast["ruling_objects"]) == (slow["images"], slow["ruling_objects"])
+
+        laid_out = []
+        original = pdfplumber.page.Page.layout
+
+        def recording_layout(page):
+            laid_out.append(page.page_number)
+            return original.fget(page)
+
+        monkeypatch.setattr(pdfplumber.page.Page, "layout", property(recording_layout))
+        extract_tables_from_pdf(truth["path"], prescan="balanced")
+        assert set(laid_out) == {2, 3}
+
+    def test_prescan_keeps_pages_in_re_encoded_fonts(self, tmp_path):
+        """Test that /Differences + /ToUnicode subset fonts fall back to layout signals instead of being skipped"""
+        import pdfplumber
+
+        truth = synthetic_invoice(tmp_path / "subset.pdf", rows_per_page=4, cover_pages=1, subset_fonts=True)
+        with pdfplumber.open(truth["path"]) as pdf:
+            with pytest.raises(UndecodableContent):
+                content_stream_signals(pdf.pages[1])
+        baseline, _ = parse_pdf_to_rows(truth["path"])
+        assert len(baseline) == 4
+        for level in ("conservative", "balanced"):
+            table, audit = parse_pdf_to_rows(truth["path"], prescan=level)
+            assert table.rows == baseline.rows
+            assert [p["page"] for p in audit["prescan"]["skipped_pages"]] == [1]  # the cover only
+
+    def test_prescan_counts_rulings_like_layout(self, tmp_path):
+        """Test that clip paths, curves and unpainted paths are not counted as ruling lines"""
+        import pdfplumber
+
+        paths = (
+            "q 0 0 595 842 re W n 10 10 100 20 re f 50 700 m 500 700 l S 20 20 m 80 20 l 80 60 l S "
+            "30 30 m 60 30 l 60 60 l 30 60 l h S 40 40 m 50 50 60 40 70 50 c S "
+            "100 100 m 200 100 l 300 100 m 300 200 l S 10 300 50 50 re 100 300 50 50 re B "
+            "200 200 m 250 200 l 250 250 l 200 250 l b Q q 0 0 100 100 re W* n Q 5 5 m 6 6 l n "
+        )
+        pdf_path = write_pdf(tmp_path / "paths.pdf", [paths + text_ops(50, 600, "Qty 12.00")])
+        with pdfplumber.open(pdf_path) as pdf:
+            page = pdf.pages[0]
+            assert content_stream_signals(page)["ruling_objects"] == layout_signals(page)["ruling_objects"] == 8
+
+    def test_prescan_unknown_level_rejected(self, tmp_path):
+        """Test that an unknown aggressiveness level raises"""
+        truth = synthetic_invoice(tmp_path / "invoice.pdf")
+        with pytest.raises(ValueError):
+            extract_tables_from_pdf(truth["path"], prescan="reckless")
+
+
+class TestTableStrategies:
+    """Test pdfplumber table_settings profiles and automatic strategy selection"""
+
+    def test_text_strategy_reads_unruled_table(self, tmp_path):
+        """Test that the text profile finds an unruled table and trims it to its header"""
+        truth = synthetic_invoice(tmp_path / "invoice.pdf", rows_per_page=4)
+        tables = extract_tables_from_pdf(truth["path"], table_strategy="text")
+        assert len(tables) == 1
+        assert str(tables[0].columns[0]).lower() == "description"
+        assert len(tables[0]) == 4
+
+    def test_auto_locks_in_first_winning_strategy(self, tmp_path, monkeypatch):
+        """Test that auto mode tries strategies once, then reuses the winner on later pages"""
+        import pdfplumber.page
+        from pdfplumber.table import TableSettings
+
+        truth = synthetic_invoice(tmp_path / "statement.pdf", invoice_pages=3)
+        calls = []
+        original = pdfplumber.page.Page.find_tables
+
+        def recording_find_tables(page, table_settings=None):
+            calls.append((page.page_number, TableSettings.resolve(table_settings).vertical_strategy))
+            return original(page, table_settings)
+
+        monkeypatch.setattr(pdfplumber.page.Page, "find_tables", recording_find_tables)
+        audit = {}
+        tables = extract_tables_from_pdf(truth["path"], audit=audit, table_strategy="auto")
+
+        assert audit["table_strategy"]["selected"] == "text"
+        assert audit["table_strategy"]["selected_on_page"] == 1
+        assert calls == [(1, "lines"), (1, "text"), (2, "text"), (3, "text")]
+        assert sum(len(df) for df in tables) == 9
+
+    def test_auto_keeps_headers_and_totals(self, tmp_path):
+        """Test that auto mode never outputs clipped header columns and its totals match the line profile"""
+        for seed in (3, 39):
+            truth = synthetic_invoice(tmp_path / f"unruled_{seed}.pdf", invoice_pages=1 + seed % 4,
+                                      rows_per_page=2 + seed % 9, seed=seed)
+            df, audit = parse_pdf_to_dataframe(truth["path"], table_strategy="auto")
+            _, lines_audit = parse_pdf_to_dataframe(truth["path"], table_strategy="lines")
+            assert sorted(df.columns) == ["description", "line_total", "page_number", "quantity", "unit_price"]
+            assert audit["invoice_total_matches"] is True
+            assert audit["line_sum"] == lines_audit["line_sum"] == round(truth["total"], 2)
+
+    def test_table_is_usable_rejects_clipped_headers(self):
+        """Test that a header cut by a cell edge or unparseable numbers fail the quality check"""
+        rows = [["Item 1", "2", "3.00", "6.00"]]
+        assert table_is_usable([["Description", "Qty", "Unit Price", "Line Total"]] + rows)
+        assert not table_is_usable([["Description", "Qty", "Unit Price", "Line Tota"]] + rows)
+        assert not table_is_usable([["Description", "Qty", "Unit Price", "Line Total"], ["Item 1", "two", "x", "y"]])
+
+    def test_auto_prefers_lines_for_ruled_tables(self, tmp_path):
+        """Test that ruled tables lock in the line-based profile"""
+        truth = synthetic_invoice(tmp_path / "ruled.pdf", invoice_pages=2, ruled=True)
+        audit = {}
+        extract_tables_from_pdf(truth["path"], audit=audit, table_strategy="auto")
+        assert audit["table_strategy"]["selected"] == "lines"
+
+    def test_explicit_strategy_requires_lines(self, tmp_path):
+        """Test that the explicit profile refuses to run without explicit lines"""
+        truth = synthetic_invoice(tmp_path / "invoice.pdf")
+        with pytest.raises(ValueError):
+            extract_tables_from_pdf(truth["path"], table_strategy="explicit")
+
+
+class TestPdfSources:
+    """Test that parsing entry points accept memory-mapped and in-memory inputs"""
+
+    def test_empty_file_is_rejected_as_a_pdf(self, tmp_path):
+        """Test that a zero-byte file raises pdfplumber's PDF error, not mmap's ValueError"""
+        from pdfplumber.utils.exceptions import PdfminerException
+
+        empty = tmp_path / "empty.pdf"
+        empty.write_bytes(b"")
+        for use_mmap in (True, False):
+            with pytest.raises(PdfminerException):
+                with open_pdf(empty, use_mmap=use_mmap):
+                    pass
+
+    def test_mmap_bytes_and_file_inputs_match_path_input(self, tmp_path):
+        """Test that every source type produces the same audit and CSV"""
+        import io
+        import mmap
+
+        truth = synthetic_invoice(tmp_path / "invoice.pdf", invoice_pages=2)
+        pdf_path = truth["path"]
+        expected = parse_single_pdf(pdf_path, tmp_path / "path")
+        expected_csv = (tmp_path / "path" / "invoice.csv").read_text()
+
+        with open(pdf_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        sources = {
+            "mmap": mapped,
+            "bytes": pdf_path.read_bytes(),
+            "file": io.BytesIO(pdf_path.read_bytes()),
+        }
+        try:
+            for label, source in sources.items():
+                out_dir = tmp_path / label
+                audit = parse_single_pdf(source, out_dir, name="invoice.pdf")
+                assert audit.pop("document_id") == "invoice.pdf"  # only paths carry their folder
+                assert audit == {k: v for k, v in expected.items() if k != "document_id"}
+                assert (out_dir / "invoice.csv").read_text() == expected_csv
+        finally:
+            mapped.close()
+
+
+class TestPageCacheRelease:
+    """Test that the page loop releases pdfplumber page caches as it advances"""
+
+    def test_each_page_closed_after_harvest(self, tmp_path, monkeypatch):
+        """Test that every page is closed, including pages skipped by prescan"""
+        import pdfplumber.page
+
+        truth = synthetic_invoice(tmp_path / "statement.pdf", invoice_pages=3, blank_pages=2)
+        closed = []
+        original = pdfplumber.page.Page.close
+
+        def recording_close(page):
+            closed.append(page.page_number)
+            original(page)
+
+        monkeypatch.setattr(pdfplumber.page.Page, "close", recording_close)
+        tables = extract_tables_from_pdf(truth["path"], prescan="conservative")
+        assert closed[:5] == [1, 2, 3, 4, 5]  # pdfplumber closes them all again on exit
+        assert sum(len(df) for df in tables) == 9
+
+
+class TestDtypePolicies:
+    """Test compact in-memory line-item schemas"""
+
+    @staticmethod
+    def line_items():
+        return pd.DataFrame({
+            "description": ["Widget A", "Widget B", "Widget A"],
+            "quantity": [2.0, 1.0, 3.0],
+            "page_number": [1, 1, 2],
+            "unit_price": [1000.0, 500.0, 19.99],
+            "line_total": [2000.0, 500.0, 59.97],
+        })
+
+    def test_compact_policy_dtypes(self):
+        """Test that the compact policy narrows every column"""
+        compact = apply_dtype_policy(self.line_items(), "compact")
+        assert str(compact["description"].dtype) == "category"
+        assert compact["unit_price"].dtype == "float32"
+        assert compact["page_number"].dtype == "int16"
+
+    def test_cents_policy_scales_amounts(self):
+        """Test that amounts become integer cents"""
+        cents = apply_dtype_policy(self.line_items(), "cents")
+        assert cents["line_total_cents"].tolist() == [200000, 50000, 5997]
+        assert "line_total" not in cents.columns
+
+    def test_custom_policy_widens_page_numbers(self):
+        """Test that page numbers that overflow the requested dtype are widened"""
+        df = self.line_items().assign(page_number=[1, 2, 40000])
+        out = apply_dtype_policy(df, DtypePolicy(page_number="int16"))
+        assert out["page_number"].tolist() == [1, 2, 40000]
+
+    def test_concat_keeps_categories_and_values(self):
+        """Test that merging keeps categorical columns categorical and rows intact"""
+        a = self.line_items()
+        b = self.line_items().assign(description=["Service C", None, "Widget B"])
+        merged = concat_line_items({"a.pdf": a, "b.pdf": b.drop(columns=["quantity"])}, "compact")
+        assert str(merged["description"].dtype) == "category"
+        assert str(merged["file"].dtype) == "category"
+        assert merged["description"].iloc[3] == "Service C"
+        assert merged["description"].isna().iloc[4]
+        assert merged["file"].tolist() == ["a.pdf"] * 3 + ["b.pdf"] * 3
+        assert merged["quantity"].isna().sum() == 3
+        default = concat_line_items({"a.pdf": a, "b.pdf": b}, "default")
+        assert merged.memory_usage(deep=True).sum() < default.memory_usage(deep=True).sum()
+
+    def test_parse_pdf_to_dataframe_applies_policy(self, tmp_path):
+        """Test that the in-memory parse entry point honours dtype_policy"""
+        truth = synthetic_invoice(tmp_path / "invoice.pdf")
+        df, audit = parse_pdf_to_dataframe(truth["path"], dtype_policy="compact")
+        assert df["line_total"].dtype == "float32"
+        assert audit["invoice_total_matches"] is True
+
+
+class TestPageTargetedKeyValues:
+    """Test page-aware key-value extraction"""
+
+    def test_page_priority_orders_first_last_rest(self):
+        """Test the default page search order"""
+        assert page_priority(5) == [1, 5, 2, 3, 4]
+        assert page_priority(1) == [1]
+        assert page_priority(4, ("last", 2, "rest")) == [4, 2, 1, 3]
+
+    def test_fields_resolved_on_first_and_last_page_only(self, tmp_path, monkeypatch):
+        """Test that only the pages the fields need have their text extracted"""
+        import pdfplumber.page
+
+        truth = synthetic_invoice(tmp_path / "statement.pdf", invoice_pages=5)
+        extracted_pages = []
+        original = pdfplumber.page.Page.extract_text
+
+        def recording_extract_text(page, **kwargs):
+            extracted_pages.append(page.page_number)
+            return original(page, **kwargs)
+
+        monkeypatch.setattr(pdfplumber.page.Page, "extract_text", recording_extract_text)
+        audit = {}
+        values = extract_key_values_from_text(truth["path"], audit=audit)
+
+        assert values["invoice_no"] == truth["invoice_no"]
+        assert values["date"] == truth["date"]
+        assert values["total"] == f"{truth['total']:,.2f}"
+        assert audit["key_value_pages"] == {"invoice_no": 1, "date": 1, "total": 5, "subtotal": None, "tax": None}
+        assert extracted_pages == [1, 5]
+
+
+class TestTextBackends:
+    """Test the pluggable text backends used for key-values and the text fallback"""
+
+    def test_backends_read_the_same_text(self, tmp_path):
+        """Test pdfium page text against pdfplumber for path, bytes and file-object sources"""
+        import io
+
+        doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=2, cover_pages=1)["path"]
+        with open_text_document(doc) as reference:
+            expected = [reference.page_text(p) for p in range(1, reference.n_pages + 1)]
+        data = doc.read_bytes()
+        for source in (doc, data, io.BytesIO(data)):
+            with open_text_document(source, "pdfium") as document:
+                assert [document.page_text(p) for p in range(1, document.n_pages + 1)] == expected
+        with pytest.raises(ValueError):
+            open_text_document(doc, "poppler")
+
+    def test_pdfium_parse_matches(self, tmp_path):
+        """Test identical outputs when the text fallback and key-values read text through pdfium"""
+        doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=3, ruled=False)["path"]
+        outputs = {}
+        for backend in ("pdfplumber", "pdfium"):
+            parse_single_pdf(doc, tmp_path / backend, text_backend=backend)
+            outputs[backend] = [(tmp_path / backend / f).read_bytes() for f in ("inv.csv", "audit_inv.json")]
+        assert outputs["pdfium"] == outputs["pdfplumber"]
+
+
+class TestRowEngine:
+    """Test that the pandas-free row pipeline matches the pandas pipeline"""
+
+    def _outputs(self, pdf_path, out_dir, **kwargs):
+        stem = Path(pdf_path).stem
+        parse_single_pdf(pdf_path, out_dir, **kwargs)
+        return [(out_dir / f).read_bytes() for f in (f"{stem}.csv", f"audit_{stem}.json")]
+
+    @pytest.mark.parametrize("strategy", ["lines", "text", "auto"])
+    def test_engines_write_identical_files(self, tmp_path, strategy):
+        """Test byte-identical CSV and audit output for the mock and synthetic invoices"""
+        docs = [Path(__file__).parent.parent / "data" / "raw" / "mock_invoice_01.pdf"]
+        docs += [synthetic_invoice(tmp_path / "in" / f"inv_{i}.pdf", invoice_pages=1 + i, rows_per_page=3 + i,
+                                   ruled=bool(i % 2), seed=i)["path"] for i in range(3)]
+        for doc in docs:
+            if not doc.exists():
+                continue
+            rows = self._outputs(doc, tmp_path / "rows", table_strategy=strategy, engine="rows")
+            frames = self._outputs(doc, tmp_path / "pandas", table_strategy=strategy, engine="pandas")
+            assert rows == frames
+
+    def test_unsupported_shape_defers_to_pandas(self, tmp_path, monkeypatch):
+        """Test that an unnamed column goes through the pandas normalizer and still matches"""
+        from scripts import parse_pdf_data
+
+        def unnamed_column(page, strategy="lines", table_settings=None, as_rows=False, usable_only=False):
+            header, rows = ["Description", None, "Qty", "Total"], [["Bolt", "M8", "2", "$6.00"]]
+            return [RowTable(header, rows) if as_rows else pd.DataFrame(rows, columns=header)]
+
+        monkeypatch.setattr(parse_pdf_data, "extract_page_tables", unnamed_column)
+        doc = synthetic_invoice(tmp_path / "inv.pdf")["path"]
+        table, audit = parse_pdf_to_rows(doc)
+        df, _ = parse_pdf_to_dataframe(doc)
+        assert table.columns == [str(c) for c in df.columns]
+        assert audit["line_sum"] == 6.0
+
+    def test_row_table_to_dataframe(self, tmp_path):
+        """Test that the row result converts to the same frame parse_pdf_to_dataframe returns"""
+        doc = synthetic_invoice(tmp_path / "inv.pdf", rows_per_page=4)["path"]
+        table, rows_audit = parse_pdf_to_rows(doc)
+        df, frame_audit = parse_pdf_to_dataframe(doc)
+        assert rows_audit == frame_audit
+        pd.testing.assert_frame_equal(table.to_dataframe(), df, check_dtype=False)
+        assert str(table.to_dataframe()["line_total"].dtype) == "float64"
+
+
+class TestProgressiveParse:
+    """Test quick-look snapshots of a document still being parsed"""
+
+    def test_snapshots_grow_to_final_result(self, tmp_path):
+        """Test snapshot cadence, early header key-values and a final result equal to parse_pdf_to_rows"""
+        doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=12, rows_per_page=4)
+        snapshots = list(parse_pdf_progressively(doc["path"], first_pages=2, update_pages=4))
+
+        assert [s["pages_done"] for s in snapshots] == [2, 6, 10, 12]
+        assert [s["done"] for s in snapshots] == [False, False, False, True]
+        first = snapshots[0]
+        assert len(first["table"]) == 8 and first["pages_total"] == 12
+        assert first["audit"]["invoice_no"] == doc["invoice_no"]
+        assert "invoice_total_matches" not in first["audit"]
+        assert [len(s["table"]) for s in snapshots] == [8, 24, 40, 48]
+
+        table, audit = parse_pdf_to_rows(doc["path"])
+        assert snapshots[-1]["table"].rows == table.rows
+        assert snapshots[-1]["audit"] == audit
+
+    def test_prescan_skipped_pages_are_only_read_for_key_values(self, tmp_path, monkeypatch):
+        """Test that pages the pre-scan skips have their text extracted only when a key-value search reaches them"""
+        import pdfplumber.page
+
+        doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=3, cover_pages=1, terms_pages=1, blank_pages=1)
+        extracted_pages = []
+        original = pdfplumber.page.Page.extract_text
+
+        def recording_extract_text(page, **kwargs):
+            extracted_pages.append(page.page_number)
+            return original(page, **kwargs)
+
+        monkeypatch.setattr(pdfplumber.page.Page, "extract_text", recording_extract_text)
+        *_, final = parse_pdf_progressively(doc["path"], first_pages=6, prescan="balanced")
+        # kept pages 2-4 during the pass; then the search order first, last, rest reads the cover and
+        # the blank last page, and the total on page 4 ends it before the terms page
+        assert sorted(set(extracted_pages)) == [1, 2, 3, 4, 6]
+        assert extracted_pages[-2:] == [1, 6]
+        assert final["audit"] == parse_pdf_to_rows(doc["path"], prescan="balanced")[1]
+        assert final["audit"]["invoice_no"] == doc["invoice_no"]
+
+    def test_no_tables(self, tmp_path):
+        """Test that a document without line items ends like parse_pdf_to_rows"""
+        doc = synthetic_invoice(tmp_path / "cover.pdf", invoice_pages=0, cover_pages=3)
+        *_, final = parse_pdf_progressively(doc["path"], first_pages=1, update_pages=1)
+        assert final["done"] and final["table"] is None
+        assert final["audit"] == parse_pdf_to_rows(doc["path"])[1]
+
+
+class TestBatchProfiler:
+    """Test per-document profiling across a batch"""
+
+    def test_batch_profile_outputs(self, tmp_path):
+        """Test aggregated pstats, collapsed stacks and the slowest-document summary"""
+        import json
+        import pstats
+
+        profiler = BatchProfiler(sample_interval=0.001)
+        for n_pages in (1, 3):
+            doc = synthetic_invoice(tmp_path / "in" / f"inv_{n_pages}.pdf", invoice_pages=n_pages)
+            parse_single_pdf(doc["path"], tmp_path / "out", profiler=profiler)
+        paths = profiler.dump(tmp_path / "profile", top_n=1)
+
+        assert [d["file"] for d in profiler.documents] == ["inv_1.pdf", "inv_3.pdf"]
+        dominant = {d["function"] for d in profiler.documents[1]["dominant"]}
+        assert "extract_tables_from_pdf" in dominant
+        assert pstats.Stats(str(paths["pstats"])).total_calls > 0
+
+        stacks = paths["collapsed"].read_text().splitlines()
+        assert stacks and all(re.fullmatch(r"\S+ \d+", line) for line in stacks)
+        assert any("parse_pdf_data:extract_tables_from_pdf" in line for line in stacks)
+
+        summary = json.loads(paths["summary"].read_text())
+        assert summary["documents"] == 2
+        assert len(summary["slowest"]) == 1
+
+
+class TestBatchJournal:
+    """Test checkpointed, resumable batch runs"""
+
+    def _batch(self, tmp_path, n=3):
+        for i in range(n):
+            synthetic_invoice(tmp_path / "in" / f"inv_{i}.pdf", seed=i)
+        return tmp_path / "in", tmp_path / "out"
+
+    def test_restart_skips_journaled_documents(self, tmp_path, capsys):
+        """Test that a rerun with the same journal parses only unfinished documents"""
+        input_dir, output_dir = self._batch(tmp_path)
+        journal_path = tmp_path / "journal.jsonl"
+        with BatchJournal(journal_path, fsync="always") as journal:
+            parse_all_pdfs(input_dir, output_dir, journal=journal)
+        (output_dir / "inv_1.csv").unlink()  # a lost output is redone
+        with open(journal_path, "a") as f:
+            f.write('{"path": "torn')  # crash mid-append
+
+        capsys.readouterr()
+        with BatchJournal(journal_path) as journal:
+            assert len(journal) == 3
+            parse_all_pdfs(input_dir, output_dir, journal=journal)
+        out = capsys.readouterr().out
+        assert "Skipped 2 journaled" in out
+        assert out.count("Parsing:") == 1 and "inv_1.pdf" in out
+
+    def test_touched_file_matched_on_content(self, tmp_path):
+        """Test that a file with a new mtime but the same bytes is still skipped"""
+        import os
+
+        input_dir, output_dir = self._batch(tmp_path, n=1)
+        pdf_path = input_dir / "inv_0.pdf"
+        with BatchJournal(tmp_path / "journal.jsonl") as journal:
+            parse_all_pdfs(input_dir, output_dir, journal=journal)
+            os.utime(pdf_path, ns=(1, 1))
+            assert journal.is_done(pdf_path, output_dir)
+            assert not journal.is_done(pdf_path, tmp_path / "elsewhere")
+
+    def test_parallel_workers_journal_every_document(self, tmp_path):
+        """Test that parallel parsing records each finished document once"""
+        import json
+
+        input_dir, output_dir = self._batch(tmp_path, n=4)
+        journal_path = tmp_path / "journal.jsonl"
+        with BatchJournal(journal_path, fsync="never") as journal:
+            parse_all_pdfs(input_dir, output_dir, journal=journal, workers=2)
+        entries = [json.loads(line) for line in journal_path.read_text().splitlines()]
+        assert sorted(Path(e["path"]).name for e in entries) == [f"inv_{i}.pdf" for i in range(4)]
+        assert all(Path(e["csv"]).exists() for e in entries)
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_corrupt_file_does_not_stop_the_batch(self, tmp_path, capsys, workers):
+        """Test that a bad PDF is logged and left unjournaled while the rest of the batch finishes"""
+        import json
+
+        input_dir, output_dir = self._batch(tmp_path, n=3)
+        (input_dir / "inv_1.pdf").write_bytes(b"%PDF-1.4\n garbage")
+        (input_dir / "inv_3.pdf").write_bytes(b"")
+        journal_path = tmp_path / "journal.jsonl"
+        with BatchJournal(journal_path, fsync="never") as journal:
+            parse_all_pdfs(input_dir, output_dir, journal=journal, workers=workers)
+        out = capsys.readouterr().out
+        assert "Failed: inv_1.pdf" in out and "Failed: inv_3.pdf" in out and "mmap" not in out
+        entries = [json.loads(line) for line in journal_path.read_text().splitlines()]
+        assert sorted(Path(e["path"]).name for e in entries) == ["inv_0.pdf", "inv_2.pdf"]
+
+    def test_unknown_fsync_policy_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            BatchJournal(tmp_path / "journal.jsonl", fsync="sometimes")
+
+
+class TestInputDiscovery:
+    """Test streaming, recursive input discovery"""
+
+    def test_recursive_case_insensitive_with_mirrored_outputs(self, tmp_path):
+        """Test that nested and upper-case .PDF files are found and outputs keep their folders"""
+        input_dir = tmp_path / "in"
+        synthetic_invoice(input_dir / "inv.pdf", seed=0)
+        synthetic_invoice(input_dir / "2024" / "inv.PDF", seed=1)
+        synthetic_invoice(input_dir / "2024" / "q1" / "other.pdf", seed=2)
+        (input_dir / "2024" / "notes.txt").write_text("not a pdf")
+
+        found = iter_pdf_files(input_dir)
+        assert iter(found) is found  # a generator, not a list
+        assert sorted(p.relative_to(input_dir).as_posix() for p in found) == [
+            "2024/inv.PDF", "2024/q1/other.pdf", "inv.pdf"]
+        assert [p.name for p in iter_pdf_files(input_dir, recursive=False)] == ["inv.pdf"]
+
+        parse_all_pdfs(input_dir, tmp_path / "out")
+        outputs = sorted(p.relative_to(tmp_path / "out").as_posix() for p in (tmp_path / "out").rglob("*.csv"))
+        assert outputs == ["2024/inv.csv", "2024/q1/other.csv", "inv.csv"]
+
+    def test_file_list_from_stdin_is_consumed_lazily(self, tmp_path, monkeypatch):
+        """Test that listed PDFs are parsed as they are read, before the list ends"""
+        import io
+        from scripts import parse_pdf_data
+
+        docs = [synthetic_invoice(tmp_path / f"inv_{i}.pdf", seed=i)["path"] for i in range(2)]
+        events = []
+
+        class Listing(io.StringIO):
+            def __iter__(self):
+                for line in [f"{docs[0]}\n", "\n", f"{docs[1]}\n"]:
+                    events.append("read")
+                    yield line
+
+        def parse(pdf_path, output_dir, **kwargs):
+            events.append(Path(pdf_path).name)
+
+        monkeypatch.setattr(sys, "stdin", Listing())
+        monkeypatch.setattr(parse_pdf_data, "parse_single_pdf", parse)
+        parse_all_pdfs(None, tmp_path / "out", file_list="-")
+        assert events == ["read", "inv_0.pdf", "read", "read", "inv_1.pdf"]
+
+
+    def test_file_list_skips_missing_paths_and_keeps_folders_apart(self, tmp_path, capsys):
+        """Test that stale list entries are reported and same-named listed files get their own outputs"""
+        import subprocess
+
+        for folder in ("a", "b"):
+            synthetic_invoice(tmp_path / folder / "inv.pdf", seed=ord(folder))
+        (tmp_path / "batch.txt").write_text("a/inv.pdf\nmissing/inv.pdf\n\nb/inv.pdf\n")
+
+        script = Path(__file__).parent.parent / "scripts" / "parse_pdf_data.py"
+        run = subprocess.run([sys.executable, str(script), "--file-list", "batch.txt", "--output", "out"],
+                             cwd=tmp_path, capture_output=True, text=True, encoding="utf-8")
+        assert run.returncode == 0, run.stderr
+        assert "Listed PDF not found: missing" in run.stdout
+        outputs = sorted(p.relative_to(tmp_path / "out").as_posix() for p in (tmp_path / "out").rglob("*.csv"))
+        assert outputs == ["a/inv.csv", "b/inv.csv"]
+        assert (tmp_path / "out" / "a" / "inv.csv").read_text() != (tmp_path / "out" / "b" / "inv.csv").read_text()
+
+        absolute = mirrored_output_dir(tmp_path / "a" / "inv.pdf", None, Path("out"))
+        assert absolute.parts[0] == "out" and absolute.parts[-1] == "a"
+        assert mirrored_output_dir(Path("../x/inv.pdf"), None, Path("out")) == Path("out/__/x")
+
 
 class TestOCRIntegration:
     """Test OCR functionality (if available)"""
 
+    def test_binarize_image_uses_otsu_threshold(self):
+        """Test that a noisy two-tone image binarizes back to two tones"""
+        import numpy as np
+        from PIL import Image
+
+        rng = np.random.default_rng(0)
+        pixels = np.full((40, 40), 220, dtype=np.int16)
+        pixels[10:30, 10:30] = 40
+        noisy = np.clip(pixels + rng.integers(-25, 25, pixels.shape), 0, 255).astype(np.uint8)
+        out = np.asarray(binarize_image(Image.fromarray(noisy)))
+        assert set(np.unique(out)) == {0, 255}
+        assert (out[10:30, 10:30] == 0).all()
+        assert (out[:10] == 255).all()
+
+    def test_find_text_regions_keeps_table_rows_whole(self, tmp_path):
+        """Test that a rendered invoice's table stays one block with its header line, without logo and footer"""
+        pdfium = pytest.importorskip("pypdfium2")
+        from PIL import ImageDraw
+
+        truth = synthetic_invoice(tmp_path / "invoice.pdf", rows_per_page=5)
+        scale = 300 / 72
+        pdf = pdfium.PdfDocument(str(truth["path"]))
+        page = pdf[0]
+        img = page.render(scale=scale).to_pil().convert("L")
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([1900, 60, 2300, 260], fill=0)  # solid logo beside the title
+        draw.rectangle([200, 3400, 2200, 3430], fill=0)  # footer rule
+
+        regions = find_text_regions(img)
+        assert all(top < 3300 for _, top, _, _ in regions)
+        assert all(right < 1900 or left > 2300 or bottom < 60 or top > 260 for left, top, right, bottom in regions)
+
+        # stand in for OCR: read each region's text layer, joined in reading order
+        text_page = page.get_textpage()
+        height = page.get_height()
+        text = "\n".join(
+            text_page.get_text_bounded(left / scale, height - bottom / scale, right / scale, height - top / scale)
+            for left, top, right, bottom in regions
+        )
+        assert any(all(k in line.lower() for k in ("description", "qty", "unit price", "line total"))
+                   for line in text.splitlines())
+        tables = parse_text_table(text, 1)
+        assert len(tables) == 1 and len(tables[0]) == 5
+        pdf.close()
+
+    def test_words_to_text_rebuilds_lines_and_confidence(self):
+        """Test that image_to_data output is regrouped into lines"""
+        data = {
+            "text": ["", "Invoice", "#INV-1", "", "Total:", "12.00"],
+            "conf": ["-1", "90", "80", "-1", "70", "60"],
+            "block_num": [1, 1, 1, 1, 2, 2],
+            "par_num": [1, 1, 1, 1, 1, 1],
+            "line_num": [0, 1, 1, 0, 1, 1],
+        }
+        text, confidence = words_to_text(data)
+        assert text == "Invoice #INV-1\nTotal: 12.00"
+        assert confidence == 75.0
+
     def test_ocr_imports_available(self):
         """Test that OCR dependencies can be imported"""
         try:
@@ -0,0 +1,123 @@
+"""
+Tests for batch reconciliation
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.parse_pdf_data import parse_single_pdf
+from scripts.reconcile import audits_to_frame, iter_audits, parse_amounts, reconcile, summarize
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def test_parse_amounts_matches_scalar_parsing():
+    values = pd.Series(["$1,234.50", " 3,250.00 ", "-12.5", "", "-", "N/A", None, 7])
+    parsed = parse_amounts(values)
+    assert parsed[:3].tolist() == [1234.5, 3250.0, -12.5]
+    assert parsed[3:7].isna().all()
+    assert parsed[7] == 7.0
+
+
+def test_reconcile_flags_each_check():
+    """Test that line sums, subtotal + tax, duplicates and outliers are flagged per document"""
+    audits = audits_to_frame([
+        {"file": "ok.pdf", "invoice_no": "INV-1", "total": "100.00"},
+        {"file": "short.pdf", "invoice_no": "INV-2", "total": "$101.00"},
+        {"file": "tax.pdf", "invoice_no": "INV-3", "total": "110.00", "subtotal": "100.00", "tax": "9.00"},
+        {"file": "dup.pdf", "invoice_no": " inv-1 ", "total": "120.00"},
+        {"file": "huge.pdf", "invoice_no": "INV-5", "total": "9,500,000.00"},
+        {"file": "no_total.pdf", "invoice_no": "INV-6", "total": None, "line_sum": 50.0},
+    ] + [{"file": f"f{i}.pdf", "invoice_no": f"F-{i}", "total": f"{90 + i}.00"} for i in range(20)])
+    line_items = pd.DataFrame({
+        "file": ["ok.pdf", "ok.pdf", "short.pdf", "tax.pdf", "dup.pdf", "huge.pdf"]
+                + [f"f{i}.pdf" for i in range(20)],
+        "line_total": [60.0, 40.0, 100.0, 110.0, np.nan, 9_500_000.0] + [90.0 + i for i in range(20)],
+        "quantity": [1, 1, 1, 1, 4, 1] + [1] * 20,
+        "unit_price": [60.0, 40.0, 100.0, 110.0, 30.0, 9_500_000.0] + [90.0 + i for i in range(20)],
+    })
+
+    report = reconcile(audits, line_items, tolerance=0.01).set_index("file")
+    flagged = lambda check: set(report.index[report[check]])
+    assert flagged("total_mismatch") == {"short.pdf"}
+    assert report.loc["short.pdf", "total_diff"] == 1.0
+    assert report.loc["dup.pdf", "line_sum"] == 120.0  # quantity * unit_price fallback
+    assert flagged("tax_mismatch") == {"tax.pdf"}
+    assert flagged("duplicate_invoice") == {"ok.pdf", "dup.pdf"}
+    assert flagged("outlier_total") == {"huge.pdf"}
+    assert flagged("unverifiable") == {"no_total.pdf"}
+
+    loose = reconcile(audits, line_items, tolerance=0.01, rel_tolerance=0.01).set_index("file")
+    assert not loose.loc["short.pdf", "total_mismatch"]
+
+    summary = summarize(report.reset_index())
+    assert summary["documents"] == 26 and summary["flagged"] == 6
+    assert summary["duplicate_invoice_numbers"] == 1
+
+
+def test_reconcile_parser_audits(tmp_path):
+    """Test that audits written by parse_single_pdf reconcile the same way the parser validated them"""
+    for i in range(3):
+        pdf = synthetic_invoice(tmp_path / "raw" / f"inv_{i}.pdf", invoice_pages=1 + i, seed=i)["path"]
+        parse_single_pdf(pdf, tmp_path / "out")
+    audits = list(iter_audits(tmp_path / "out"))
+    report = reconcile(audits_to_frame(audits))
+
+    expected = {a["file"]: a["invoice_total_matches"] is False for a in audits}
+    assert dict(zip(report["file"], report["total_mismatch"])) == expected
+    assert not report["unverifiable"].any()
+
+    (tmp_path / "audits.json").write_text(json.dumps(audits), encoding="utf-8")
+    assert len(list(iter_audits(tmp_path / "audits.json"))) == 3
+
+
+def test_same_named_files_in_different_folders_stay_apart(tmp_path):
+    """Test that line items join audits on the document id, not the file name"""
+    pa = pytest.importorskip("pyarrow")
+    from scripts.arrow_results import ArrowSpool, parse_pdfs_to_arrow
+
+    docs = [synthetic_invoice(tmp_path / folder / "invoice.pdf", invoice_pages=1 + i, seed=i)
+            for i, folder in enumerate(("north", "south"))]
+    with ArrowSpool(tmp_path) as spool:
+        table, audits = parse_pdfs_to_arrow([d["path"] for d in docs], spool, workers=1)
+        line_items = table.to_pandas()
+    assert [a["file"] for a in audits] == ["invoice.pdf", "invoice.pdf"]
+
+    report = reconcile(audits_to_frame(audits), line_items)
+    assert report["line_sum"].tolist() == [round(d["total"], 2) for d in docs]
+    assert not report["total_mismatch"].any()
+
+    # audits written before document ids existed fall back to their path under the directory
+    for doc in docs:
+        audit = parse_single_pdf(doc["path"], tmp_path / "out" / doc["path"].parent.name)
+        assert audit["document_id"] == doc["path"].as_posix()
+    for path in (tmp_path / "out").rglob("audit_*.json"):
+        audit = json.loads(path.read_text(encoding="utf-8"))
+        del audit["document_id"]
+        path.write_text(json.dumps(audit), encoding="utf-8")
+    ids = sorted(a["document_id"] for a in iter_audits(tmp_path / "out"))
+    assert ids == ["north/audit_invoice.json", "south/audit_invoice.json"]
+
+
+def test_tax_mismatch_from_extracted_key_values():
+    """Test that subtotal and tax read by the parser's key-value patterns drive tax_mismatch"""
+    from scripts.parse_pdf_data import match_key_values
+
+    texts = {
+        "ok.pdf": "Invoice #A-1\nSubtotal: $100.00\nTax (8%): $8.00\nTotal: $108.00",
+        "bad.pdf": "Invoice #A-2\nSubtotal: $100.00\nTax (8%): $8.00\nTotal: $118.00",
+        "plain.pdf": "Invoice #A-3\nTotal: $100.00",
+        "rate.pdf": "Invoice #A-4\nSubtotal: $1,000.00\nTax 8%: $80.00\nTotal: $1,080.00",
+        "vat.pdf": "Invoice #A-5\nSubtotal: 100.00\nVAT 20% 20.00\nTotal: 120.00",
+    }
+    audits = [{"file": name, **match_key_values({1: text}.get, 1)} for name, text in texts.items()]
+    report = reconcile(audits_to_frame(audits)).set_index("file")
+    assert report["tax_mismatch"].to_dict() == {"ok.pdf": False, "bad.pdf": True, "plain.pdf": False,
+                                                "rate.pdf": False, "vat.pdf": False}
+    assert report.loc["bad.pdf", "tax_diff"] == -10.0
@@ -0,0 +1,104 @@
+"""
+Tests for size-aware priority scheduling
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.scheduler import CostEstimate, Scheduler, estimate_cost
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(policy, pages):
+    """Scheduler whose jobs take one simulated second per estimated page, recording dispatch order."""
+    clock, order = FakeClock(), []
+
+    def run_job(pdf_path, output_dir, parse_kwargs):
+        order.append(pdf_path.name)
+        started = clock.now
+        clock.now += pages[pdf_path.name]
+        return started, clock.now
+
+    def estimator(pdf_path):
+        n = pages[Path(pdf_path).name]
+        return CostEstimate(n, 0, True, float(n))
+
+    return Scheduler(policy, estimator=estimator, run_job=run_job, clock=clock), order
+
+
+def test_cost_estimate_uses_pages_and_text_layer(tmp_path):
+    """Test that a text invoice is cheap and a page-count-equal document without text is costed as OCR"""
+    text = estimate_cost(synthetic_invoice(tmp_path / "text.pdf", invoice_pages=4)["path"])
+    blank = estimate_cost(synthetic_invoice(tmp_path / "blank.pdf", invoice_pages=0, blank_pages=4)["path"])
+    assert (text.pages, text.has_text_layer) == (4, True)
+    assert (blank.pages, blank.has_text_layer) == (4, False)
+    assert blank.seconds > 10 * text.seconds
+
+
+def test_cost_estimate_skips_layout_analysis(tmp_path, monkeypatch):
+    """Test that estimating never opens the PDF in pdfplumber, and unreadable files cost nothing"""
+    import pdfplumber
+
+    def no_pdfplumber(*args, **kwargs):
+        raise AssertionError("estimate opened the PDF with pdfplumber")
+
+    monkeypatch.setattr(pdfplumber, "open", no_pdfplumber)
+    estimate = estimate_cost(synthetic_invoice(tmp_path / "text.pdf", invoice_pages=2, cover_pages=1)["path"])
+    assert (estimate.pages, estimate.has_text_layer) == (3, True)
+
+    (tmp_path / "bad.pdf").write_text("not a pdf")
+    assert estimate_cost(tmp_path / "bad.pdf") == CostEstimate(0, 9, True, 0.0)
+
+
+def test_sjf_and_priority_classes():
+    """Test that short jobs overtake a long scan and interactive uploads overtake the batch"""
+    pages = {"scan.pdf": 800, "a.pdf": 1, "b.pdf": 2, "upload.pdf": 50}
+    scheduler, order = make_scheduler("sjf", pages)
+    for name in ("scan.pdf", "b.pdf", "a.pdf"):
+        scheduler.submit(name, "out")
+    scheduler.submit("upload.pdf", "out", priority="interactive")
+    scheduler.run()
+
+    assert order == ["upload.pdf", "a.pdf", "b.pdf", "scan.pdf"]
+    report = scheduler.report()
+    waits = {d["file"]: d["wait_s"] for d in report["documents"]}
+    assert waits == {"upload.pdf": 0.0, "a.pdf": 50.0, "b.pdf": 51.0, "scan.pdf": 53.0}
+    assert report["classes"]["batch"]["service_total_s"] == 803.0
+    assert report["classes"]["interactive"]["wait_p95_s"] == 0.0
+
+
+def test_fair_share_between_owners():
+    """Test that a small batch is interleaved with a large one instead of queueing behind it"""
+    pages = {f"big_{i}.pdf": 4 for i in range(4)} | {f"small_{i}.pdf": 1 for i in range(4)}
+    scheduler, order = make_scheduler("fair", pages)
+    for i in range(4):
+        scheduler.submit(f"big_{i}.pdf", "out", owner="nightly")
+    for i in range(4):
+        scheduler.submit(f"small_{i}.pdf", "out", owner="team")
+    scheduler.run()
+    assert order.index("small_3.pdf") < order.index("big_1.pdf")
+
+    fifo, fifo_order = make_scheduler("fifo", pages)
+    for name in order:
+        fifo.submit(name, "out")
+    fifo.run()
+    assert fifo_order == order
+
+
+def test_unknown_policy_and_priority():
+    with pytest.raises(ValueError):
+        Scheduler("lottery")
+    with pytest.raises(ValueError):
+        make_scheduler("sjf", {"a.pdf": 1})[0].submit("a.pdf", "out", priority="urgent")
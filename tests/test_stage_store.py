@@ -0,0 +1,133 @@
+"""
+Tests for the staged artifact store
+"""
+
+import inspect
+import os
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts import parse_pdf_data
+from scripts.parse_pdf_data import parse_pdf_to_rows, parse_single_pdf
+from scripts.stage_store import STAGE_CODE, StageStore, parse_single_staged, parse_staged, stage_keys
+from scripts.synthetic_pdf import synthetic_invoice
+
+
+def test_staged_parse_matches_direct_parse(tmp_path):
+    """Test that a staged parse, fresh and from stored artifacts, equals parse_pdf_to_rows"""
+    doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=2, cover_pages=1, ruled=False)["path"]
+    store = StageStore(tmp_path / "store")
+    expected, expected_audit = parse_pdf_to_rows(doc)
+
+    for started in ("pages", None):
+        table, audit, started_from = parse_staged(doc, store)
+        assert started_from == started
+        assert table.columns == expected.columns
+        assert table.rows == expected.rows
+        assert audit == expected_audit
+
+    # exported files too, including the per-path document id the stored artifacts cannot hold
+    parse_single_pdf(doc, tmp_path / "direct")
+    copy = tmp_path / "copy" / "inv.pdf"
+    copy.parent.mkdir()
+    copy.write_bytes(doc.read_bytes())
+    audit, started_from = parse_single_staged(copy, tmp_path / "staged", store)
+    assert started_from is None and audit["document_id"] == copy.as_posix()
+    assert (tmp_path / "staged" / "inv.csv").read_bytes() == (tmp_path / "direct" / "inv.csv").read_bytes()
+
+
+def test_prescan_pages_store_only_kept_page_texts(tmp_path):
+    """Test that skipped pages get no stored text and key-values on them are still found"""
+    doc = synthetic_invoice(tmp_path / "inv.pdf", invoice_pages=2, cover_pages=1, terms_pages=1)["path"]
+    store = StageStore(tmp_path / "store")
+    expected, expected_audit = parse_pdf_to_rows(doc, prescan="balanced")
+
+    table, audit, _ = parse_staged(doc, store, prescan="balanced")
+    assert table.rows == expected.rows
+    assert audit == expected_audit
+    pages = store.load(parse_pdf_data.file_sha256(doc), "pages", stage_keys(prescan="balanced")["pages"])
+    assert sorted(pages["texts"]) == ["2", "3"] and pages["n_pages"] == 4
+
+
+def test_rule_change_restarts_from_its_stage(tmp_path, monkeypatch):
+    """Test that fallback and normalization changes re-run only their stages, without opening the PDF"""
+    doc = synthetic_invoice(tmp_path / "inv.pdf", ruled=False)["path"]
+    store = StageStore(tmp_path / "store")
+    parse_staged(doc, store)
+
+    def no_pdf(*args, **kwargs):
+        raise AssertionError("PDF was re-read")
+
+    monkeypatch.setattr(parse_pdf_data.pdfplumber, "open", no_pdf)  # open_pdf itself is part of the pages key
+
+    _, _, started_from = parse_staged(doc, store, header_keywords=["description", "qty", "amount"])
+    assert started_from == "tables"
+
+    original = parse_pdf_data.normalize_numeric_rows
+
+    def normalize_numeric_rows(table):  # stands in for an edited column-mapping rule
+        return original(table)
+
+    monkeypatch.setattr(parse_pdf_data, "normalize_numeric_rows", normalize_numeric_rows)
+    table, _, started_from = parse_staged(doc, store)
+    assert started_from == "rows"
+    assert len(table) > 0
+
+
+def _referenced_names(code) -> set:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):  # nested functions, comprehensions
+            names |= _referenced_names(const)
+    return names
+
+
+def _stage_closure(names) -> set:
+    """Every parse_pdf_data function, class and rule table reachable from `names`."""
+    seen, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        obj = inspect.unwrap(getattr(parse_pdf_data, name))  # @contextmanager functions
+        if inspect.isclass(obj):
+            members = (getattr(member, "__func__", member) for member in vars(obj).values())
+            codes = [f.__code__ for f in members if isinstance(f, types.FunctionType)]
+        elif isinstance(obj, types.FunctionType):
+            codes = [obj.__code__]
+        else:
+            continue
+        for code in codes:
+            for ref in _referenced_names(code):
+                target = getattr(parse_pdf_data, ref, None)
+                if ref in seen or target is None or isinstance(target, types.ModuleType):
+                    continue
+                if callable(target) and getattr(target, "__module__", None) != parse_pdf_data.__name__:
+                    continue  # imported from another package
+                todo.append(ref)
+    return seen
+
+
+def test_stage_code_covers_everything_a_stage_calls():
+    """Test that each stage key fingerprints every function and rule table its code reaches"""
+    # under "auto" the fallback parser shapes the pages stage; stage_keys adds the tables code then
+    expected_outside = {"pages": {"parse_text_table"}, "tables": set(), "rows": set()}
+    for stage, names in STAGE_CODE.items():
+        assert _stage_closure(names) - set(names) == expected_outside[stage], stage
+
+
+def test_stage_keys_are_stable_across_processes():
+    """Test that stage keys do not depend on per-process hash randomization"""
+    script = "from scripts.stage_store import stage_keys; print(stage_keys(), stage_keys(table_strategy='auto'))"
+    root = Path(__file__).parent.parent
+    outputs = {
+        subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert outputs == {f"{stage_keys()} {stage_keys(table_strategy='auto')}\n"}